@@ -8,9 +8,14 @@ rules (e.g. list completeness, refusal-on-out-of-scope).
 
 Usage:
     python evals/run_eval.py --pdf data/sample_pdfs/your_test_doc.pdf
+    python evals/run_eval.py --pdf ... --compare-adaptive
+    python evals/run_eval.py --pdf ... --encoder-cache
+    python evals/run_eval.py --pdf ... --compare-compression
 
 Writes a timestamped results JSON to evals/results/ and prints a
-summary table to the console.
+summary table to the console. With the embedding cache enabled
+(config.EMBEDDING_CACHE_DIR), both also report its dedup ratio and the
+bytes it saved.
 """
 
 import argparse
@@ -25,6 +30,7 @@ sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
 from src.services.ingestion import ingest_pdf
 from src.services.retrieval import build_index, retrieve
+from utils.embeddings import load_embedding_cache
 from src.services.generation import answer_question
 
 
@@ -47,15 +53,21 @@ def load_golden_dataset(path):
     return cases
 
 
-def run_case(index, chunks, case):
+def run_case(index, chunks, case, **answer_kwargs):
     query = case["question"]
     start = time.time()
 
     results, scores = retrieve(index, chunks, query)
-    answer, context, confidence_label = answer_question(results, scores, query)
+    answer, context, confidence_label, details = answer_question(results, scores, query, **answer_kwargs)
 
     latency_ms = round((time.time() - start) * 1000, 1)
-    top_score = float(scores[0])
+    return score_case(case, answer, confidence_label, details, latency_ms)
+
+
+def score_case(case, answer, confidence_label, details, latency_ms):
+    """Score one answer against its golden case (shared with run_sweep.py)."""
+    query = case["question"]
+    top_score = details["top_score"]
 
     answer_lower = answer.lower()
     expected_keywords = case.get("expected_keywords", [])
@@ -82,6 +94,8 @@ def run_case(index, chunks, case):
         "keyword_hit_count": len(hits),
         "min_keyword_hits_required": min_hits_required,
         "confidence_label": confidence_label,
+        "answer_path": details["path"],
+        "compression": details.get("compression"),
         "top_retrieval_score": round(top_score, 3),
         "latency_ms": latency_ms,
         "passed": passed,
@@ -103,22 +117,85 @@ def summarize(results):
 
     avg_latency = round(sum(r["latency_ms"] for r in results) / total, 1) if total else 0
 
+    by_path = {}
+    for r in results:
+        by_path[r["answer_path"]] = by_path.get(r["answer_path"], 0) + 1
+
     return {
         "total_cases": total,
         "passed": passed,
         "pass_rate": round(passed / total, 3) if total else 0,
         "avg_latency_ms": avg_latency,
         "by_category": by_category,
+        "by_answer_path": by_path,
+    }
+
+
+def compare_runs(baseline_results, candidate_results):
+    """
+    Accuracy and latency deltas between two runs over the same cases
+    (e.g. default vs. adaptive generation), plus which cases flipped.
+    """
+    baseline, candidate = summarize(baseline_results), summarize(candidate_results)
+    latency_saved = round(baseline["avg_latency_ms"] - candidate["avg_latency_ms"], 1)
+
+    flipped = []
+    for before, after in zip(baseline_results, candidate_results):
+        if before["passed"] != after["passed"]:
+            flipped.append({
+                "id": before["id"],
+                "question": before["question"],
+                "passed_before": before["passed"],
+                "passed_after": after["passed"],
+                "answer_before": before["answer"],
+                "answer_after": after["answer"],
+            })
+
+    return {
+        "baseline_pass_rate": baseline["pass_rate"],
+        "candidate_pass_rate": candidate["pass_rate"],
+        "pass_rate_change": round(candidate["pass_rate"] - baseline["pass_rate"], 3),
+        "baseline_avg_latency_ms": baseline["avg_latency_ms"],
+        "candidate_avg_latency_ms": candidate["avg_latency_ms"],
+        "avg_latency_saved_ms": latency_saved,
+        "avg_latency_saved_pct": round(latency_saved / baseline["avg_latency_ms"] * 100, 1)
+        if baseline["avg_latency_ms"] else 0,
+        "flipped_cases": flipped,
     }
 
 
+def print_comparison(title, comparison):
+    print("\n" + "=" * 60)
+    print(title)
+    print("=" * 60)
+    print(f"Pass rate: {comparison['baseline_pass_rate'] * 100:.1f}% -> "
+          f"{comparison['candidate_pass_rate'] * 100:.1f}% "
+          f"({comparison['pass_rate_change'] * 100:+.1f} pts)")
+    print(f"Avg latency: {comparison['baseline_avg_latency_ms']} ms -> "
+          f"{comparison['candidate_avg_latency_ms']} ms "
+          f"(saved {comparison['avg_latency_saved_ms']} ms, {comparison['avg_latency_saved_pct']}%)")
+    for case in comparison["flipped_cases"]:
+        status = "now PASSES" if case["passed_after"] else "now FAILS"
+        print(f"[{case['id']}] {status}: {case['question']}")
+        print(f"   before: {case['answer_before'][:120]}")
+        print(f"   after:  {case['answer_after'][:120]}")
+    print("=" * 60 + "\n")
+
+
+def format_embedding_cache_stats(stats):
+    return (f"Embedding cache: {stats['hits']}/{stats['lookups']} chunks served from the cache "
+            f"(dedup ratio {stats['dedup_ratio']}), {stats['text_bytes_saved']} bytes of text not re-encoded, "
+            f"{stats['vector_bytes_saved']} bytes of vectors not duplicated; {stats['entries']} entries")
+
+
 def print_summary_table(summary, results):
     print("\n" + "=" * 60)
     print("EVALUATION SUMMARY")
     print("=" * 60)
     print(f"Overall: {summary['passed']}/{summary['total_cases']} passed "
           f"({summary['pass_rate'] * 100:.1f}%)")
-    print(f"Avg latency: {summary['avg_latency_ms']} ms\n")
+    print(f"Avg latency: {summary['avg_latency_ms']} ms")
+    print("Answer paths: " + ", ".join(f"{p}={n}" for p, n in summary["by_answer_path"].items()) + "\n")
 
     print(f"{'Category':<15} {'Passed':<10} {'Total':<8}")
     print("-" * 35)
@@ -142,6 +219,18 @@ def main():
     parser = argparse.ArgumentParser(description="Run the golden evaluation dataset against a PDF.")
     parser.add_argument("--pdf", required=True, help="Path to a PDF file to evaluate against.")
     parser.add_argument("--dataset", default=str(GOLDEN_DATASET_PATH), help="Path to golden dataset JSONL.")
+    parser.add_argument(
+        "--compare-adaptive", action="store_true",
+        help="Run every case with default and adaptive generation, and report latency saved and accuracy change.",
+    )
+    parser.add_argument(
+        "--encoder-cache", action="store_true",
+        help="Re-run every case reusing cached encoder outputs, and report the per-query encoder time saved.",
+    )
+    parser.add_argument(
+        "--compare-compression", action="store_true",
+        help="Re-run every case with sentence-level context compression, and report context chars saved and accuracy change.",
+    )
     args = parser.parse_args()
 
     pdf_path = Path(args.pdf)
@@ -161,19 +250,77 @@ def main():
     print("Building FAISS index ...")
     index, _ = build_index(chunks)
 
+    output = {}
+    embedding_cache = load_embedding_cache()
+    if embedding_cache is not None:
+        # Cumulative for the cache directory's model, so a second run
+        # over the same PDF shows what re-ingesting it costs.
+        output["embedding_cache"] = embedding_cache.stats()
+        print(format_embedding_cache_stats(output["embedding_cache"]))
+    # Comparison runs pin the baseline to the plain path, so the deltas
+    # hold whatever config.py currently defaults to.
+    baseline_kwargs = {}
+    if args.compare_adaptive:
+        baseline_kwargs["adaptive"] = False
+    if args.encoder_cache:
+        baseline_kwargs["reuse_encoder"] = False
+    if args.compare_compression:
+        baseline_kwargs["compress"] = False
+
     results = []
     for case in cases:
         print(f"Running [{case['id']}] {case['question']}")
-        results.append(run_case(index, chunks, case))
+        results.append(run_case(index, chunks, case, **baseline_kwargs))
 
     summary = summarize(results)
     print_summary_table(summary, results)
 
+    if args.compare_adaptive:
+        adaptive_results = []
+        for case in cases:
+            print(f"Running [{case['id']}] (adaptive) {case['question']}")
+            adaptive_results.append(run_case(index, chunks, case, **{**baseline_kwargs, "adaptive": True}))
+        output["adaptive_comparison"] = compare_runs(results, adaptive_results)
+        output["adaptive_results"] = adaptive_results
+        print_comparison("ADAPTIVE GENERATION vs. DEFAULT", output["adaptive_comparison"])
+
+    if args.encoder_cache:
+        from utils.generator import load_encoder_cache
+
+        cached_results = []
+        for case in cases:
+            print(f"Running [{case['id']}] (encoder cache) {case['question']}")
+            cached_results.append(run_case(index, chunks, case, **{**baseline_kwargs, "reuse_encoder": True}))
+        comparison = compare_runs(results, cached_results)
+        cache_stats = load_encoder_cache().stats()
+        comparison["encoder_cache"] = cache_stats
+        comparison["encoder_ms_saved_per_query"] = round(cache_stats["encoder_ms_saved"] / len(cases), 1) if cases else 0
+        output["encoder_cache_comparison"] = comparison
+        output["encoder_cache_results"] = cached_results
+        print_comparison("ENCODER CACHE vs. DEFAULT", comparison)
+        print(f"Encoder cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses, "
+              f"{comparison['encoder_ms_saved_per_query']} ms encoder time saved per query\n")
+
+    if args.compare_compression:
+        compressed_results = []
+        for case in cases:
+            print(f"Running [{case['id']}] (compressed) {case['question']}")
+            compressed_results.append(run_case(index, chunks, case, **{**baseline_kwargs, "compress": True}))
+        comparison = compare_runs(results, compressed_results)
+        stats = [r["compression"] for r in compressed_results if r["compression"]]
+        comparison["context_chars_before"] = sum(s["input_chars"] for s in stats)
+        comparison["context_chars_after"] = sum(s["output_chars"] for s in stats)
+        output["compression_comparison"] = comparison
+        output["compression_results"] = compressed_results
+        print_comparison("CONTEXT COMPRESSION vs. DEFAULT", comparison)
+        print(f"Context chars, retrieved -> sent to generation: {comparison['context_chars_before']} -> "
+              f"{comparison['context_chars_after']} over {len(stats)} generated answers\n")
+
     RESULTS_DIR.mkdir(parents=True, exist_ok=True)
     timestamp = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
     out_path = RESULTS_DIR / f"eval_{timestamp}.json"
     with open(out_path, "w", encoding="utf-8") as f:
-        json.dump({"summary": summary, "results": results}, f, indent=2)
+        json.dump({"summary": summary, "results": results, **output}, f, indent=2)
 
     print(f"Full results written to {out_path}")
 
@@ -0,0 +1,265 @@
+"""
+Parameter sweep over the golden dataset: every combination of
+CHUNK_SIZE, CHUNK_OVERLAP, TOP_K and MAX_CONTEXT_CHARS, scored with the
+same rules as run_eval.py, without redoing work the grid shares.
+
+  - The PDF is parsed once. It is re-chunked, and the index rebuilt,
+    only when (chunk_size, chunk_overlap) changes -- and even then only
+    chunk texts not embedded by an earlier configuration are encoded.
+  - Each question is embedded once and searched once per chunking, at
+    the largest TOP_K in the grid; smaller TOP_K values are prefixes of
+    that (exact) result list.
+  - Generation is memoized by (prompt hash, generator model, generation
+    kwargs), optionally persisted across sweeps with --memo-file. Two
+    configs that end up with the same truncated prompt -- common when
+    MAX_CONTEXT_CHARS cuts the extra chunks a larger TOP_K added --
+    generate once.
+
+Reported latency is what each config would cost on its own: memoized
+generations are charged their originally measured time, and the shared
+query embedding/search time is charged to every config that uses it.
+
+Usage:
+    python evals/run_sweep.py --pdf data/sample_pdfs/doc.pdf \\
+        --chunk-size 400,600,800 --chunk-overlap 50,100 --top-k 3,5,8 \\
+        --max-context-chars 1500,2500
+
+Writes evals/results/sweep_<timestamp>.json and prints a pass-rate vs.
+latency table with the Pareto-optimal configs marked.
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from datetime import datetime, timezone
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+
+import src.services.generation as generation
+from src.config import CHUNK_SIZE, CHUNK_OVERLAP, TOP_K, MAX_CONTEXT_CHARS, GENERATOR_MODEL_NAME
+from utils.loader import load_pdf
+from utils.chunker import chunk_text
+from utils.embeddings import generate_embeddings
+from utils.generator import _prompt_parts
+from utils.retriever import create_faiss_index, search_index
+from evals.run_eval import GOLDEN_DATASET_PATH, RESULTS_DIR, load_golden_dataset, score_case
+
+
+class GenerationMemo:
+    """
+    Drop-in for utils.generator.generate_answer that returns a stored
+    answer when the exact same prompt was generated before with the same
+    model and settings. Installed into src.services.generation for the
+    duration of the sweep.
+    """
+
+    def __init__(self, generate_fn, path=None):
+        self._generate = generate_fn
+        self.path = path
+        self._entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.replayed_ms = 0.0  # original generation time of memo hits, reset per case
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._entries[entry["key"]] = (entry["answer"], entry["generation_ms"])
+
+    def _key(self, context, question, kwargs):
+        truncated = context[:kwargs.get("max_context_chars", MAX_CONTEXT_CHARS)]
+        prefix, suffix = _prompt_parts(truncated, question)
+        settings = {k: v for k, v in sorted(kwargs.items()) if k not in ("cache_info", "max_context_chars")}
+        data = f"{GENERATOR_MODEL_NAME}\0{json.dumps(settings)}\0{prefix}{suffix}"
+        return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+    def __call__(self, context, question, **kwargs):
+        key = self._key(context, question, kwargs)
+        if key in self._entries:
+            self.hits += 1
+            answer, generation_ms = self._entries[key]
+            self.replayed_ms += generation_ms
+            return answer
+
+        self.misses += 1
+        start = time.perf_counter()
+        answer = self._generate(context, question, **kwargs)
+        generation_ms = round((time.perf_counter() - start) * 1000, 1)
+        self._entries[key] = (answer, generation_ms)
+        if self.path:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"key": key, "answer": answer, "generation_ms": generation_ms}) + "\n")
+        return answer
+
+
+class EmbeddingMemo:
+    """Passage and query embeddings shared by every config in the sweep."""
+
+    def __init__(self):
+        self._passages = {}
+        self._queries = {}
+        self.passages_encoded = 0
+        self.passages_reused = 0
+
+    def passages(self, chunks):
+        new = [c for c in dict.fromkeys(chunks) if c not in self._passages]
+        if new:
+            for chunk, vector in zip(new, generate_embeddings(new, is_query=False)):
+                self._passages[chunk] = vector
+        self.passages_encoded += len(new)
+        self.passages_reused += len(chunks) - len(new)
+        return np.stack([self._passages[c] for c in chunks])
+
+    def query(self, query):
+        """(embedding, embed_ms); embed_ms is the time of the one real encode."""
+        if query not in self._queries:
+            start = time.perf_counter()
+            vector = generate_embeddings([query], is_query=True)[0]
+            self._queries[query] = (vector, (time.perf_counter() - start) * 1000)
+        return self._queries[query]
+
+
+def parse_grid(value, default):
+    return [int(v) for v in value.split(",")] if value else [default]
+
+
+def pareto_front(rows):
+    """Indices of configs no other config beats on both pass rate and latency."""
+    front = []
+    for i, row in enumerate(rows):
+        dominated = any(
+            other["pass_rate"] >= row["pass_rate"] and other["avg_latency_ms"] <= row["avg_latency_ms"]
+            and (other["pass_rate"] > row["pass_rate"] or other["avg_latency_ms"] < row["avg_latency_ms"])
+            for other in rows
+        )
+        if not dominated:
+            front.append(i)
+    return front
+
+
+def run_sweep(text, cases, grid, memo):
+    embeddings = EmbeddingMemo()
+    max_top_k = max(grid["top_k"])
+    rows = []
+
+    for chunk_size, chunk_overlap in itertools.product(grid["chunk_size"], grid["chunk_overlap"]):
+        if chunk_overlap >= chunk_size:
+            continue
+        chunks = chunk_text(text, chunk_size=chunk_size, overlap=chunk_overlap)
+        print(f"chunk_size={chunk_size} chunk_overlap={chunk_overlap}: {len(chunks)} chunks")
+        index = create_faiss_index(embeddings.passages(chunks))
+
+        retrieved = {}
+        for case in cases:
+            query_embedding, embed_ms = embeddings.query(case["question"])
+            start = time.perf_counter()
+            results, scores = search_index(index, query_embedding, chunks, top_k=max_top_k)
+            retrieved[case["id"]] = (results, scores, embed_ms + (time.perf_counter() - start) * 1000)
+
+        for top_k, max_context_chars in itertools.product(grid["top_k"], grid["max_context_chars"]):
+            case_results = []
+            for case in cases:
+                results, scores, retrieval_ms = retrieved[case["id"]]
+                memo.replayed_ms = 0.0
+                start = time.perf_counter()
+                answer, _, label, details = generation.answer_question(
+                    results[:top_k], scores[:top_k], case["question"], max_context_chars=max_context_chars
+                )
+                latency_ms = retrieval_ms + (time.perf_counter() - start) * 1000 + memo.replayed_ms
+                case_results.append(score_case(case, answer, label, details, round(latency_ms, 1)))
+
+            passed = sum(r["passed"] for r in case_results)
+            latencies = [r["latency_ms"] for r in case_results]
+            rows.append({
+                "chunk_size": chunk_size,
+                "chunk_overlap": chunk_overlap,
+                "top_k": top_k,
+                "max_context_chars": max_context_chars,
+                "pass_rate": round(passed / len(cases), 3) if cases else 0,
+                "avg_latency_ms": round(float(np.mean(latencies)), 1) if latencies else 0,
+                "p95_latency_ms": round(float(np.percentile(latencies, 95)), 1) if latencies else 0,
+                "failed_ids": [r["id"] for r in case_results if not r["passed"]],
+            })
+
+    for i in pareto_front(rows):
+        rows[i]["pareto"] = True
+    return rows, {
+        "passages_encoded": embeddings.passages_encoded,
+        "passages_reused": embeddings.passages_reused,
+        "generation_memo_hits": memo.hits,
+        "generation_memo_misses": memo.misses,
+    }
+
+
+def print_pareto_table(rows):
+    print("\n" + "=" * 78)
+    print("SWEEP: pass rate vs. latency (* = Pareto-optimal)")
+    print("=" * 78)
+    print(f"{'':<2}{'chunk':>6}{'overlap':>9}{'top_k':>7}{'ctx_chars':>11}{'pass':>9}{'avg_ms':>10}{'p95_ms':>10}")
+    print("-" * 78)
+    for row in sorted(rows, key=lambda r: (r["avg_latency_ms"], -r["pass_rate"])):
+        mark = "*" if row.get("pareto") else ""
+        print(f"{mark:<2}{row['chunk_size']:>6}{row['chunk_overlap']:>9}{row['top_k']:>7}"
+              f"{row['max_context_chars']:>11}{row['pass_rate'] * 100:>8.1f}%"
+              f"{row['avg_latency_ms']:>10}{row['p95_latency_ms']:>10}")
+    print("=" * 78 + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep chunking/retrieval/context parameters over the golden dataset.")
+    parser.add_argument("--pdf", required=True, help="Path to a PDF file to evaluate against.")
+    parser.add_argument("--dataset", default=str(GOLDEN_DATASET_PATH), help="Path to golden dataset JSONL.")
+    parser.add_argument("--chunk-size", default="", help=f"Comma-separated values (default {CHUNK_SIZE}).")
+    parser.add_argument("--chunk-overlap", default="", help=f"Comma-separated values (default {CHUNK_OVERLAP}).")
+    parser.add_argument("--top-k", default="", help=f"Comma-separated values (default {TOP_K}).")
+    parser.add_argument("--max-context-chars", default="", help=f"Comma-separated values (default {MAX_CONTEXT_CHARS}).")
+    parser.add_argument(
+        "--memo-file", default=None,
+        help="JSONL file to persist memoized generations in, so later sweeps reuse them.",
+    )
+    args = parser.parse_args()
+
+    pdf_path = Path(args.pdf)
+    if not pdf_path.exists():
+        print(f"ERROR: PDF not found at {pdf_path}")
+        sys.exit(1)
+
+    grid = {
+        "chunk_size": parse_grid(args.chunk_size, CHUNK_SIZE),
+        "chunk_overlap": parse_grid(args.chunk_overlap, CHUNK_OVERLAP),
+        "top_k": parse_grid(args.top_k, TOP_K),
+        "max_context_chars": parse_grid(args.max_context_chars, MAX_CONTEXT_CHARS),
+    }
+    cases = load_golden_dataset(args.dataset)
+    with open(pdf_path, "rb") as f:
+        text = load_pdf(f)
+
+    memo = GenerationMemo(generation.generate_answer, path=args.memo_file)
+    original_generate = generation.generate_answer
+    generation.generate_answer = memo
+    try:
+        rows, reuse = run_sweep(text, cases, grid, memo)
+    finally:
+        generation.generate_answer = original_generate
+
+    print_pareto_table(rows)
+    print("Reuse: " + ", ".join(f"{k}={v}" for k, v in reuse.items()))
+
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    timestamp = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
+    out_path = RESULTS_DIR / f"sweep_{timestamp}.json"
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump({"grid": grid, "reuse": reuse, "configs": rows}, f, indent=2)
+    print(f"Full results written to {out_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark passage-embedding throughput: one plain model.encode() call
+(the old build_index path) vs. the token-length-bucketed, batch-size-
+calibrated path in utils/embeddings.py.
+
+The synthetic corpus mimics real chunk lengths: mostly ~CHUNK_SIZE
+paragraphs, plus short headings and long list units well above
+CHUNK_SIZE.
+
+Usage:
+    python scripts/bench_embeddings.py --num-chunks 5000
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils import embeddings
+from utils.embeddings import PASSAGE_PREFIX, encode_length_bucketed, load_embedding_model
+from src.config import CHUNK_SIZE
+
+_WORDS = (
+    "develop software systems analyze user needs design test maintain programs "
+    "median wage employment growth occupation tasks skills knowledge education "
+    "responsibilities qualifications benefits requirements computer network"
+).split()
+
+
+def synthetic_corpus(num_chunks, seed=0):
+    rng = random.Random(seed)
+
+    def words(num_chars):
+        text = []
+        while sum(len(w) + 1 for w in text) < num_chars:
+            text.append(rng.choice(_WORDS))
+        return " ".join(text)
+
+    corpus = []
+    for _ in range(num_chunks):
+        kind = rng.random()
+        if kind < 0.15:
+            corpus.append(words(rng.randint(10, 60)))  # headings / short units
+        elif kind < 0.85:
+            corpus.append(words(rng.randint(CHUNK_SIZE // 2, CHUNK_SIZE)))
+        else:
+            # list units, kept whole by the chunker even past CHUNK_SIZE
+            corpus.append("\n".join("- " + words(rng.randint(40, 160)) for _ in range(rng.randint(8, 25))))
+    return corpus
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--num-chunks", type=int, default=5000)
+    parser.add_argument("--repeats", type=int, default=1)
+    args = parser.parse_args()
+
+    model = load_embedding_model()
+    texts = [PASSAGE_PREFIX + t for t in synthetic_corpus(args.num_chunks)]
+    model.encode(texts[:16], normalize_embeddings=True)  # warm-up
+
+    baseline = min(timed(lambda: model.encode(texts, normalize_embeddings=True)) for _ in range(args.repeats))
+
+    embeddings._calibrated_batch_size = None
+    first_run = timed(lambda: encode_length_bucketed(model, texts))  # includes calibration
+    calibrated = embeddings._calibrated_batch_size
+    bucketed = min(timed(lambda: encode_length_bucketed(model, texts)) for _ in range(args.repeats))
+
+    report = {
+        "num_chunks": len(texts),
+        "baseline_chunks_per_sec": round(len(texts) / baseline, 1),
+        "bucketed_chunks_per_sec": round(len(texts) / bucketed, 1),
+        "bucketed_first_run_chunks_per_sec": round(len(texts) / first_run, 1),
+        "calibrated_batch_size": calibrated,
+        "speedup": round(baseline / bucketed, 2),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Benchmark PCA-reduced indexes (utils.retriever.create_reduced_index)
+against the full-dimension flat index: recall@k of the exact top-k,
+per-query search latency, and index memory, per target dimension.
+
+Recall only means something on real embeddings -- their spectrum
+decays fast, which is what PCA exploits. Pass a .npy of passage
+embeddings (e.g. np.save of build_index's second return value) with
+--embeddings; without it a synthetic low-rank corpus is used, which only
+checks the plumbing and the latency/memory side.
+
+Usage:
+    python scripts/bench_pca.py --embeddings corpus.npy --dims 128,256,384
+    python scripts/bench_pca.py --num-vectors 50000 --dims 64,128,256
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.retriever import create_faiss_index, create_reduced_index
+
+
+def synthetic_corpus(num_vectors, dim=768, rank=96, seed=0):
+    rng = np.random.default_rng(seed)
+    basis = rng.standard_normal((rank, dim))
+    weights = rng.standard_normal((num_vectors, rank)) * np.geomspace(3.0, 0.05, rank)
+    return (weights @ basis + 0.02 * rng.standard_normal((num_vectors, dim))).astype("float32")
+
+
+def search_all(index, queries, k):
+    """(ids, mean ms per query), one query at a time like retrieve()."""
+    index.search(queries[:1], k)  # warm-up
+    ids = np.empty((len(queries), k), dtype=np.int64)
+    start = time.perf_counter()
+    for row, query in enumerate(queries):
+        ids[row] = index.search(query[None, :], k)[1][0]
+    return ids, (time.perf_counter() - start) * 1000 / len(queries)
+
+
+def recall_at_k(exact_ids, approx_ids):
+    k = exact_ids.shape[1]
+    return float(np.mean([len(set(e) & set(a)) / k for e, a in zip(exact_ids, approx_ids)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--embeddings", help="Path to a .npy of passage embeddings (rows = chunks).")
+    parser.add_argument("--num-vectors", type=int, default=20_000, help="Synthetic corpus size.")
+    parser.add_argument("--num-queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=8)
+    parser.add_argument("--dims", default="128,256,384", help="Comma-separated target dimensions.")
+    parser.add_argument("--train-sample", type=int, default=None, help="Train PCA on at most this many vectors.")
+    args = parser.parse_args()
+
+    corpus = np.load(args.embeddings).astype("float32") if args.embeddings else synthetic_corpus(args.num_vectors)
+    faiss.normalize_L2(corpus)
+
+    # Held-out-ish queries: perturbed corpus rows, so each has real neighbours.
+    rng = np.random.default_rng(1)
+    rows = rng.choice(len(corpus), min(args.num_queries, len(corpus)), replace=False)
+    queries = corpus[rows] + 0.05 * rng.standard_normal((len(rows), corpus.shape[1])).astype("float32")
+    faiss.normalize_L2(queries)
+
+    flat = create_faiss_index(corpus)
+    exact_ids, flat_ms = search_all(flat, queries, args.top_k)
+    report = {
+        "num_vectors": len(corpus),
+        "source": args.embeddings or "synthetic",
+        "top_k": args.top_k,
+        "runs": [{
+            "dim": corpus.shape[1],
+            f"recall@{args.top_k}": 1.0,
+            "ms_per_query": round(flat_ms, 3),
+            "index_mb": round(corpus.nbytes / 2**20, 1),
+        }],
+    }
+
+    for dim in (int(d) for d in args.dims.split(",")):
+        start = time.perf_counter()
+        reduced = create_reduced_index(corpus, dim, train_sample=args.train_sample)
+        build_s = time.perf_counter() - start
+        ids, ms = search_all(reduced, queries, args.top_k)
+        report["runs"].append({
+            "dim": dim,
+            f"recall@{args.top_k}": round(recall_at_k(exact_ids, ids), 3),
+            "ms_per_query": round(ms, 3),
+            "index_mb": round(len(corpus) * dim * 4 / 2**20, 1),
+            "train_and_build_s": round(build_s, 2),
+        })
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
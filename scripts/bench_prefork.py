@@ -0,0 +1,117 @@
+"""
+Benchmark the pre-fork generation pool (src/services/worker_pool.py):
+per-worker RSS/PSS and throughput against worker count.
+
+PSS (proportional set size) charges each shared page 1/N to each of
+the N processes mapping it, so "parent + workers" PSS is the real
+memory the pool costs. "unshared_estimate_mb" is what N independent
+servers would hold: N copies of the parent's resident size.
+
+By default a stub model is used -- --model-mb of float32 weights
+loaded in the parent, and a "generation" that does --matmuls
+matrix-vector products over them -- so the memory side can be checked
+without downloading anything. --real loads flan-t5 and the e5 encoder
+and generates answers for a fixed context/question.
+
+Usage:
+    python scripts/bench_prefork.py --workers 1,2,4 --model-mb 1000
+    python scripts/bench_prefork.py --workers 1,2 --real --requests 16
+"""
+
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import wait
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.services.worker_pool import PreforkPool, process_memory
+
+_stub_weights = None
+
+_REAL_CONTEXT = (
+    "Software developers research, design, and develop computer and network software. "
+    "They analyze user needs, confer with systems analysts, and modify existing software "
+    "to correct errors or improve performance."
+)
+_REAL_QUESTION = "What do software developers do?"
+
+
+def load_stub_model(model_mb):
+    global _stub_weights
+    rows = 1024
+    cols = max(1, int(model_mb * 2**20 / 4 / rows))
+    _stub_weights = np.random.default_rng(0).standard_normal((rows, cols), dtype=np.float32)
+
+
+def stub_generate(matmuls):
+    vector = np.ones(_stub_weights.shape[1], dtype=np.float32)
+    total = 0.0
+    for _ in range(matmuls):
+        total += float((_stub_weights @ vector)[0])
+    return total
+
+
+def real_generate():
+    from utils.generator import generate_answer
+    return generate_answer(_REAL_CONTEXT, _REAL_QUESTION)
+
+
+def run(num_workers, args):
+    if args.real:
+        from utils.embeddings import load_embedding_model
+        from utils.generator import load_generator
+        preload, fn, fn_args = (load_embedding_model, load_generator), real_generate, ()
+    else:
+        preload = (lambda: load_stub_model(args.model_mb),)
+        fn, fn_args = stub_generate, (args.matmuls,)
+
+    pool = PreforkPool(num_workers, preload=preload, threads_per_worker=args.threads_per_worker)
+    try:
+        # One warm-up per worker, so the memory reading includes what a
+        # worker touches while serving, not just after the fork.
+        wait([pool.submit(fn, *fn_args) for _ in range(num_workers)])
+        start = time.perf_counter()
+        wait([pool.submit(fn, *fn_args) for _ in range(args.requests)])
+        elapsed = time.perf_counter() - start
+        memory = pool.memory()
+    finally:
+        pool.close()
+
+    parent, workers = memory["parent"], memory["workers"]
+    result = {"workers": num_workers, "requests_per_s": round(args.requests / elapsed, 2)}
+    if parent is not None:
+        result.update({
+            "parent_rss_mb": parent["rss_mb"],
+            "worker_rss_mb": [w["rss_mb"] for w in workers],
+            "worker_pss_mb": [w["pss_mb"] for w in workers],
+            "total_pss_mb": round(parent["pss_mb"] + sum(w["pss_mb"] for w in workers), 1),
+            "unshared_estimate_mb": round(parent["rss_mb"] * num_workers, 1),
+        })
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated worker counts.")
+    parser.add_argument("--requests", type=int, default=32, help="Timed requests per worker count.")
+    parser.add_argument("--threads-per-worker", type=int, default=None)
+    parser.add_argument("--real", action="store_true", help="Load the real models (downloads them if needed).")
+    parser.add_argument("--model-mb", type=float, default=500, help="Stub model size.")
+    parser.add_argument("--matmuls", type=int, default=20, help="Stub work per request.")
+    args = parser.parse_args()
+
+    report = {
+        "model": "real" if args.real else f"stub {args.model_mb}MB",
+        "baseline_rss_mb": (process_memory("self") or {}).get("rss_mb"),
+        "runs": [run(int(n), args) for n in args.workers.split(",")],
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark per-request prompt tokenization: the old path (slow Python
+T5Tokenizer over the whole prompt), the fast tokenizer over the whole
+prompt, and prompt assembly from ingest-time chunk token ids
+(utils/chunk_tokens.py), where only the question is tokenized.
+
+Each "request" is TOP_K chunks drawn from a synthetic corpus plus a
+question, cut at MAX_CONTEXT_CHARS as generate_answer does. Also
+reports how often the assembled ids differ from the fast tokenizer's
+ids for the same prompt (the char cut lands on a token boundary instead
+of mid-word, so a few differ at the cut).
+
+Usage:
+    python scripts/bench_prompt_tokens.py --requests 200
+"""
+
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from transformers import T5Tokenizer
+
+from scripts.bench_embeddings import synthetic_corpus
+from utils.chunk_tokens import ChunkTokens
+from utils.generator import _assemble_prompt_ids, _prompt_parts, load_tokenizer
+from src.services.generation import build_context
+from src.config import GENERATOR_MODEL_NAME, MAX_CONTEXT_CHARS, MAX_INPUT_TOKENS, TOP_K
+
+_QUESTIONS = (
+    "What is the median annual wage?",
+    "What are the main responsibilities of the role?",
+    "Which qualifications are required?",
+)
+
+
+def _ms(samples):
+    return {
+        "mean": round(statistics.mean(samples) * 1000, 3),
+        "p50": round(statistics.median(samples) * 1000, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--num-chunks", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    corpus = synthetic_corpus(args.num_chunks)
+    slow = T5Tokenizer.from_pretrained(GENERATOR_MODEL_NAME)
+    fast = load_tokenizer()
+
+    start = time.perf_counter()
+    tokens = ChunkTokens.from_tokenizer(fast, GENERATOR_MODEL_NAME, [c.strip() for c in corpus])
+    ingest_s = time.perf_counter() - start
+
+    slow_s, fast_s, assembled_s, mismatched = [], [], [], 0
+    for _ in range(args.requests):
+        ids = rng.sample(range(len(corpus)), TOP_K)
+        chunks = [corpus[i] for i in ids]
+        question = rng.choice(_QUESTIONS)
+        prefix, suffix = _prompt_parts(build_context(chunks)[:MAX_CONTEXT_CHARS], question)
+
+        start = time.perf_counter()
+        slow(prefix + suffix, return_tensors="pt", truncation=True, max_length=MAX_INPUT_TOKENS)
+        slow_s.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        expected = fast(prefix + suffix, truncation=True, max_length=MAX_INPUT_TOKENS)["input_ids"]
+        fast_s.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        chunk_tokens = [(*tokens[i], len(corpus[i].strip())) for i in ids]
+        prefix_ids, suffix_ids = _assemble_prompt_ids(fast, chunk_tokens, question, MAX_CONTEXT_CHARS)
+        assembled_s.append(time.perf_counter() - start)
+        mismatched += (prefix_ids + suffix_ids) != expected
+
+    report = {
+        "requests": args.requests,
+        "ingest_tokenize_s": round(ingest_s, 3),
+        "ingest_chunks": len(corpus),
+        "per_request_ms": {
+            "slow_full_prompt": _ms(slow_s),
+            "fast_full_prompt": _ms(fast_s),
+            "assembled_from_ids": _ms(assembled_s),
+        },
+        "eliminated_ms_per_request_vs_slow": round((statistics.mean(slow_s) - statistics.mean(assembled_s)) * 1000, 3),
+        "prompts_differing_from_fast_tokenizer": mismatched,
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Benchmark single-query FAISS search throughput (QPS) for a plain flat
+index vs. utils.retriever.ShardedIndex at increasing shard counts, on
+random unit vectors the size of e5-base-v2 embeddings. No models needed.
+
+Usage:
+    python scripts/bench_sharded_search.py --num-vectors 500000 --shards 1,2,4,8
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.retriever import create_faiss_index, create_sharded_index
+
+
+def measure_qps(index, queries, k):
+    index.search(queries[:1], k)  # warm-up
+    start = time.perf_counter()
+    for query in queries:
+        index.search(query[None, :], k)  # one query at a time, like retrieve()
+    return len(queries) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--num-vectors", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--num-queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=8)
+    parser.add_argument("--shards", default="2,4,8", help="Comma-separated shard counts to try.")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((args.num_vectors, args.dim)).astype("float32")
+    queries = rng.standard_normal((args.num_queries, args.dim)).astype("float32")
+    faiss.normalize_L2(queries)
+
+    cores = os.cpu_count() or 1
+    report = {"num_vectors": args.num_vectors, "dim": args.dim, "cores": cores, "runs": []}
+
+    flat = create_faiss_index(vectors)
+    report["runs"].append({"shards": 1, "index": "IndexFlatIP", "qps": round(measure_qps(flat, queries, args.top_k), 1)})
+    del flat
+
+    for num_shards in (int(s) for s in args.shards.split(",")):
+        sharded = create_sharded_index(vectors, num_shards)
+        qps = measure_qps(sharded, queries, args.top_k)
+        report["runs"].append({
+            "shards": num_shards,
+            "index": "ShardedIndex",
+            "omp_threads_per_shard": sharded.omp_threads_per_shard,
+            "qps": round(qps, 1),
+        })
+        sharded.close()
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Load benchmark for CPU thread partitioning (src/services/resources.py).
+
+Each simulated request runs three synthetic stages sized like the real
+pipeline -- a small encoder-style matmul stack (query embedding), a
+FAISS flat search, and a longer matmul loop (generation) -- so it
+needs no model downloads. N client threads fire requests back to back,
+first with every stage running inline on library defaults (all cores
+each), then through ResourceManager's per-stage executors, and the
+script reports throughput and latency percentiles per concurrency level.
+
+Usage:
+    python scripts/bench_thread_partitioning.py --clients 1,2,4,8 --requests 40
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+import faiss
+import numpy as np
+import torch
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.services.resources import ResourceManager
+
+
+class SyntheticPipeline:
+    def __init__(self, num_vectors, dim=768, generation_steps=40):
+        rng = np.random.default_rng(0)
+        vectors = rng.standard_normal((num_vectors, dim)).astype("float32")
+        faiss.normalize_L2(vectors)
+        self.index = faiss.IndexFlatIP(dim)
+        self.index.add(vectors)
+        self.encoder = [torch.randn(dim, dim) for _ in range(6)]
+        self.decoder = torch.randn(dim, dim)
+        self.generation_steps = generation_steps
+        self.dim = dim
+
+    def embed(self):
+        with torch.no_grad():
+            hidden = torch.randn(64, self.dim)  # ~64-token query
+            for weight in self.encoder:
+                hidden = torch.relu(hidden @ weight)
+            return hidden.mean(dim=0).numpy()[None, :].astype("float32")
+
+    def search(self, query):
+        return self.index.search(query, 8)
+
+    def generate(self):
+        with torch.no_grad():
+            hidden = torch.randn(256, self.dim)
+            for _ in range(self.generation_steps):
+                hidden = torch.tanh(hidden @ self.decoder)
+            return hidden.sum().item()
+
+
+def percentile(values, pct):
+    return round(float(np.percentile(values, pct)) * 1000, 1) if values else None
+
+
+def run_load(pipeline, clients, requests_per_client, manager=None):
+    latencies = []
+    lock = threading.Lock()
+
+    def one_request():
+        start = time.perf_counter()
+        if manager is None:
+            pipeline.search(pipeline.embed())
+            pipeline.generate()
+        else:
+            query = manager.run("embedding", pipeline.embed)
+            manager.run("retrieval", pipeline.search, query)
+            manager.run("generation", pipeline.generate)
+        with lock:
+            latencies.append(time.perf_counter() - start)
+
+    def client():
+        for _ in range(requests_per_client):
+            one_request()
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    return {
+        "clients": clients,
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clients", default="1,2,4,8", help="Comma-separated concurrency levels.")
+    parser.add_argument("--requests", type=int, default=20, help="Requests per client.")
+    parser.add_argument("--num-vectors", type=int, default=100_000)
+    args = parser.parse_args()
+
+    pipeline = SyntheticPipeline(args.num_vectors)
+    levels = [int(c) for c in args.clients.split(",")]
+
+    default_threads = torch.get_num_threads()
+    unpartitioned = [run_load(pipeline, c, args.requests) for c in levels]
+    torch.set_num_threads(default_threads)
+
+    manager = ResourceManager()
+    partitioned = [run_load(pipeline, c, args.requests, manager=manager) for c in levels]
+    manager.shutdown()
+
+    print(json.dumps({
+        "cores": os.cpu_count(),
+        "stage_budgets": manager.stats(),
+        "unpartitioned": unpartitioned,
+        "partitioned": partitioned,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+"""
+Open-loop load test: replays the golden dataset's questions (plus
+synthetic rephrasings) at a fixed Poisson arrival rate, for each rate in
+--rates, and reports throughput, latency percentiles and error/shed
+rates per rate.
+
+Open loop means arrivals don't wait for earlier answers, as with real
+users; latency is measured from each request's scheduled arrival time,
+so a stalled client or server still shows up in the tail (no
+coordinated omission).
+
+Targets:
+  - in-process (default): a fresh AdmissionController per rate over an
+    ingested --pdf, so queueing, shedding and degradation are the real
+    ones. --stub swaps in utils/stub_models.py's deterministic embedder
+    and generator (no downloads; --stub-generation-ms sets their CPU
+    cost) -- useful for the queueing side, not for real latencies.
+  - --url: POSTs {"question": ...} as JSON to a local HTTP endpoint;
+    2xx is success, 429/503 count as shed, anything else as an error.
+    The repo itself only ships the Streamlit UI, so this is for a
+    service fronting the same pipeline.
+
+Usage:
+    python scripts/load_test.py --stub --rates 1,2,4,8 --duration 20
+    python scripts/load_test.py --rates 0.2,0.5,1 --duration 60
+    python scripts/load_test.py --url http://localhost:8000/ask --rates 1,2,4
+
+Writes evals/results/load_<timestamp>.json and prints the same report.
+"""
+
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from evals.run_eval import GOLDEN_DATASET_PATH, RESULTS_DIR, load_golden_dataset
+
+DEFAULT_PDF = Path(__file__).resolve().parent.parent / "data" / "sample_pdfs" / "software_developers_onet_summary.pdf"
+
+_VARIANT_TEMPLATES = (
+    "{lower}",
+    "Can you tell me: {q}",
+    "{bare} please",
+    "Quick question -- {lower}",
+    "According to the document, {lower}",
+)
+
+
+def question_pool(cases, variants):
+    """Golden questions, each followed by up to `variants` rephrasings."""
+    pool = []
+    for case in cases:
+        q = case["question"]
+        pool.append(q)
+        fields = {"q": q, "lower": q[0].lower() + q[1:], "bare": q.rstrip("?. ")}
+        pool.extend(t.format(**fields) for t in _VARIANT_TEMPLATES[:variants])
+    return pool
+
+
+def arrival_times(rate, duration_s, rng):
+    """Poisson arrivals: exponential gaps with mean 1/rate, within duration_s."""
+    times, t = [], rng.expovariate(rate)
+    while t < duration_s:
+        times.append(t)
+        t += rng.expovariate(rate)
+    return times
+
+
+class InProcessTarget:
+    def __init__(self, pdf_path, workers, max_queue, deadline_s):
+        from src.services.ingestion import ingest_pdf_document
+        from src.services.retrieval import build_index
+        from src.services.sections import SectionIndex
+        from src.config import HIERARCHICAL_RETRIEVAL
+
+        with open(pdf_path, "rb") as f:
+            self.store, self.list_index = ingest_pdf_document(f)
+        self.index, embeddings = build_index(self.store)
+        self.sections = SectionIndex.build(self.store.meta, embeddings) if HIERARCHICAL_RETRIEVAL else None
+        self.workers = workers
+        self.max_queue = max_queue
+        self.deadline_s = deadline_s
+        self.controller = None
+
+    def start(self):
+        from src.services.admission import AdmissionController
+        self.controller = AdmissionController(max_queue=self.max_queue, workers=self.workers)
+
+    def send(self, question, on_done):
+        """Submit without blocking; on_done(outcome) is called once the request finishes."""
+        from src.services.admission import Overloaded
+
+        def finished(future):
+            error = future.exception()
+            if error is None:
+                degraded = future.result()[3].get("admission", {}).get("degraded", False)
+                on_done("degraded" if degraded else "completed")
+            else:
+                on_done("shed" if isinstance(error, Overloaded) else "failed")
+
+        try:
+            future = self.controller.submit(
+                self.index, self.store, question, deadline_s=self.deadline_s,
+                sections=self.sections, list_index=self.list_index,
+            )
+        except Overloaded:
+            on_done("rejected")
+            return
+        future.add_done_callback(finished)
+
+    def stop(self):
+        self.controller.close()
+
+
+class HttpTarget:
+    def __init__(self, url, timeout_s, max_connections):
+        self.url = url
+        self.timeout_s = timeout_s
+        self.max_connections = max_connections
+        self._pool = None
+
+    def start(self):
+        self._pool = ThreadPoolExecutor(max_workers=self.max_connections)
+
+    def _post(self, question):
+        request = urllib.request.Request(
+            self.url, data=json.dumps({"question": question}).encode("utf-8"),
+            headers={"Content-Type": "application/json"}, method="POST",
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout_s) as response:
+                response.read()
+            return "completed"
+        except urllib.error.HTTPError as e:
+            return "shed" if e.code in (429, 503) else "failed"
+        except (urllib.error.URLError, TimeoutError, OSError):
+            return "failed"
+
+    def send(self, question, on_done):
+        self._pool.submit(lambda: on_done(self._post(question)))
+
+    def stop(self):
+        self._pool.shutdown(wait=True)
+
+
+def run_rate(target, rate, duration_s, questions, rng, drain_timeout_s):
+    schedule = arrival_times(rate, duration_s, rng)
+    records = []
+    lock = threading.Lock()
+    all_done = threading.Event()
+    if not schedule:
+        all_done.set()
+
+    target.start()
+    start = time.perf_counter()
+    for scheduled in schedule:
+        delay = start + scheduled - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        arrival = start + scheduled
+
+        def on_done(outcome, arrival=arrival):
+            with lock:
+                records.append((outcome, (time.perf_counter() - arrival) * 1000, time.perf_counter() - start))
+                if len(records) == len(schedule):
+                    all_done.set()
+
+        target.send(rng.choice(questions), on_done)
+
+    drained = all_done.wait(timeout=drain_timeout_s)
+    target.stop()
+    return summarize_rate(rate, duration_s, len(schedule), list(records), drained)
+
+
+def summarize_rate(rate, duration_s, sent, records, drained):
+    by_outcome = {}
+    for outcome, _, _ in records:
+        by_outcome[outcome] = by_outcome.get(outcome, 0) + 1
+    answered = [(ms, at) for outcome, ms, at in records if outcome in ("completed", "degraded")]
+    latencies = [ms for ms, _ in answered]
+    # Throughput over the time it actually took to answer them, which
+    # exceeds duration_s once the server falls behind.
+    span_s = max([duration_s] + [at for _, at in answered])
+
+    def pct(p):
+        return round(float(np.percentile(latencies, p)), 1) if latencies else None
+
+    return {
+        "offered_rps": rate,
+        "sent": sent,
+        "answered": len(answered),
+        "throughput_rps": round(len(answered) / span_s, 3) if span_s else 0,
+        "p50_ms": pct(50),
+        "p95_ms": pct(95),
+        "p99_ms": pct(99),
+        "outcomes": by_outcome,
+        "shed_rate": round((by_outcome.get("rejected", 0) + by_outcome.get("shed", 0)) / sent, 3) if sent else 0,
+        "degraded_rate": round(by_outcome.get("degraded", 0) / sent, 3) if sent else 0,
+        "error_rate": round(by_outcome.get("failed", 0) / sent, 3) if sent else 0,
+        "unfinished": sent - len(records),
+        "drained": drained,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rates", default="0.5,1,2,4", help="Comma-separated arrival rates (requests/s).")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of arrivals per rate.")
+    parser.add_argument("--dataset", default=str(GOLDEN_DATASET_PATH))
+    parser.add_argument("--variants", type=int, default=2, help="Synthetic rephrasings per golden question.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--drain-timeout", type=float, default=120.0,
+                        help="Seconds to wait for in-flight requests after the last arrival.")
+    parser.add_argument("--pdf", default=str(DEFAULT_PDF), help="Document to ask about (in-process target).")
+    parser.add_argument("--workers", type=int, default=None, help="Admission workers (default: config).")
+    parser.add_argument("--max-queue", type=int, default=None, help="Admission queue bound (default: config).")
+    parser.add_argument("--deadline", type=float, default=None, help="Per-request deadline in s (default: config).")
+    parser.add_argument("--stub", action="store_true", help="Use the deterministic stub embedder and generator.")
+    parser.add_argument("--stub-embedding-ms", type=float, default=2.0, help="Stub CPU cost per embedded text.")
+    parser.add_argument("--stub-generation-ms", type=float, default=400.0, help="Stub CPU cost per generation.")
+    parser.add_argument("--request-log", action="store_true", help="Also write load-test requests to the request log.")
+    parser.add_argument("--url", help="POST questions to this HTTP endpoint instead of the in-process services.")
+    parser.add_argument("--timeout", type=float, default=60.0, help="HTTP request timeout in s.")
+    parser.add_argument("--max-connections", type=int, default=64, help="Concurrent HTTP requests.")
+    args = parser.parse_args()
+
+    questions = question_pool(load_golden_dataset(args.dataset), args.variants)
+    rng = random.Random(args.seed)
+
+    if args.url:
+        target = HttpTarget(args.url, args.timeout, args.max_connections)
+    else:
+        from src.config import ADMISSION_WORKERS, ADMISSION_MAX_QUEUE
+        import src.services.admission as admission
+
+        if args.stub:
+            from utils.stub_models import install_stub_models
+            install_stub_models(embedding_ms_per_text=args.stub_embedding_ms, generation_ms=args.stub_generation_ms)
+        if not args.request_log:
+            admission.log_request = lambda *a, **k: None
+        print(f"Ingesting {args.pdf} ...", file=sys.stderr)
+        target = InProcessTarget(
+            args.pdf,
+            workers=args.workers or ADMISSION_WORKERS,
+            max_queue=args.max_queue or ADMISSION_MAX_QUEUE,
+            deadline_s=args.deadline,
+        )
+
+    runs = []
+    for rate in (float(r) for r in args.rates.split(",")):
+        print(f"Offered load {rate} req/s for {args.duration}s ...", file=sys.stderr)
+        runs.append(run_rate(target, rate, args.duration, questions, rng, args.drain_timeout))
+
+    report = {
+        "target": args.url or ("in-process (stub models)" if args.stub else "in-process"),
+        "duration_s": args.duration,
+        "questions": len(questions),
+        "seed": args.seed,
+        "runs": runs,
+    }
+    print(json.dumps(report, indent=2))
+
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    timestamp = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
+    out_path = RESULTS_DIR / f"load_{timestamp}.json"
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Full results written to {out_path}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
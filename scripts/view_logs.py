@@ -0,0 +1,161 @@
+"""
+Summarize the structured request log (logs/requests.jsonl plus its
+gzipped rotations) without loading it into memory: one streaming pass
+that keeps a log-bucketed latency histogram per timing field, counters
+by path / label / outcome, and a fixed-size heap of the slowest
+requests.
+
+Percentiles come from the histogram, so they are accurate to the bucket
+width (~5%), which is plenty for spotting a p95 regression.
+
+Usage:
+    python scripts/view_logs.py                      # logs/requests.jsonl*
+    python scripts/view_logs.py --slowest 20 --json
+    python scripts/view_logs.py path/to/requests.jsonl.3.gz
+"""
+
+import argparse
+import glob
+import gzip
+import heapq
+import json
+import math
+import re
+import sys
+from collections import Counter, defaultdict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.config import REQUEST_LOG_PATH
+
+# Bucket i covers [_GROWTH**i, _GROWTH**(i+1)) milliseconds.
+_GROWTH = 1.05
+_PERCENTILES = (50, 90, 95, 99)
+
+
+class LatencyHistogram:
+    def __init__(self):
+        self.buckets = Counter()
+        self.count = 0
+        self.max = 0.0
+
+    def add(self, ms):
+        self.buckets[math.floor(math.log(max(ms, 0.01), _GROWTH))] += 1
+        self.count += 1
+        self.max = max(self.max, ms)
+
+    def percentile(self, pct):
+        if not self.count:
+            return None
+        rank = pct / 100 * self.count
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                # Geometric midpoint of the bucket, capped at the true max.
+                return round(min(_GROWTH ** (bucket + 0.5), self.max), 1)
+        return round(self.max, 1)
+
+
+def log_files(paths):
+    """Files oldest-first: highest rotation number first, live file last."""
+    if not paths:
+        paths = glob.glob(REQUEST_LOG_PATH + "*")
+
+    def rotation(path):
+        match = re.search(r"\.(\d+)(\.gz)?$", path)
+        return -int(match.group(1)) if match else 0
+
+    return sorted(paths, key=rotation)
+
+
+def read_records(paths):
+    for path in paths:
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # a line cut short by a crash mid-write
+
+
+def summarize(records, slowest=10):
+    histograms = defaultdict(LatencyHistogram)
+    counters = {"path": Counter(), "label": Counter(), "outcome": Counter()}
+    slow_heap = []  # min-heap of (total_ms, seq, record), size <= slowest
+    total = 0
+
+    for seq, record in enumerate(records):
+        total += 1
+        for field in counters:
+            if record.get(field) is not None:
+                counters[field][record[field]] += 1
+        timings = record.get("timings") or {}
+        for name, ms in timings.items():
+            histograms[name].add(ms)
+        total_ms = timings.get("total_ms")
+        if total_ms is not None and slowest:
+            item = (total_ms, seq, record)
+            if len(slow_heap) < slowest:
+                heapq.heappush(slow_heap, item)
+            elif total_ms > slow_heap[0][0]:
+                heapq.heapreplace(slow_heap, item)
+
+    return {
+        "requests": total,
+        "latency_ms": {
+            name: {
+                "count": h.count,
+                **{f"p{p}": h.percentile(p) for p in _PERCENTILES},
+                "max": round(h.max, 1),
+            }
+            for name, h in sorted(histograms.items())
+        },
+        **{f"by_{field}": dict(counter.most_common()) for field, counter in counters.items()},
+        "slowest": [record for _, _, record in sorted(slow_heap, reverse=True)],
+    }
+
+
+def print_summary(summary):
+    print(f"Requests: {summary['requests']}")
+    print()
+    print(f"{'stage':<16}{'count':>8}" + "".join(f"{'p' + str(p):>10}" for p in _PERCENTILES) + f"{'max':>10}")
+    for name, stats in summary["latency_ms"].items():
+        print(f"{name:<16}{stats['count']:>8}"
+              + "".join(f"{stats['p' + str(p)]:>10}" for p in _PERCENTILES) + f"{stats['max']:>10}")
+    for field in ("outcome", "path", "label"):
+        counts = summary[f"by_{field}"]
+        if counts:
+            print()
+            print(f"By {field}: " + ", ".join(f"{k}={v}" for k, v in counts.items()))
+    if summary["slowest"]:
+        print()
+        print("Slowest requests:")
+        for record in summary["slowest"]:
+            print(f"  {record['timings']['total_ms']:>9.1f} ms  query={record.get('query_hash')}"
+                  f"  doc={record.get('doc_id')}  path={record.get('path')}  request={record.get('request_id')}")
+            for artifact in (record.get("profile") or {}).get("artifacts", []):
+                print(f"               profile: {artifact}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("paths", nargs="*", help=f"Log files (default: {REQUEST_LOG_PATH}*).")
+    parser.add_argument("--slowest", type=int, default=10, help="How many slowest requests to list.")
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON.")
+    args = parser.parse_args()
+
+    summary = summarize(read_records(log_files(args.paths)), slowest=args.slowest)
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print_summary(summary)
+
+
+if __name__ == "__main__":
+    main()
@@ -49,5 +49,253 @@ MAX_CONTEXT_CHARS = 2000
 MAX_INPUT_TOKENS = 1024
 MAX_NEW_TOKENS = 250
 
+# Tokenize chunks once at ingest with the generator's tokenizer and keep
+# the ids with the chunk store (utils/chunk_tokens.py), so each prompt
+# is assembled from cached ids and only the question is tokenized. The
+# prompt then cuts the context at MAX_CONTEXT_CHARS on a token boundary
+# instead of mid-word. Compressed contexts (CONTEXT_COMPRESSION) are
+# still tokenized per request.
+PRETOKENIZED_CHUNKS = True
+
+# Query-focused context compression (src/services/compression.py): on
+# the generation path, the retrieved chunks are reduced to the sentences
+# sharing query words, packed into MAX_CONTEXT_CHARS in document order,
+# instead of the whole chunks being cut at MAX_CONTEXT_CHARS. Off by
+# default until the golden-set pass rate is re-measured with it on --
+# lexical sentence selection can drop an answer sentence that refers
+# to the subject only by pronoun.
+CONTEXT_COMPRESSION = False
+
 CONFIDENCE_HIGH_THRESHOLD = 0.80
-CONFIDENCE_MEDIUM_THRESHOLD = 0.65
\ No newline at end of file
+CONFIDENCE_MEDIUM_THRESHOLD = 0.65
+
+# Adaptive generation: most golden-set questions want a short factual
+# span, yet every call allowed MAX_NEW_TOKENS with the repetition
+# penalty and no_repeat_ngram_size processors running at every decoding
+# step. When enabled, factoid (non-list) questions get a small token
+# budget, stop at the first completed sentence, and skip those
+# processors (a one-sentence answer has nothing to repeat); list-style
+# questions keep the full budget since their answer spans many lines.
+# Off by default until measured -- compare with:
+#   python evals/run_eval.py --pdf <pdf> --compare-adaptive
+ADAPTIVE_GENERATION = False
+FACTOID_MAX_NEW_TOKENS = 48
+LIST_MAX_NEW_TOKENS = MAX_NEW_TOKENS
+
+# Optional draft model for assisted (speculative) decoding in adaptive
+# mode: the draft proposes several tokens per step and the main model
+# verifies them in one forward pass, so greedy output is unchanged but
+# fewer full-size decoder passes run. Must share the generator's
+# tokenizer -- e.g. "google/flan-t5-small" for the flan-t5 family.
+# None disables it.
+DRAFT_MODEL_NAME = None
+
+# Encoder-output reuse: the prompt is laid out as a question-independent
+# prefix (instructions + context) followed by the question, and with
+# ENCODER_CACHE_ENABLED the prefix's encoder hidden states are cached by
+# a hash of that prefix and concatenated with a fresh encoding of the
+# question part. Consecutive questions that retrieve the same context
+# then skip re-encoding it. Caveat: T5's encoder is bidirectional, so
+# encoding the two segments separately is NOT bit-identical to encoding
+# the whole prompt (context tokens no longer attend to the question and
+# vice versa) -- a Fusion-in-Decoder-style approximation, which is why
+# it's opt-in. Measure both the time saved and the pass-rate change with:
+#   python evals/run_eval.py --pdf <pdf> --encoder-cache
+ENCODER_CACHE_ENABLED = False
+# flan-t5-base: ~3KB per token (768 float32s), so 64MB holds ~40 full
+# MAX_CONTEXT_CHARS contexts.
+ENCODER_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# What answer_question does when the out-of-scope gate (no rare query
+# word overlaps the top chunk -- see generation._has_rare_word_overlap)
+# already says the answer will be labeled "Low". That gate is computed
+# BEFORE generation, so failing questions can skip seconds of T5 time:
+#   "off"        -- generate anyway (original behavior)
+#   "refuse"     -- skip generation, return the not-available answer
+#   "extractive" -- skip generation, return the best-overlapping
+#                   sentence from the retrieved chunks
+# The path taken is reported in answer_question's details["path"].
+FAST_PATH_POLICY = "off"
+
+# Persistent cross-document passage-embedding cache (utils/embedding_cache.py):
+# boilerplate that appears verbatim in many PDFs is encoded once per
+# embedding model and then served from disk. None disables it -- on the
+# free HF Space the filesystem is ephemeral, so there it only helps
+# within one container's lifetime. e.g. "data/embedding_cache"
+EMBEDDING_CACHE_DIR = None
+
+# Passage-embedding batching (utils/embeddings.py). Chunk lengths range
+# from a few words to list units far above CHUNK_SIZE, so large inputs
+# are ordered by TOKEN length and encoded in batches of similar length,
+# with the batch size picked by a short calibration over the first
+# slices of the corpus (their embeddings are kept, not thrown away).
+# None = auto-calibrate; an int pins the batch size.
+EMBEDDING_BATCH_SIZE = None
+EMBEDDING_BATCH_CANDIDATES = (8, 16, 32, 64)
+# Below this many texts a single encode() call is already cheap, and
+# calibration would cost more than it saves.
+EMBEDDING_BUCKETING_MIN_TEXTS = 256
+
+# Sharded FAISS search (utils/retriever.ShardedIndex). 1 = a single flat
+# index, as before. Worth raising only once the corpus is large enough
+# that one flat scan per query dominates retrieval latency -- measure
+# with scripts/bench_sharded_search.py on the target machine first.
+# Not combinable with EMBEDDING_REDUCED_DIM: building an index with both
+# set raises ValueError.
+FAISS_NUM_SHARDS = 1
+# OpenMP threads each shard search may use; None = cores / shards.
+FAISS_OMP_THREADS_PER_SHARD = None
+
+# CPU partitioning between pipeline stages (src/services/resources.py).
+# Torch (e5 and T5) and FAISS/OpenMP each default to using every core,
+# so two concurrent requests in one process oversubscribe the CPU and
+# both slow down far more than 2x. With RESOURCE_PARTITIONING on, each
+# stage runs on its own executor whose threads are capped at a share of
+# the cores, and each executor bounds how many calls of that stage run
+# at once. Shares are fractions of os.cpu_count() (min 1 thread each).
+RESOURCE_PARTITIONING = False
+STAGE_THREAD_SHARES = {"embedding": 0.25, "retrieval": 0.25, "generation": 0.5}
+STAGE_CONCURRENCY = {"embedding": 2, "retrieval": 2, "generation": 1}
+# torch inter-op pool size; can only be set once per process, before
+# any inter-op parallel work has run.
+TORCH_INTEROP_THREADS = 1
+
+# Admission control (src/services/admission.py). Requests wait in one
+# bounded priority queue in front of a fixed number of pipeline
+# workers; a full queue rejects immediately with a retry-after hint
+# instead of letting every user's wait grow without limit.
+ADMISSION_MAX_QUEUE = 16
+ADMISSION_WORKERS = 1
+# Default per-request deadline. A request still queued at its deadline
+# is shed; one whose remaining time can't cover the estimated
+# generation time is answered without generation (degraded).
+REQUEST_DEADLINE_S = 30.0
+# Starting estimate for generation time, refined by a moving average
+# of measured generations (flan-t5-base on the free CPU tier).
+ADMISSION_GENERATION_ESTIMATE_S = 2.0
+
+# Structured request log (src/services/request_log.py): one JSON line
+# per answered request, written by a background thread so requests
+# never wait on disk. The file rotates at REQUEST_LOG_MAX_BYTES and
+# rotated files are gzipped (requests.jsonl.1.gz, ...); read them
+# with scripts/view_logs.py.
+REQUEST_LOG_ENABLED = True
+REQUEST_LOG_PATH = "logs/requests.jsonl"
+REQUEST_LOG_MAX_BYTES = 10 * 1024 * 1024
+REQUEST_LOG_BACKUPS = 5
+# Records waiting for the writer thread. If disk stalls long enough to
+# fill this, new records are dropped (and counted) instead of blocking.
+REQUEST_LOG_QUEUE_SIZE = 10_000
+
+# Coarse-to-fine retrieval (src/services/sections.py): rank the
+# document's sections by centroid embedding first, then search only the
+# chunks of the best SECTION_TOP_K sections. Off by default until it is
+# validated on the golden dataset; documents with fewer than
+# HIERARCHICAL_MIN_SECTIONS detected sections always use the flat search,
+# since narrowing 2-3 sections saves nothing and risks dropping the
+# right one.
+HIERARCHICAL_RETRIEVAL = False
+SECTION_TOP_K = 3
+HIERARCHICAL_MIN_SECTIONS = 4
+
+# PCA reduction of stored passage vectors (utils/retriever.
+# create_reduced_index): None keeps the full 768-dim e5 vectors;
+# e.g. 256 cuts index memory and flat-search cost ~3x. The projection
+# is trained on the document's own embeddings (at most
+# PCA_TRAIN_SAMPLE of them). Measure recall@k for a target dimension
+# with scripts/bench_pca.py before turning it on. Not combinable with
+# FAISS_NUM_SHARDS > 1 (building an index with both set raises ValueError).
+EMBEDDING_REDUCED_DIM = None
+PCA_TRAIN_SAMPLE = 20_000
+
+# Document manager (src/services/sessions.py). Total bytes of chunk
+# text, metadata and FAISS indexes kept in memory across ALL sessions;
+# least recently used documents beyond it are dropped from memory and
+# reloaded from SESSION_SPILL_DIR on next use. 512MB leaves room for the
+# ~1.2GB of e5 + flan-t5 weights on a 2GB instance. A None spill dir
+# means evicted documents must be re-ingested.
+SESSION_MEMORY_BUDGET_BYTES = 512 * 1024 * 1024
+SESSION_SPILL_DIR = "data/doc_cache"
+# A session that hasn't opened its document for this long is detached,
+# so its document becomes idle (evicted first). The app re-opens the
+# document on every rerun, so this is time since the user's last
+# interaction. None never expires sessions.
+SESSION_TTL_S = 30 * 60
+# Disk cap for SESSION_SPILL_DIR. Past it, spilled documents that are
+# not loaded or attached to a session are deleted, least recently used
+# first, and must be re-ingested if uploaded again. None keeps them all.
+SESSION_SPILL_MAX_BYTES = 2 * 1024 * 1024 * 1024
+
+# Upload handling (utils/upload.py): uploads that arrive as a plain
+# stream are held in memory up to this size and spooled to a temp file
+# (then memory-mapped) beyond it. None spool dir = the system temp dir.
+UPLOAD_SPOOL_THRESHOLD_BYTES = 4 * 1024 * 1024
+UPLOAD_SPOOL_DIR = None
+
+# Isolated PDF parsing (src/services/pdf_workers.py): text extraction
+# runs in spawned worker processes with per-page and per-document time
+# limits and an address-space cap, so a pathological PDF costs at most
+# PDF_DOCUMENT_TIMEOUT_S of one worker instead of stalling the app.
+# Pages that hit a limit are skipped and reported; False parses in the
+# calling thread as before (utils.loader.load_pdf_pages).
+PDF_ISOLATED_PARSING = True
+PDF_PARSE_WORKERS = 2
+PDF_PAGE_TIMEOUT_S = 10.0
+PDF_DOCUMENT_TIMEOUT_S = 60.0
+# Growth allowed past the worker's startup address space; a 20MB PDF
+# that legitimately needs more than this is not one we want to serve.
+PDF_WORKER_MEMORY_LIMIT_BYTES = 1024 * 1024 * 1024
+# A worker is replaced after this many documents, or once its peak RSS
+# passes the byte limit.
+PDF_WORKER_MAX_JOBS = 50
+PDF_WORKER_RECYCLE_RSS_BYTES = 512 * 1024 * 1024
+
+# Precomputed answers (src/services/precompute.py): after a document is
+# ingested, a background job answers questions derived from its section
+# and list headings, and live questions whose query embedding is at
+# least PRECOMPUTE_MATCH_THRESHOLD cosine-similar to one of them get
+# that answer without retrieval or generation. e5 query embeddings of
+# unrelated questions about the same document routinely score 0.8+, so
+# the threshold has to be close to a paraphrase -- tune it from the
+# request log before lowering it. Off by default: the job spends CPU on
+# questions that may never be asked.
+PRECOMPUTE_ANSWERS = False
+PRECOMPUTE_MAX_QUESTIONS = 16
+PRECOMPUTE_MATCH_THRESHOLD = 0.95
+# How often the job re-checks whether live requests are queued or running.
+PRECOMPUTE_IDLE_POLL_S = 0.5
+
+# Multi-process generation (src/services/worker_pool.py). With N > 1,
+# the process loads e5 and flan-t5 once, freezes the GC, and forks N
+# generation workers that share the weights copy-on-write, instead of N
+# independently started servers holding ~1.2GB of weights each.
+# Generation calls are dispatched to the workers; retrieval and the
+# indexes stay in the parent. Linux/macOS only (needs fork).
+GENERATION_WORKERS = 1
+# torch threads per generation worker (None = cores // workers, min 1).
+GENERATION_WORKER_THREADS = None
+# A generation call running longer than this is abandoned and its worker
+# killed (TimeoutError); well past REQUEST_DEADLINE_S, so it only
+# catches hung workers. Dead workers are looked for this often.
+GENERATION_WORKER_TIMEOUT_S = 120.0
+GENERATION_WORKER_LIVENESS_S = 1.0
+
+# On-demand request profiling (src/services/profiling.py). A profiled
+# request writes a cProfile of its retrieval + answering and a torch
+# profiler Chrome trace of its generation call to PROFILE_DIR, named by
+# the request id in the request log. Requests can ask for it
+# explicitly; beyond that, this fraction of requests is sampled (0 =
+# only on request). cProfile adds roughly 10-30% to the Python side of a
+# request and little to time spent inside torch, so a rate like 0.01
+# can stay on in production.
+PROFILE_SAMPLE_RATE = 0.0
+PROFILE_DIR = "logs/profiles"
+# False skips the torch profiler trace (cProfile only).
+PROFILE_GENERATION = True
+# Oldest artifacts beyond this many are deleted (None = keep all).
+PROFILE_MAX_FILES = 200
+# Whether ?profile=1 in the Streamlit URL profiles that request. Off by
+# default: the app has no auth, so anyone could otherwise make every
+# request pay the profiler's overhead and fill PROFILE_DIR. Turn it on
+# only where the UI is reachable by trusted users.
+PROFILE_ALLOW_QUERY_PARAM = False
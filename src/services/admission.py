@@ -0,0 +1,300 @@
+"""
+Request lifecycle layer around retrieve + answer_question: per-request
+deadlines, a bounded priority queue, and load shedding.
+
+A burst of questions against the CPU-bound T5 generator used to queue
+without limit, so every user waited and client timeouts cascaded.
+Here, each request is:
+
+  - rejected immediately with a retry-after hint when the queue is
+    full (an interactive request may instead displace a queued
+    background one),
+  - shed if it is still waiting when its deadline passes,
+  - degraded -- answered by an extractive sentence, no generation --
+    when the time left can't cover the estimated generation time (a
+    question answered without the generator anyway, e.g. by list
+    extraction, isn't degraded),
+  - answered from the document's precomputed answers when the query
+    matches one of its likely questions (src/services/precompute.py),
+  - otherwise answered normally.
+
+Counters for each outcome are exposed via stats(). Every request gets a
+request id (in its log record and details["request_id"]); a request
+submitted with profile=True, or sampled at config.PROFILE_SAMPLE_RATE,
+is profiled under that id (src/services/profiling.py).
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import nullcontext
+
+from src.services.retrieval import retrieve, embed_query
+from src.services.generation import answer_question
+from src.services.request_log import log_request
+from src.services.profiling import RequestProfile, new_request_id, should_profile
+from src.config import (
+    ADMISSION_MAX_QUEUE,
+    ADMISSION_WORKERS,
+    REQUEST_DEADLINE_S,
+    ADMISSION_GENERATION_ESTIMATE_S,
+)
+
+# Lower value = served first.
+PRIORITY_CLASSES = {"interactive": 0, "background": 1}
+
+# Weight of the newest measurement in the generation-time moving average.
+_EWMA_ALPHA = 0.3
+
+
+class Overloaded(Exception):
+    """The request was rejected or shed; retry after `retry_after_s` seconds."""
+
+    def __init__(self, message, retry_after_s):
+        super().__init__(message)
+        self.retry_after_s = retry_after_s
+
+
+class _Request:
+    def __init__(self, index, chunks, query, deadline, priority, doc_id, sections, answer_kwargs,
+                 query_embedding=None, precomputed=None, profile=None):
+        self.request_id = new_request_id()
+        self.index = index
+        self.chunks = chunks
+        self.query = query
+        self.deadline = deadline
+        self.priority = priority
+        self.doc_id = doc_id
+        self.sections = sections
+        self.answer_kwargs = answer_kwargs
+        self.query_embedding = query_embedding
+        self.precomputed = precomputed
+        self.profile = RequestProfile(self.request_id) if should_profile(profile) else None
+        self.enqueued_at = time.monotonic()
+        self.future = Future()
+
+
+class AdmissionController:
+    def __init__(self, max_queue=ADMISSION_MAX_QUEUE, workers=ADMISSION_WORKERS,
+                 default_deadline_s=REQUEST_DEADLINE_S,
+                 generation_estimate_s=ADMISSION_GENERATION_ESTIMATE_S):
+        self.max_queue = max_queue
+        self.num_workers = workers
+        self.default_deadline_s = default_deadline_s
+        self._generation_estimate_s = generation_estimate_s
+        self._request_estimate_s = generation_estimate_s
+
+        self._heap = []  # (priority, deadline, seq, request)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._closed = False
+        self.counters = {
+            "admitted": 0, "rejected": 0, "shed": 0, "degraded": 0,
+            "completed": 0, "failed": 0, "precomputed": 0, "cancelled": 0,
+        }
+        self._in_flight = 0
+
+        self._workers = [
+            threading.Thread(target=self._worker_loop, name=f"admission-worker-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def _retry_after_s(self):
+        # Roughly how long until the current backlog drains.
+        return round((len(self._heap) + 1) * self._request_estimate_s / self.num_workers, 1)
+
+    def submit(self, index, chunks, query, deadline_s=None, priority="interactive", doc_id=None,
+               sections=None, query_embedding=None, precomputed=None, profile=None, **answer_kwargs):
+        """
+        Queue a question; returns a Future resolving to answer_question's
+        (answer, context, confidence_label, details). Raises Overloaded
+        right away if the request can't be admitted. `doc_id` only labels
+        the request in the request log; `sections` and `query_embedding`
+        are passed to retrieve(). With `precomputed` (the document's
+        PrecomputedAnswers), a query matching a precomputed question is
+        answered from it. profile=True profiles the request, False never
+        does, None samples at config.PROFILE_SAMPLE_RATE.
+        """
+        if priority not in PRIORITY_CLASSES:
+            raise ValueError(f"Unknown priority {priority!r}; expected one of {tuple(PRIORITY_CLASSES)}.")
+        deadline = time.monotonic() + (self.default_deadline_s if deadline_s is None else deadline_s)
+        request = _Request(
+            index, chunks, query, deadline, PRIORITY_CLASSES[priority], doc_id, sections, answer_kwargs,
+            query_embedding=query_embedding, precomputed=precomputed, profile=profile,
+        )
+
+        with self._cond:
+            if len(self._heap) >= self.max_queue:
+                # Heap order puts the least urgent queued request last.
+                victim = max(self._heap)
+                if victim[0] <= request.priority:
+                    self.counters["rejected"] += 1
+                    log_request(query, doc_id=doc_id, outcome="rejected", request_id=request.request_id)
+                    retry_after = self._retry_after_s()
+                    raise Overloaded(f"Server busy; retry in {retry_after}s.", retry_after)
+                self._heap.remove(victim)
+                heapq.heapify(self._heap)
+                self._shed(victim[3])
+            heapq.heappush(self._heap, (request.priority, request.deadline, next(self._seq), request))
+            self.counters["admitted"] += 1
+            self._cond.notify()
+        return request.future
+
+    def handle(self, index, chunks, query, deadline_s=None, priority="interactive", doc_id=None,
+               sections=None, query_embedding=None, precomputed=None, profile=None, **answer_kwargs):
+        """submit() and wait for the result (raises Overloaded if shed)."""
+        return self.submit(
+            index, chunks, query, deadline_s=deadline_s, priority=priority, doc_id=doc_id,
+            sections=sections, query_embedding=query_embedding, precomputed=precomputed, profile=profile,
+            **answer_kwargs
+        ).result()
+
+    def _shed(self, request):
+        # Caller holds self._cond.
+        if not request.future.set_running_or_notify_cancel():
+            self.counters["cancelled"] += 1  # the caller gave up on it already
+            return
+        self.counters["shed"] += 1
+        log_request(request.query, doc_id=request.doc_id, outcome="shed", request_id=request.request_id,
+                    queue_ms=round((time.monotonic() - request.enqueued_at) * 1000, 1))
+        retry_after = self._retry_after_s()
+        request.future.set_exception(Overloaded(f"Request shed under load; retry in {retry_after}s.", retry_after))
+
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                while not self._heap and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                request = heapq.heappop(self._heap)[3]
+                if time.monotonic() >= request.deadline:
+                    self._shed(request)
+                    continue
+                # The caller may have cancelled the Future while it was
+                # queued; a RUNNING future can't be cancelled any more, so
+                # the set_result/set_exception below can't fail.
+                if not request.future.set_running_or_notify_cancel():
+                    self.counters["cancelled"] += 1
+                    continue
+                self._in_flight += 1
+            try:
+                self._process(request)
+            finally:
+                with self._cond:
+                    self._in_flight -= 1
+
+    def _process(self, request):
+        start = time.monotonic()
+        profiling = request.profile.cpu() if request.profile is not None else nullcontext()
+        try:
+            with profiling:
+                answer_kwargs = dict(request.answer_kwargs)
+                if request.profile is not None:
+                    answer_kwargs["profile"] = request.profile
+                retrieval_timings = {}
+                query_embedding = request.query_embedding
+                hit = None
+                if request.precomputed is not None:
+                    if query_embedding is None:
+                        embed_start = time.perf_counter()
+                        query_embedding = embed_query(request.query)
+                        retrieval_timings["embedding_ms"] = round((time.perf_counter() - embed_start) * 1000, 1)
+                    hit = request.precomputed.match(query_embedding)
+
+                allow_generation = True
+                if hit is not None:
+                    question, similarity, (answer, context, label, details) = hit
+                    details["path"] = "precomputed"
+                    details["precomputed"] = {"question": question, "similarity": round(similarity, 4)}
+                    details["timings"] = {"generation_ms": 0.0}
+                else:
+                    if hasattr(request.chunks, "metadata"):  # a ChunkStore: include citations
+                        results, scores, ids = retrieve(
+                            request.index, request.chunks, request.query, return_ids=True,
+                            timings=retrieval_timings, sections=request.sections, query_embedding=query_embedding,
+                        )
+                        answer_kwargs.setdefault("provenance", request.chunks.metadata(ids))
+                        answer_kwargs.setdefault("chunk_tokens", request.chunks.chunk_tokens(ids))
+                    else:
+                        results, scores = retrieve(
+                            request.index, request.chunks, request.query, timings=retrieval_timings,
+                            sections=request.sections, query_embedding=query_embedding,
+                        )
+
+                    time_left = request.deadline - time.monotonic()
+                    allow_generation = time_left >= self._generation_estimate_s
+                    answer, context, label, details = answer_question(
+                        results, scores, request.query, allow_generation=allow_generation, **answer_kwargs
+                    )
+        except Exception as e:
+            with self._cond:
+                self.counters["failed"] += 1
+            log_request(request.query, doc_id=request.doc_id, outcome="failed", error=type(e).__name__,
+                        request_id=request.request_id, **self._profile_fields(request))
+            request.future.set_exception(e)
+            return
+
+        queue_ms = round((start - request.enqueued_at) * 1000, 1)
+        # What actually happened, not whether generation was allowed: list
+        # and fast-path answers never needed the generator.
+        degraded = details.get("path") == "degraded_extractive"
+        details["admission"] = {"queue_ms": queue_ms, "degraded": degraded}
+        details["timings"] = {
+            "queue_ms": queue_ms,
+            **retrieval_timings,
+            **details["timings"],
+            "total_ms": round((time.monotonic() - request.enqueued_at) * 1000, 1),
+        }
+        details["request_id"] = request.request_id
+        profile_fields = self._profile_fields(request)
+        details.update(profile_fields)
+        log_request(request.query, doc_id=request.doc_id, details=details, label=label, outcome="completed",
+                    request_id=request.request_id, **profile_fields)
+        with self._cond:
+            self.counters["completed"] += 1
+            if degraded:
+                self.counters["degraded"] += 1
+            if hit is not None:
+                self.counters["precomputed"] += 1
+            generation_s = details["timings"]["generation_ms"] / 1000
+            if generation_s > 0:
+                self._generation_estimate_s += _EWMA_ALPHA * (generation_s - self._generation_estimate_s)
+            self._request_estimate_s += _EWMA_ALPHA * ((time.monotonic() - start) - self._request_estimate_s)
+        request.future.set_result((answer, context, label, details))
+
+    @staticmethod
+    def _profile_fields(request):
+        return {"profile": request.profile.info()} if request.profile is not None else {}
+
+    def stats(self):
+        with self._cond:
+            return {
+                **self.counters,
+                "queued": len(self._heap),
+                "in_flight": self._in_flight,
+                "generation_estimate_s": round(self._generation_estimate_s, 3),
+            }
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            while self._heap:
+                self._shed(heapq.heappop(self._heap)[3])
+            self._cond.notify_all()
+
+
+_controller = None
+_controller_lock = threading.Lock()
+
+
+def get_admission_controller():
+    global _controller
+    with _controller_lock:
+        if _controller is None:
+            _controller = AdmissionController()
+        return _controller
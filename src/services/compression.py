@@ -0,0 +1,135 @@
+"""
+Query-focused sentence-level context compression.
+
+build_context joins whole chunks in intent order and generate_answer
+then cuts the result at MAX_CONTEXT_CHARS, so a relevant sentence in the
+third chunk is lost while filler from the first chunk fills the window.
+compress_context instead splits the retrieved chunks into sentences,
+scores every sentence against the query, and packs the best-scoring
+sentences into the character budget, emitted in document order so the
+generator still reads coherent text.
+
+Scoring is lexical, with no encoder calls: each sentence scores the IDF
+(over the retrieved sentences) of the query words it contains, matched
+by word family as everywhere else (utils.word_match._words_match), plus
+a small bonus for coming from a higher-ranked chunk so ties follow
+retrieval order. Sentences sharing no query word are dropped even when
+budget is left. Word-family matching is done once per distinct word,
+and the per-sentence scores are one incidence-matrix product.
+"""
+
+import re
+
+import numpy as np
+
+from utils.word_match import _significant_words, _words_match
+
+# Same boundaries as generation._SENTENCE_SPLIT_PATTERN, captured so a
+# list item (newline-separated) stays on its own line when re-joined.
+_SENTENCE_SPLIT_PATTERN = re.compile(r"((?<=[.!?])\s+|\n+)")
+
+# Small enough to never outweigh one matched query word (IDF >= ~0.4).
+_RANK_BONUS = 0.1
+
+
+def _split_sentences(ordered_chunks, positions):
+    """
+    [(doc_position, sentence_index, chunk_rank, sentence, joiner)] for
+    every non-empty sentence; `joiner` is what separated it from the
+    previous sentence of its chunk ("\n" or " ").
+    """
+    sentences = []
+    for rank, (chunk, position) in enumerate(zip(ordered_chunks, positions)):
+        parts = _SENTENCE_SPLIT_PATTERN.split(chunk.strip())
+        for i in range(0, len(parts), 2):
+            sentence = parts[i].strip()
+            if sentence:
+                joiner = "\n" if i > 0 and "\n" in parts[i - 1] else " "
+                sentences.append((position, i, rank, sentence, joiner))
+    return sentences
+
+
+def score_sentences(sentences, query):
+    """Relevance of each sentence (strings) to `query`, as a float array."""
+    word_sets = [_significant_words(s) for s in sentences]
+    vocab = sorted(set().union(*word_sets)) if word_sets else []
+    query_words = sorted(_significant_words(query))
+    if not vocab or not query_words:
+        return np.zeros(len(sentences))
+
+    # (vocab x query) word-family matches, computed once per distinct word.
+    matches = np.array([[_words_match(q, w) for q in query_words] for w in vocab], dtype=np.float32)
+    column = {w: j for j, w in enumerate(vocab)}
+    incidence = np.zeros((len(sentences), len(vocab)), dtype=np.float32)
+    for row, words in enumerate(word_sets):
+        incidence[row, [column[w] for w in words]] = 1.0
+
+    contains = (incidence @ matches) > 0  # (sentences x query words)
+    df = contains.sum(axis=0)
+    idf = np.log((len(sentences) + 1) / (df + 0.5))
+    return contains.astype(np.float32) @ idf.astype(np.float32)
+
+
+def compress_context(ordered_chunks, query, budget_chars, positions=None, segments=None):
+    """
+    The retrieved chunks compressed to at most `budget_chars` characters
+    of the sentences most relevant to `query`. `positions` are the chunks'
+    document offsets (e.g. provenance char_start) used to emit sentences
+    in document order; without them, context order is used. Returns the
+    chunks joined as-is (build_context's output) when they already fit.
+
+    Returns (context, stats) with stats {"input_chars", "output_chars",
+    "sentences", "sentences_kept"}. If a list is passed as `segments`,
+    it is filled with (chunk_index, text) for each blank-line-separated
+    part of the context, in context order -- chunk_index indexes
+    `ordered_chunks` -- so citations can follow the compressed context,
+    which drops chunks with no kept sentence and reorders the rest.
+    """
+    full = "\n\n".join(chunk.strip() for chunk in ordered_chunks)
+    if positions is None:
+        positions = list(range(len(ordered_chunks)))
+    sentences = _split_sentences(ordered_chunks, positions)
+    stats = {"input_chars": len(full), "sentences": len(sentences)}
+    if len(full) <= budget_chars:
+        if segments is not None:
+            segments.extend((k, chunk.strip()) for k, chunk in enumerate(ordered_chunks))
+        return full, {**stats, "output_chars": len(full), "sentences_kept": len(sentences)}
+
+    lexical = score_sentences([s[3] for s in sentences], query)
+    num_chunks = max(len(ordered_chunks), 1)
+    scores = lexical + _RANK_BONUS * np.array([1 - s[2] / num_chunks for s in sentences])
+    # Sentences sharing no query word are left out rather than used as
+    # filler -- the point is fewer encoder tokens, not a full window.
+    # With no overlap anywhere, fall back to retrieval order.
+    candidates = np.argsort(-scores, kind="stable")
+    if (lexical > 0).any():
+        candidates = [row for row in candidates if lexical[row] > 0]
+
+    # Retrieved chunks overlap (CHUNK_OVERLAP), so a sentence can appear
+    # in two of them; only its first (best-scoring) copy is kept.
+    kept, used, seen = [], 0, set()
+    for row in candidates:
+        key = " ".join(sentences[row][3].lower().split())
+        if key in seen:
+            continue
+        cost = len(sentences[row][3]) + 2  # + worst-case separator
+        if used + cost <= budget_chars + 2:
+            kept.append(row)
+            seen.add(key)
+            used += cost
+    if not kept:
+        # Even the best sentence is over budget: let generate_answer cut it.
+        kept = [int(np.argmax(scores))]
+
+    kept.sort(key=lambda row: sentences[row][:3])
+    parts = []  # [chunk rank, text], one per run of sentences from the same chunk
+    for row in kept:
+        _, _, rank, sentence, joiner = sentences[row]
+        if parts and parts[-1][0] == rank:
+            parts[-1][1] += joiner + sentence
+        else:
+            parts.append([rank, sentence])
+    context = "\n\n".join(text for _, text in parts)
+    if segments is not None:
+        segments.extend((rank, text) for rank, text in parts)
+    return context, {**stats, "output_chars": len(context), "sentences_kept": len(kept)}
@@ -5,10 +5,29 @@ FLAN-T5 generator.
 """
 
 import re
-from utils.generator import generate_answer
+import time
+
+from utils.generator import generate_answer, NOT_AVAILABLE_ANSWER
+from utils.word_match import (
+    _words_match,
+    _word_overlap_count,
+    _has_word_overlap,
+    _significant_words,
+    _chunk_word_sets,
+    _rare_words,
+)
+from src.services.resources import run_in_stage
+from src.services.compression import compress_context
 from src.config import (
     CONFIDENCE_HIGH_THRESHOLD,
     CONFIDENCE_MEDIUM_THRESHOLD,
+    ADAPTIVE_GENERATION,
+    FACTOID_MAX_NEW_TOKENS,
+    LIST_MAX_NEW_TOKENS,
+    FAST_PATH_POLICY,
+    ENCODER_CACHE_ENABLED,
+    CONTEXT_COMPRESSION,
+    MAX_CONTEXT_CHARS,
 )
 
 _LIST_TRIGGER_WORDS = (
@@ -25,95 +44,9 @@ _BULLETED_PATTERN = re.compile(r"^[-*\u2022]\s+.+")
 
 _SHORT_ANSWER_WORD_THRESHOLD = 6
 
-_STOPWORDS = {
-    "the", "a", "an", "is", "are", "was", "were", "what", "which", "who",
-    "does", "do", "did", "this", "that", "for", "of", "to", "in", "on",
-    "and", "or", "with", "required", "role", "job", "most",
-}
-
-# A word (or word FAMILY -- see _words_match) present in more than this
-# fraction of chunks is treated as generic to the document. Lowered from
-# 0.5 based on diagnostic evidence: on the O*NET test document, the
-# document's own subject word "developers" only word-family-matched in
-# 2 of 6 chunks (33%) and "software" matched in exactly 3 of 6 (50%,
-# sitting right on the old boundary) -- both survived the old threshold
-# as "rare/discriminating" despite being the single most generic
-# concept in the whole document, which defeated the out-of-scope
-# refusal check. This fraction is an approximation, not a precise
-# general solution -- a word's frequency doesn't repeat evenly across
-# every section even when it IS the document's core subject, and the
-# right fraction likely depends on document size/structure. A more
-# principled fix (e.g. explicitly excluding the document's own
-# title/subject words) is noted as future work rather than tuned
-# further here.
-_GENERIC_WORD_CHUNK_FRACTION = 0.3
-
-
-def _words_match(word_a, word_b):
-    """
-    Prefix-CONTAINMENT match (shorter word is a genuine prefix of the
-    longer one) -- e.g. "wage"/"wages", "annual"/"annually",
-    "develop"/"developers" all match. Deliberately NOT fixed-length
-    truncation: that approach was found (via the eval harness) to cause
-    false-positive collisions between unrelated words that happen to
-    share the same first few characters, e.g. "companies" and
-    "computers" both truncate to "comp" but share no real relationship.
-    """
-    shorter, longer = (word_a, word_b) if len(word_a) <= len(word_b) else (word_b, word_a)
-    return longer.startswith(shorter)
-
-
-def _word_overlap_count(words_a, words_b):
-    """Count words in words_a that are a prefix-match with any word in words_b."""
-    return sum(1 for wa in words_a if any(_words_match(wa, wb) for wb in words_b))
-
-
-def _has_word_overlap(words_a, words_b):
-    return _word_overlap_count(words_a, words_b) > 0
-
-
-def _significant_words(text):
-    words = re.findall(r"[a-zA-Z']+", text.lower())
-    return {w for w in words if len(w) > 3 and w not in _STOPWORDS}
-
-
-def _chunk_word_sets(chunks):
-    return [_significant_words(c) for c in chunks]
-
-
-def _prefix_match_chunk_count(word, chunk_word_sets):
-    """
-    Count chunks where ANY word prefix-matches `word` -- this clusters
-    word families together (e.g. "develop"/"developers"/"developing"
-    all count toward the same concept) rather than counting each exact
-    token in isolation. Found via the eval harness: exact-token
-    frequency counting missed that "developers" (query) is really the
-    same generic concept as "develop" (appearing in the Overview
-    section), so it wasn't recognized as generic to a document that is
-    entirely about software developers -- letting it through as a
-    "rare/discriminating" word and defeating the out-of-scope refusal
-    check for an unrelated question that happened to mention
-    "developers".
-    """
-    return sum(1 for words in chunk_word_sets if any(_words_match(word, w) for w in words))
-
-
-def _rare_words(words, chunk_word_sets):
-    """
-    Filter a word set down to words that are NOT generic to this
-    document (see _prefix_match_chunk_count). Falls back to the
-    unfiltered set if filtering would eliminate everything, since a
-    very small candidate chunk set otherwise degenerates (every word
-    trivially looks "generic" when there's only one chunk to check
-    against).
-    """
-    total_chunks = len(chunk_word_sets)
-    if total_chunks == 0:
-        return words
-    threshold = _GENERIC_WORD_CHUNK_FRACTION * total_chunks
-    filtered = {w for w in words if _prefix_match_chunk_count(w, chunk_word_sets) <= threshold}
-    return filtered if filtered else words
+_SENTENCE_SPLIT_PATTERN = re.compile(r"(?<=[.!?])\s+|\n+")
 
+FAST_PATH_POLICIES = ("off", "refuse", "extractive")
 
 def _extract_list_from_text(text):
     """
@@ -179,22 +112,47 @@ def _looks_like_list_question(query_lower):
     return bool(_ENUMERATION_PATTERN.search(query_lower))
 
 
-def order_by_intent(chunks, query_lower):
-    """Boost chunks that look like definitions when the query asks 'what is X'."""
+def _intent_order(chunks, query_lower):
+    """Positions of `chunks` in order_by_intent's order (so parallel arrays can follow)."""
     definition_priority, other_chunks = [], []
 
     wants_definition = query_lower.startswith("what is") or query_lower.startswith("define")
 
-    for chunk in chunks:
+    for i, chunk in enumerate(chunks):
         chunk_lower = chunk.lower()
         if wants_definition and (" is a " in chunk_lower or " is an " in chunk_lower):
-            definition_priority.append(chunk)
+            definition_priority.append(i)
         else:
-            other_chunks.append(chunk)
+            other_chunks.append(i)
 
     return definition_priority + other_chunks
 
 
+def order_by_intent(chunks, query_lower):
+    """Boost chunks that look like definitions when the query asks 'what is X'."""
+    return [chunks[i] for i in _intent_order(chunks, query_lower)]
+
+
+def _citations(provenance, order):
+    """
+    One citation per context chunk (in context order), read straight
+    from the ingest-time metadata rows -- no PDF re-parse. Pages are
+    reported 1-based, as a reader would cite them.
+    """
+    citations = []
+    for i in order:
+        row = provenance[i]
+        page_start, page_end = int(row["page_start"]), int(row["page_end"])
+        citations.append({
+            "doc_id": int(row["doc_id"]),
+            "page_start": page_start + 1 if page_start >= 0 else None,
+            "page_end": page_end + 1 if page_end >= 0 else None,
+            "char_start": int(row["char_start"]),
+            "char_end": int(row["char_end"]),
+        })
+    return citations
+
+
 def build_context(ordered_chunks):
     return "\n\n".join(chunk.strip() for chunk in ordered_chunks)
 
@@ -226,7 +184,10 @@ def _has_rare_word_overlap(query, ordered_chunks):
 def confidence_label(score, query=None, ordered_chunks=None):
     if query is not None and ordered_chunks is not None and not _has_rare_word_overlap(query, ordered_chunks):
         return "Low"
+    return _score_label(score)
+
 
+def _score_label(score):
     if score > CONFIDENCE_HIGH_THRESHOLD:
         return "High"
     elif score > CONFIDENCE_MEDIUM_THRESHOLD:
@@ -234,31 +195,179 @@ def confidence_label(score, query=None, ordered_chunks=None):
     return "Low"
 
 
-def answer_question(chunks, scores, query):
+def _extractive_answer(ordered_chunks, query):
+    """
+    Cheapest possible grounded answer: the single sentence from the
+    retrieved chunks sharing the most query words (word families, as
+    everywhere else here), ties going to the higher-ranked chunk.
+    Falls back to the not-available answer when nothing overlaps.
+    """
+    query_words = _significant_words(query)
+    best_sentence, best_overlap = None, 0
+    for chunk in ordered_chunks:
+        for sentence in _SENTENCE_SPLIT_PATTERN.split(chunk):
+            overlap = _word_overlap_count(query_words, _significant_words(sentence))
+            if overlap > best_overlap:
+                best_sentence, best_overlap = sentence.strip(), overlap
+    return best_sentence if best_sentence else NOT_AVAILABLE_ANSWER
+
+
+def _generation_kwargs(query_lower, adaptive):
+    """
+    Extra generate_answer arguments for adaptive mode (see
+    config.ADAPTIVE_GENERATION): a token budget by question type, with
+    sentence-level early exit only for factoid questions, since a list
+    answer legitimately runs across several sentences. Empty when
+    adaptive mode is off, so the default call is unchanged.
+    """
+    if not adaptive:
+        return {}
+    if _looks_like_list_question(query_lower):
+        return {"max_new_tokens": LIST_MAX_NEW_TOKENS}
+    return {"max_new_tokens": FACTOID_MAX_NEW_TOKENS, "early_exit": True}
+
+
+def answer_question(chunks, scores, query, provenance=None, adaptive=None, reuse_encoder=None,
+                    fast_path=None, allow_generation=True, max_context_chars=None, list_index=None,
+                    compress=None, profile=None, chunk_tokens=None):
     """
-    Full generation pipeline: order chunks, build context, decide
-    between list extraction and LLM generation, and compute confidence.
-    Returns (answer, context, confidence_label).
+    Full generation pipeline: order chunks, build context, compute the
+    confidence gate, then decide between list extraction, LLM
+    generation, or (when the gate fails and the fast-path policy allows)
+    a fast refusal / extractive answer that skips generation entirely.
+    `chunks` is any sequence of chunk strings -- the retrieved list, or
+    a ChunkStore (utils/chunk_store.py) when answering over a whole store.
+    `provenance` is optional per-chunk metadata aligned with `chunks`
+    (e.g. store.metadata(ids) from retrieve(..., return_ids=True)).
+    `adaptive`, `reuse_encoder` and `fast_path` override
+    config.ADAPTIVE_GENERATION, config.ENCODER_CACHE_ENABLED and
+    config.FAST_PATH_POLICY for this call. allow_generation=False is
+    graceful degradation (e.g. a request about to miss its deadline):
+    list extraction still runs, anything else gets an extractive answer.
+    `max_context_chars` overrides config.MAX_CONTEXT_CHARS for generation.
+    With a `list_index` (src/services/list_index.py, built at ingest),
+    list questions are answered by an index lookup instead of
+    extract_list; pass provenance too so the lookup is limited to the
+    retrieved chunks. `compress` overrides config.CONTEXT_COMPRESSION:
+    when on, generation gets only the query-relevant sentences of the
+    chunks (src/services/compression.py) and that is the context returned.
+    With a `profile` (src/services/profiling.RequestProfile), the
+    generation call runs under the torch profiler. `chunk_tokens` is
+    the chunks' ingest-time token ids, aligned with `chunks` like
+    provenance (store.chunk_tokens(ids)); generation then assembles the
+    prompt from them instead of re-tokenizing the context, unless
+    compression rewrote the context.
+
+    Returns (answer, context, confidence_label, details), where details
+    carries "citations": page range and char span of each context chunk,
+    in context order (empty when no provenance was given); "context_parts":
+    the context's text per chunk, aligned with "citations"; "path":
+    which answering path produced the answer ("list_extraction",
+    "list_index", "generation", "generation_list_rescue", "fast_refusal",
+    "fast_extractive" or "degraded_extractive"); "top_score";
+    "timings" (generation_ms, 0 when generation was skipped, and
+    tokenize_ms when the prompt was assembled from chunk_tokens in this
+    process); and
+    "cache_hits" ({"encoder": bool} when the encoder cache was consulted);
+    and, when compression ran, "compression" (input/output chars and
+    sentence counts).
     """
+    policy = FAST_PATH_POLICY if fast_path is None else fast_path
+    if policy not in FAST_PATH_POLICIES:
+        raise ValueError(f"Unknown fast-path policy {policy!r}; expected one of {FAST_PATH_POLICIES}.")
+
     query_lower = query.lower()
+    is_list_question = _looks_like_list_question(query_lower)
 
-    ordered = order_by_intent(chunks, query_lower)
+    chunks = list(chunks)
+    order = _intent_order(chunks, query_lower)
+    ordered = [chunks[i] for i in order]
     context = build_context(ordered)
 
-    if _looks_like_list_question(query_lower):
-        extracted = extract_list(ordered, query=query)
-        answer = extracted if extracted else generate_answer(context, query)
+    # The gate only needs the query and the retrieved chunks, so it runs
+    # before any generation -- same result confidence_label would give.
+    in_scope = _has_rare_word_overlap(query, ordered)
+    label = _score_label(float(scores[0])) if in_scope else "Low"
+
+    gen_kwargs = _generation_kwargs(query_lower, ADAPTIVE_GENERATION if adaptive is None else adaptive)
+    if reuse_encoder is not None:
+        gen_kwargs["reuse_encoder"] = reuse_encoder
+    if max_context_chars is not None:
+        gen_kwargs["max_context_chars"] = max_context_chars
+    cache_hits = {}
+    if (ENCODER_CACHE_ENABLED if reuse_encoder is None else reuse_encoder):
+        gen_kwargs["cache_info"] = cache_hits
+
+    if list_index is not None:
+        spans = None
+        if provenance is not None:
+            spans = [(int(provenance[i]["char_start"]), int(provenance[i]["char_end"])) for i in order]
+        find_list, list_path = (lambda: list_index.lookup(query, spans=spans)), "list_index"
+    else:
+        find_list, list_path = (lambda: extract_list(ordered, query=query)), "list_extraction"
+
+    extracted = None
+    if (in_scope or policy == "off") and is_list_question:
+        extracted = find_list()
+
+    generation_ms = 0.0
+    generation_timings = {}  # tokenize_ms, from generate_answer
+    context_order, context_parts = order, [chunk.strip() for chunk in ordered]
+    compression = None
+    if not in_scope and policy == "refuse":
+        answer, path = NOT_AVAILABLE_ANSWER, "fast_refusal"
+    elif not in_scope and policy == "extractive":
+        answer, path = _extractive_answer(ordered, query), "fast_extractive"
+    elif extracted:
+        answer, path = extracted, list_path
+    elif not allow_generation:
+        answer, path = _extractive_answer(ordered, query), "degraded_extractive"
     else:
-        answer = generate_answer(context, query)
+        if CONTEXT_COMPRESSION if compress is None else compress:
+            positions = None
+            if provenance is not None:
+                positions = [int(provenance[i]["char_start"]) for i in order]
+            budget = MAX_CONTEXT_CHARS if max_context_chars is None else max_context_chars
+            segments = []
+            context, compression = compress_context(ordered, query, budget, positions=positions, segments=segments)
+            # Compression drops chunks and emits the rest in document
+            # order: citations and parts follow what is actually in context.
+            context_order = [order[k] for k, _ in segments]
+            context_parts = [text for _, text in segments]
+        if chunk_tokens is not None and compression is None:
+            gen_kwargs["chunk_tokens"] = [
+                (chunk_tokens[i][0], chunk_tokens[i][1], len(chunks[i].strip())) for i in order
+            ]
+            gen_kwargs["timings"] = generation_timings
+        generate, generate_args = generate_answer, ()
+        if profile is not None:
+            generate, generate_args = profile.generation(generate_answer)
+        start = time.perf_counter()
+        answer = run_in_stage("generation", generate, *generate_args, context, query, **gen_kwargs)
+        generation_ms = (time.perf_counter() - start) * 1000
+        path = "generation"
 
         looks_like_truncated_list_item = bool(
             _NUMBERED_PATTERN.match(answer.strip()) or _BULLETED_PATTERN.match(answer.strip())
         )
-        if looks_like_truncated_list_item and len(answer.split()) <= _SHORT_ANSWER_WORD_THRESHOLD:
-            extracted = extract_list(ordered, query=query)
-            if extracted:
-                answer = extracted
-
-    label = confidence_label(float(scores[0]), query=query, ordered_chunks=ordered)
-
-    return answer, context, label
\ No newline at end of file
+        if (not is_list_question and looks_like_truncated_list_item
+                and len(answer.split()) <= _SHORT_ANSWER_WORD_THRESHOLD):
+            rescued = find_list()
+            if rescued:
+                answer, path = rescued, "generation_list_rescue"
+
+    details = {
+        "citations": _citations(provenance, context_order) if provenance is not None else [],
+        "context_parts": context_parts,
+        "path": path,
+        "top_score": float(scores[0]),
+        "timings": {
+            "generation_ms": round(generation_ms, 1),
+            **{name: round(ms, 2) for name, ms in generation_timings.items()},
+        },
+        "cache_hits": cache_hits,
+    }
+    if compression is not None:
+        details["compression"] = compression
+
+    return answer, context, label, details
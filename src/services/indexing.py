@@ -0,0 +1,141 @@
+"""
+Incremental (re-)indexing service: chunks are keyed by a hash of their
+content, and each document keeps a manifest of its chunk hashes in
+order. Re-ingesting a revised version of a document diffs the old and
+new manifests, embeds ONLY chunks whose content is new, and adds/removes
+vectors in the FAISS index in place instead of rebuilding it.
+
+A one-paragraph edit to a long policy PDF typically changes one or two
+chunks (plus the neighbour that carries its overlap tail), so re-ingest
+cost drops from "embed every chunk" to "embed a handful". Caveat:
+chunk_text packs units greedily, so an edit that changes a paragraph's
+length enough to move a chunk boundary also changes the chunks after
+it until the packing happens to line up again -- the returned stats
+report what was actually saved rather than assuming it.
+
+This is a library, not part of the upload path: uploads are keyed by a
+hash of the file's bytes (src/services/sessions.py), so a revised PDF
+is a new document with no lineage to the old one, and that path serves
+from a positional ChunkStore with per-chunk provenance rather than this
+hash-keyed index. Callers that do know two uploads are versions of one
+document (e.g. a batch re-index keyed by filename) can use update().
+tests/integration/test_indexing.py runs it on real ingest output.
+"""
+
+import hashlib
+import json
+import os
+
+import faiss
+
+from utils.chunk_store import ChunkStore
+from utils.embeddings import generate_embeddings
+from utils.retriever import create_faiss_id_index, add_to_id_index, remove_from_id_index
+
+_MANIFEST_FILE = "manifest.json"
+_INDEX_FILE = "index.faiss"
+_CHUNKS_DIR = "chunks"
+
+# FAISS ids are signed int64 and -1 means "no result", so keep hashes
+# in the non-negative 63-bit range.
+_ID_MASK = (1 << 63) - 1
+
+
+def chunk_hash(text, occurrence=0):
+    """
+    Stable 63-bit content hash of a chunk. `occurrence` disambiguates
+    verbatim-duplicate chunks within one document, so every chunk in a
+    manifest still gets its own id.
+    """
+    data = text.encode("utf-8") if occurrence == 0 else f"{text}\0{occurrence}".encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little") & _ID_MASK
+
+
+def build_manifest(chunks, doc_id=0):
+    """Per-document manifest: the ordered list of chunk content hashes."""
+    seen = {}
+    chunk_ids = []
+    for chunk in chunks:
+        occurrence = seen.get(chunk, 0)
+        seen[chunk] = occurrence + 1
+        chunk_ids.append(chunk_hash(chunk, occurrence))
+    return {"doc_id": doc_id, "chunk_ids": chunk_ids}
+
+
+def diff_manifests(old_manifest, new_manifest):
+    """(added_ids, removed_ids, unchanged_count) between two manifests."""
+    old_ids, new_ids = set(old_manifest["chunk_ids"]), set(new_manifest["chunk_ids"])
+    added = [i for i in new_manifest["chunk_ids"] if i not in old_ids]
+    removed = [i for i in old_manifest["chunk_ids"] if i not in new_ids]
+    return added, removed, len(new_ids & old_ids)
+
+
+class DocumentIndex:
+    """
+    A document's chunks, manifest and ID-mapped FAISS index. `chunks` is
+    a {chunk_id: text} dict, which search_index/retrieve index directly
+    with the ids FAISS returns:
+
+        doc = DocumentIndex.build(ingest_pdf(f))
+        results, scores = retrieve(doc.index, doc.chunks, query)
+    """
+
+    def __init__(self, index, chunks, manifest):
+        self.index = index
+        self.chunks = chunks
+        self.manifest = manifest
+
+    @classmethod
+    def build(cls, chunks, doc_id=0):
+        manifest = build_manifest(chunks, doc_id=doc_id)
+        embeddings = generate_embeddings(list(chunks), is_query=False)
+        index = create_faiss_id_index(embeddings, manifest["chunk_ids"])
+        return cls(index, dict(zip(manifest["chunk_ids"], chunks)), manifest)
+
+    def update(self, new_chunks):
+        """
+        Re-index a revised version of the document in place. Returns
+        stats, including how many embedding calls the diff avoided
+        compared to a full re-ingest.
+        """
+        new_manifest = build_manifest(new_chunks, doc_id=self.manifest["doc_id"])
+        added, removed, unchanged = diff_manifests(self.manifest, new_manifest)
+
+        new_chunk_by_id = dict(zip(new_manifest["chunk_ids"], new_chunks))
+        added_texts = [new_chunk_by_id[i] for i in added]
+        if added_texts:
+            embeddings = generate_embeddings(added_texts, is_query=False)
+            add_to_id_index(self.index, embeddings, added)
+        remove_from_id_index(self.index, removed)
+
+        self.chunks = {i: new_chunk_by_id[i] for i in new_manifest["chunk_ids"]}
+        self.manifest = new_manifest
+
+        return {
+            "added": len(added),
+            "removed": len(removed),
+            "unchanged": unchanged,
+            "embed_calls": len(added_texts),
+            "embed_calls_saved": len(new_chunks) - len(added_texts),
+        }
+
+    def ordered_chunks(self):
+        """Chunk texts in document (manifest) order."""
+        return [self.chunks[i] for i in self.manifest["chunk_ids"]]
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        faiss.write_index(self.index, os.path.join(directory, _INDEX_FILE))
+        ChunkStore.from_chunks(self.ordered_chunks(), doc_id=self.manifest["doc_id"]).save(
+            os.path.join(directory, _CHUNKS_DIR)
+        )
+        with open(os.path.join(directory, _MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f)
+
+    @classmethod
+    def load(cls, directory):
+        with open(os.path.join(directory, _MANIFEST_FILE), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        index = faiss.read_index(os.path.join(directory, _INDEX_FILE))
+        store = ChunkStore.open(os.path.join(directory, _CHUNKS_DIR))
+        return cls(index, dict(zip(manifest["chunk_ids"], store)), manifest)
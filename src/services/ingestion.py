@@ -4,9 +4,15 @@ Kept separate from retrieval/generation so it can be unit-tested
 without loading any ML models.
 """
 
-from utils.loader import load_pdf
-from utils.chunker import chunk_text
-from src.config import CHUNK_SIZE, CHUNK_OVERLAP
+import numpy as np
+
+from utils.loader import load_pdf_pages, join_pages
+from utils.chunker import chunk_text_with_spans, section_starts
+from utils.chunk_store import ChunkStore, empty_metadata, list_flags
+from utils.upload import read_upload, check_upload_size, check_upload_header
+from src.services.list_index import ListIndex
+from src.services.pdf_workers import get_pdf_parser_pool
+from src.config import CHUNK_SIZE, CHUNK_OVERLAP, PDF_ISOLATED_PARSING
 
 # Security hardening (added per the design doc's Chapter 6 checklist,
 # not implemented until now): basic validation to avoid resource
@@ -16,47 +22,97 @@ MAX_FILE_SIZE_BYTES = 20 * 1024 * 1024  # 20MB
 PDF_MAGIC_BYTES = b"%PDF-"
 
 
-def _validate_upload(uploaded_file):
+def read_pdf_upload(uploaded_file):
     """
-    Validate file size and PDF magic bytes BEFORE attempting to parse.
+    Validate file size and PDF magic bytes BEFORE attempting to parse,
+    on the single read of the upload (utils/upload.py) that also hashes
+    it: returns the validated Upload. The caller closes it.
     Checking magic bytes (not just the file extension) matters because
     a file can be renamed to .pdf without actually being one -- Streamlit's
     type=["pdf"] filter only checks the extension client-side.
     """
-    uploaded_file.seek(0, 2)  # seek to end
-    size = uploaded_file.tell()
-    uploaded_file.seek(0)  # reset for the actual read
+    upload = read_upload(uploaded_file, max_bytes=MAX_FILE_SIZE_BYTES)
+    try:
+        check_upload_size(upload.size, MAX_FILE_SIZE_BYTES)
+        check_upload_header(upload.header, PDF_MAGIC_BYTES)
+    except ValueError:
+        if upload is not uploaded_file:
+            upload.close()
+        raise
+    return upload
 
-    if size == 0:
-        raise ValueError("The uploaded file is empty.")
 
-    if size > MAX_FILE_SIZE_BYTES:
-        raise ValueError(
-            f"File is too large ({size / (1024 * 1024):.1f}MB). "
-            f"Maximum allowed is {MAX_FILE_SIZE_BYTES / (1024 * 1024):.0f}MB."
-        )
+def _pages_for_offsets(page_starts, offsets):
+    """
+    0-based page index containing each char offset (see
+    utils.loader.join_pages). Works the same for any sorted start
+    offsets, e.g. utils.chunker.section_starts.
+    """
+    if len(page_starts) == 0:
+        return np.full(len(offsets), -1, dtype=np.int32)
+    pages = np.searchsorted(page_starts, offsets, side="right") - 1
+    return np.clip(pages, 0, len(page_starts) - 1).astype(np.int32)
 
-    header = uploaded_file.read(len(PDF_MAGIC_BYTES))
-    uploaded_file.seek(0)  # reset again for the real parse
 
-    if header != PDF_MAGIC_BYTES:
-        raise ValueError(
-            "This file does not appear to be a valid PDF (missing PDF header). "
-            "It may be corrupted or renamed from a different file type."
-        )
+def _extract_pages(upload, report):
+    if not PDF_ISOLATED_PARSING:
+        return load_pdf_pages(upload.stream())
+    pages, skipped = get_pdf_parser_pool().extract_pages(upload)
+    if report is not None:
+        report["skipped_pages"] = skipped
+    return pages
 
 
-def ingest_pdf(uploaded_file):
+def ingest_pdf_document(uploaded_file, doc_id=0, report=None):
     """
-    Validate, load, and chunk an uploaded PDF.
+    Validate, load, and chunk an uploaded PDF into a ChunkStore whose
+    metadata carries each chunk's page range and character span, so a
+    citation is an O(1) metadata lookup rather than a re-parse of the PDF.
+    Also returns the document's ListIndex (src/services/list_index.py),
+    built from the same text and chunk spans: (store, list_index).
     Raises ValueError for invalid uploads (size, type) or empty extracted text.
+    With config.PDF_ISOLATED_PARSING, pages that hit a parse time or
+    memory limit are left out; pass a dict as `report` to get them as
+    report["skipped_pages"] (see src/services/pdf_workers.py).
+    `uploaded_file` may also be an already-read utils.upload.Upload,
+    which is then left open for the caller.
     """
-    _validate_upload(uploaded_file)
+    upload = read_pdf_upload(uploaded_file)
+    try:
+        pages = _extract_pages(upload, report)
+    finally:
+        if upload is not uploaded_file:
+            upload.close()
 
-    text = load_pdf(uploaded_file)
+    text, page_starts = join_pages(pages)
 
     if not text.strip():
         raise ValueError("No readable text found in the PDF.")
 
-    chunks = chunk_text(text, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP)
-    return chunks
\ No newline at end of file
+    chunks, spans = chunk_text_with_spans(text, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP)
+
+    meta = empty_metadata(len(chunks), doc_id=doc_id)
+    meta["char_start"] = spans[:, 0]
+    meta["char_end"] = spans[:, 1]
+    meta["page_start"] = _pages_for_offsets(page_starts, spans[:, 0])
+    meta["page_end"] = _pages_for_offsets(page_starts, np.maximum(spans[:, 1] - 1, spans[:, 0]))
+    meta["is_list"] = list_flags(chunks)
+    sections = section_starts(text)
+    meta["section_start"] = _pages_for_offsets(sections, spans[:, 0])
+    meta["section_end"] = _pages_for_offsets(sections, np.maximum(spans[:, 1] - 1, spans[:, 0]))
+
+    return ChunkStore.from_chunks(chunks, meta=meta), ListIndex.build(text, chunks, spans)
+
+
+def ingest_pdf_to_store(uploaded_file, doc_id=0):
+    """ingest_pdf_document without the list index."""
+    store, _ = ingest_pdf_document(uploaded_file, doc_id=doc_id)
+    return store
+
+
+def ingest_pdf(uploaded_file):
+    """
+    Validate, load, and chunk an uploaded PDF.
+    Raises ValueError for invalid uploads (size, type) or empty extracted text.
+    """
+    return list(ingest_pdf_to_store(uploaded_file))
@@ -0,0 +1,141 @@
+"""
+Ingest-time list index: every bulleted/numbered list in a document,
+with its heading, section tokens and chunk ids, so list-intent
+questions are answered by a lookup instead of regex-scanning the
+retrieved chunks (extract_list) at query time.
+
+The lists are the same atomic list units the chunker already builds
+(utils.chunker._group_into_unit_ranges). A unit's "heading" is the
+paragraph right before it -- on the O*NET-style documents this is the
+section title ("Tasks", "Qualifications", ...), and otherwise a lead-in
+sentence that names the list just as well. Section tokens are the
+heading's significant words plus the list's words that are rare in
+the document, computed once here with the same word-family rules
+extract_list uses (see utils.word_match._rare_words), so lookup is a
+small set-overlap count.
+"""
+
+import json
+
+from utils.chunker import _split_paragraphs, _group_into_unit_ranges, _is_list_line
+from utils.word_match import (
+    _significant_words,
+    _chunk_word_sets,
+    _rare_words,
+    _word_overlap_count,
+)
+
+# Long enough for a lead-in sentence, short enough that a preceding
+# prose paragraph doesn't swamp the section tokens.
+_MAX_HEADING_CHARS = 200
+
+
+class ListEntry:
+    def __init__(self, heading, text, span, chunk_ids, heading_tokens, tokens):
+        self.heading = heading
+        self.text = text
+        self.span = span  # [char_start, char_end) in the document text
+        self.chunk_ids = chunk_ids
+        self.heading_tokens = heading_tokens
+        self.tokens = tokens  # heading + list tokens
+
+    def to_dict(self):
+        return {
+            "heading": self.heading,
+            "text": self.text,
+            "span": list(self.span),
+            "chunk_ids": self.chunk_ids,
+            "heading_tokens": sorted(self.heading_tokens),
+            "tokens": sorted(self.tokens),
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(
+            d["heading"], d["text"], tuple(d["span"]), d["chunk_ids"],
+            frozenset(d["heading_tokens"]), frozenset(d["tokens"]),
+        )
+
+
+class ListIndex:
+    def __init__(self, entries):
+        self.entries = entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    @classmethod
+    def build(cls, text, chunks, chunk_spans):
+        """
+        Index the list units of `text`. `chunks`/`chunk_spans` are the
+        chunker's output for the same text (chunk_text_with_spans), used
+        for chunk ids and for the document-wide rare-word statistics.
+        """
+        paragraphs, para_spans = _split_paragraphs(text)
+        chunk_word_sets = _chunk_word_sets(chunks)
+        entries = []
+
+        for first, last in _group_into_unit_ranges(paragraphs):
+            if last - first < 2 or not _is_list_line(paragraphs[first]):
+                continue  # same ">= 2 list lines" rule as _extract_list_from_text
+
+            heading = ""
+            if first > 0 and not _is_list_line(paragraphs[first - 1]):
+                heading = paragraphs[first - 1][:_MAX_HEADING_CHARS]
+            list_text = "\n".join(paragraphs[first:last])
+            span = (para_spans[first][0], para_spans[last - 1][1])
+
+            chunk_ids = [
+                i for i, (start, end) in enumerate(chunk_spans)
+                if start < span[1] and span[0] < end
+            ]
+            # Heading words are kept as-is: on a small document the
+            # section title can look "generic" just because the overlap
+            # tail repeats it into the next chunk.
+            heading_words = _significant_words(heading)
+            tokens = heading_words | _rare_words(_significant_words(list_text), chunk_word_sets)
+            entries.append(ListEntry(
+                heading, list_text, span, chunk_ids, frozenset(heading_words), frozenset(tokens),
+            ))
+
+        return cls(entries)
+
+    def lookup(self, query, spans=None):
+        """
+        The list best matching `query`, or None. With `spans` -- the
+        [char_start, char_end) spans of the retrieved chunks, in context
+        order -- only lists inside those chunks are considered, and ties
+        go to the earlier-ranked chunk, as in extract_list; without it the
+        whole document is searched in document order.
+        """
+        query_words = _significant_words(query)
+        best, best_score = None, None
+
+        for position, entry in enumerate(self.entries):
+            if spans is None:
+                rank = position
+            else:
+                rank = next(
+                    (r for r, (start, end) in enumerate(spans) if start < entry.span[1] and entry.span[0] < end),
+                    None,
+                )
+                if rank is None:
+                    continue
+            score = (
+                _word_overlap_count(query_words, entry.tokens),
+                _word_overlap_count(query_words, entry.heading_tokens),
+                -rank,
+            )
+            if best_score is None or score > best_score:
+                best, best_score = entry, score
+
+        return best.text if best is not None else None
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump([e.to_dict() for e in self.entries], f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls([ListEntry.from_dict(d) for d in json.load(f)])
@@ -0,0 +1,310 @@
+"""
+PDF text extraction in isolated, time- and memory-limited subprocesses.
+
+pypdf is pure Python and runs in whatever thread calls it, so a
+malformed or adversarial PDF (deeply nested objects, huge content
+streams, decompression bombs) could spin a CPU for minutes inside a
+request and stall everyone else. Here extraction runs in a small pool
+of worker processes instead:
+
+  - each page gets PDF_PAGE_TIMEOUT_S (SIGALRM inside the worker); a
+    page that overruns, exhausts memory or fails to parse is skipped and
+    the worker moves on to the next page;
+  - the whole document gets PDF_DOCUMENT_TIMEOUT_S, enforced by the
+    parent: past it the worker is killed and the pages extracted so far
+    are returned, the rest reported as skipped;
+  - a worker's address space may grow at most PDF_WORKER_MEMORY_LIMIT_BYTES
+    past its size at startup (RLIMIT_AS), so a bomb fails with
+    MemoryError in the worker rather than swapping the host;
+  - a worker is replaced after PDF_WORKER_MAX_JOBS documents, or once
+    its peak RSS passes PDF_WORKER_RECYCLE_RSS_BYTES, so fragmentation
+    and pypdf caches don't accumulate.
+
+Workers are started with "spawn", not fork: a forked child would
+inherit the parent's model weights and torch threads, making the
+address-space limit meaningless and the fork itself risky.
+
+Pages stream back to the parent as they are extracted, so whatever was
+parsed before a timeout or crash is kept. extract_pages returns
+(pages, skipped) with the same page positions as
+utils.loader.load_pdf_pages ("" for a skipped page) and skipped as
+[{"page": 0-based index, "reason": "page_timeout" | "memory" | "error"
+| "document_timeout" | "worker_crashed"}].
+"""
+
+import io
+import mmap
+import multiprocessing
+import signal
+import threading
+import time
+
+from utils.upload import Upload
+from src.config import (
+    PDF_PARSE_WORKERS,
+    PDF_PAGE_TIMEOUT_S,
+    PDF_DOCUMENT_TIMEOUT_S,
+    PDF_WORKER_MEMORY_LIMIT_BYTES,
+    PDF_WORKER_MAX_JOBS,
+    PDF_WORKER_RECYCLE_RSS_BYTES,
+)
+
+try:
+    import resource
+except ImportError:  # Windows: no rlimits; timeouts still apply
+    resource = None
+
+
+class _PageTimeout(Exception):
+    pass
+
+
+def _on_alarm(signum, frame):
+    raise _PageTimeout()
+
+
+def _address_space_bytes():
+    try:
+        with open("/proc/self/status", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmSize:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def _peak_rss_bytes():
+    if resource is None:
+        return 0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # KB on Linux
+
+
+def _extract_page_text(reader, number):
+    return reader.pages[number].extract_text() or ""
+
+
+def _worker_main(conn, memory_limit_bytes, page_timeout_s, extract_page=_extract_page_text):
+    from pypdf import PdfReader
+
+    if resource is not None and memory_limit_bytes:
+        # Relative to what the interpreter and imports already mapped.
+        limit = _address_space_bytes() + memory_limit_bytes
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    use_alarm = hasattr(signal, "setitimer") and page_timeout_s
+    if use_alarm:
+        signal.signal(signal.SIGALRM, _on_alarm)
+
+    while True:
+        job = conn.recv()
+        if job is None:
+            return
+        spooled = None
+        try:
+            try:
+                if job[0] == "path":
+                    # A spooled upload: map the file rather than receive a copy.
+                    with open(job[1], "rb") as f:
+                        spooled = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                    reader = PdfReader(spooled)
+                else:
+                    reader = PdfReader(io.BytesIO(conn.recv_bytes()))
+                num_pages = len(reader.pages)
+                failure = None
+            except MemoryError:
+                failure = "memory"
+            except Exception as e:
+                failure = f"{type(e).__name__}: {e}"
+            if failure is not None:
+                if spooled is not None:
+                    spooled.close()  # before reporting, so the caller can remove the spool file
+                conn.send(("failed", failure, _peak_rss_bytes()))
+                continue
+            conn.send(("opened", num_pages))
+
+            for number in range(num_pages):
+                try:
+                    if use_alarm:
+                        signal.setitimer(signal.ITIMER_REAL, page_timeout_s)
+                    try:
+                        text = extract_page(reader, number)
+                    finally:
+                        if use_alarm:
+                            signal.setitimer(signal.ITIMER_REAL, 0)
+                    conn.send(("page", number, text))
+                except _PageTimeout:
+                    conn.send(("skipped", number, "page_timeout"))
+                except MemoryError:
+                    conn.send(("skipped", number, "memory"))
+                except Exception:
+                    conn.send(("skipped", number, "error"))
+            del reader
+        finally:
+            # On every path, including PdfReader(spooled) raising: the map
+            # would otherwise stay open for the life of the worker.
+            # Closing an already closed mmap is a no-op.
+            if spooled is not None:
+                spooled.close()
+        conn.send(("done", _peak_rss_bytes()))
+
+
+class _Worker:
+    def __init__(self, context, memory_limit_bytes, page_timeout_s, extract_page):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main, args=(child_conn, memory_limit_bytes, page_timeout_s, extract_page),
+            name="pdf-parse-worker", daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        self.jobs = 0
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+            self.process.join(timeout=5)
+        except OSError:
+            pass
+        if self.process.is_alive():
+            self.kill()
+        else:
+            self.conn.close()
+
+
+class PdfParserPool:
+    def __init__(self, workers=PDF_PARSE_WORKERS, page_timeout_s=PDF_PAGE_TIMEOUT_S,
+                 document_timeout_s=PDF_DOCUMENT_TIMEOUT_S, memory_limit_bytes=PDF_WORKER_MEMORY_LIMIT_BYTES,
+                 max_jobs=PDF_WORKER_MAX_JOBS, recycle_rss_bytes=PDF_WORKER_RECYCLE_RSS_BYTES,
+                 extract_page=_extract_page_text):
+        # extract_page(reader, page_number) -> text runs in the worker, so
+        # it must be a module-level (picklable) function.
+        self.extract_page = extract_page
+        self.page_timeout_s = page_timeout_s
+        self.document_timeout_s = document_timeout_s
+        self.memory_limit_bytes = memory_limit_bytes
+        self.max_jobs = max_jobs
+        self.recycle_rss_bytes = recycle_rss_bytes
+        self._context = multiprocessing.get_context("spawn")
+        self._idle = []  # started workers waiting for a job
+        self._slots = threading.BoundedSemaphore(workers)
+        self._lock = threading.Lock()
+        self._closed = False
+        self.counters = {"documents": 0, "partial": 0, "failed": 0, "killed": 0, "recycled": 0}
+
+    def _acquire_worker(self):
+        self._slots.acquire()
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        try:
+            return _Worker(self._context, self.memory_limit_bytes, self.page_timeout_s, self.extract_page)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _release_worker(self, worker, reusable, peak_rss=0):
+        recycle = reusable and (
+            worker.jobs >= self.max_jobs
+            or (self.recycle_rss_bytes and peak_rss > self.recycle_rss_bytes)
+        )
+        with self._lock:
+            if recycle:
+                self.counters["recycled"] += 1
+            if reusable and not recycle and not self._closed:
+                self._idle.append(worker)
+                worker = None
+        if worker is not None:
+            if reusable:
+                worker.stop()
+            else:
+                worker.kill()
+        self._slots.release()
+
+    def extract_pages(self, pdf):
+        """
+        (pages, skipped) for a PDF -- bytes or a utils.upload.Upload; see
+        the module docstring. Raises ValueError when the file can't be
+        opened as a PDF at all.
+        """
+        worker = self._acquire_worker()
+        worker.jobs += 1
+        deadline = time.monotonic() + self.document_timeout_s
+        pages, skipped = {}, []
+        num_pages = None
+        ended, reusable, peak_rss, failure = None, True, 0, None
+
+        try:
+            if isinstance(pdf, Upload) and pdf.path is not None:
+                worker.conn.send(("path", pdf.path))
+            else:
+                worker.conn.send(("bytes",))
+                worker.conn.send_bytes(pdf.view() if isinstance(pdf, Upload) else pdf)
+            while ended is None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not worker.conn.poll(remaining):
+                    ended, reusable = "document_timeout", False
+                    break
+                message = worker.conn.recv()
+                kind = message[0]
+                if kind == "opened":
+                    num_pages = message[1]
+                elif kind == "page":
+                    pages[message[1]] = message[2]
+                elif kind == "skipped":
+                    skipped.append({"page": message[1], "reason": message[2]})
+                elif kind == "done":
+                    ended, peak_rss = "done", message[1]
+                elif kind == "failed":
+                    ended, failure, peak_rss = "failed", message[1], message[2]
+        except (EOFError, OSError):
+            ended, reusable = "worker_crashed", False
+        finally:
+            self._release_worker(worker, reusable, peak_rss)
+
+        with self._lock:
+            self.counters["documents"] += 1
+            if not reusable:
+                self.counters["killed"] += 1
+            if ended == "failed" or (num_pages is None and ended != "done"):
+                self.counters["failed"] += 1
+            elif skipped or ended != "done":
+                self.counters["partial"] += 1
+
+        if ended == "failed":
+            raise ValueError(f"PDF could not be opened: {failure}")
+        if num_pages is None:
+            raise ValueError(f"PDF could not be opened ({ended.replace('_', ' ')}).")
+
+        if ended != "done":
+            seen = set(pages) | {s["page"] for s in skipped}
+            skipped.extend({"page": n, "reason": ended} for n in range(num_pages) if n not in seen)
+        skipped.sort(key=lambda s: s["page"])
+        return [pages.get(n, "") for n in range(num_pages)], skipped
+
+    def stats(self):
+        with self._lock:
+            return {**self.counters, "idle_workers": len(self._idle)}
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            worker.stop()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pdf_parser_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = PdfParserPool()
+        return _pool
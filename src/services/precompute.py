@@ -0,0 +1,205 @@
+"""
+Answers to a document's likely questions, computed in the background
+after ingest and served to matching live questions without retrieval
+or generation.
+
+Most questions about a document target a handful of its sections (on
+the O*NET sample: wages, outlook, tasks, skills). candidate_questions
+derives one question per section heading and per list heading, and a
+PrecomputeJob submits them to the AdmissionController as "background"
+requests -- the same retrieve + answer_question pipeline as a live
+request -- storing each answer with its question's
+embedding in PrecomputedAnswers. A live request whose query embedding
+is at least PRECOMPUTE_MATCH_THRESHOLD similar to a stored question
+gets the stored answer (details["path"] == "precomputed"; see
+AdmissionController._process).
+
+The job must never cost live traffic:
+  - it submits the next question only when the admission controller
+    has nothing queued or in flight, so a live request arriving later
+    waits for at most the one question already running;
+  - its questions are background-priority requests, so the controller's
+    deadlines, counters and shedding apply to them: a live request
+    displaces a queued question from a full queue. A question that is
+    shed or rejected is retried once the controller is idle again, and
+    a degraded (no-generation) answer is not stored;
+  - cancel() stops it before the next question (e.g. on eviction).
+
+There is no OS-level deprioritisation: generation runs on the
+controller's workers and torch's shared thread pool, which a per-thread
+nice would not reach.
+"""
+
+import copy
+import json
+import threading
+
+import numpy as np
+
+from utils.chunker import _is_heading_line
+from src.services.retrieval import embed_query
+from src.services.admission import Overloaded, get_admission_controller
+from src.config import (
+    PRECOMPUTE_MAX_QUESTIONS,
+    PRECOMPUTE_MATCH_THRESHOLD,
+    PRECOMPUTE_IDLE_POLL_S,
+)
+
+def _clean_heading(heading):
+    return " ".join(heading.strip().rstrip(":").split())
+
+
+def candidate_questions(chunks, list_index=None, max_questions=PRECOMPUTE_MAX_QUESTIONS):
+    """
+    Likely questions for a document, in document order: "What are the
+    <heading>?" for each list's heading (from the ingest-time ListIndex),
+    then "What does the document say about <heading>?" for every other
+    section heading found in the chunks. Headings repeated by chunk
+    overlap are asked once.
+    """
+    questions, seen = [], set()
+
+    def add(heading, template):
+        heading = _clean_heading(heading)
+        if heading and heading.lower() not in seen:
+            seen.add(heading.lower())
+            questions.append(template.format(heading.lower()))
+
+    if list_index is not None:
+        for entry in list_index.entries:
+            if entry.heading and _is_heading_line(entry.heading.strip()):
+                add(entry.heading, "What are the {}?")
+    for chunk in chunks:
+        for line in chunk.split("\n"):
+            if _is_heading_line(line.strip()):
+                add(line, "What does the document say about {}?")
+    return questions[:max_questions]
+
+
+class PrecomputedAnswers:
+    """Thread-safe store of (question, query embedding, answer_question result)."""
+
+    def __init__(self):
+        self._questions = []
+        self._embeddings = []
+        self._results = []
+        self._matrix = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._questions)
+
+    def add(self, question, query_embedding, result):
+        vector = np.asarray(query_embedding, dtype="float32")
+        with self._lock:
+            self._questions.append(question)
+            self._embeddings.append(vector / (np.linalg.norm(vector) or 1.0))
+            self._results.append(result)
+            self._matrix = None
+
+    def match(self, query_embedding, threshold=PRECOMPUTE_MATCH_THRESHOLD):
+        """
+        (question, similarity, result) for the stored question most
+        similar to `query_embedding`, if at least `threshold`; else None.
+        The result is a copy, safe for the caller to annotate.
+        """
+        with self._lock:
+            if not self._questions:
+                return None
+            if self._matrix is None:
+                self._matrix = np.stack(self._embeddings)
+            vector = np.asarray(query_embedding, dtype="float32")
+            similarities = self._matrix @ (vector / (np.linalg.norm(vector) or 1.0))
+            best = int(np.argmax(similarities))
+            if similarities[best] < threshold:
+                return None
+            return self._questions[best], float(similarities[best]), copy.deepcopy(self._results[best])
+
+    def save(self, path):
+        with self._lock:
+            entries = [
+                {"question": q, "embedding": e.tolist(), "result": list(r)}
+                for q, e, r in zip(self._questions, self._embeddings, self._results)
+            ]
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(entries, f)
+
+    @classmethod
+    def load(cls, path):
+        answers = cls()
+        with open(path, "r", encoding="utf-8") as f:
+            for entry in json.load(f):
+                answers.add(entry["question"], entry["embedding"], tuple(entry["result"]))
+        return answers
+
+
+class PrecomputeJob:
+    """
+    Background answering of `questions` against a loaded Document (see
+    src/services/sessions.py). Answers land in `doc.precomputed` as they
+    complete; when all are done they are saved to `save_path`, if given.
+    """
+
+    def __init__(self, doc, questions, controller=None, save_path=None,
+                 idle_poll_s=PRECOMPUTE_IDLE_POLL_S):
+        self.doc = doc
+        self.questions = list(questions)
+        self.save_path = save_path
+        self._controller = controller
+        self._idle_poll_s = idle_poll_s
+        self._cancelled = threading.Event()
+        self.done = threading.Event()
+        self.counters = {"answered": 0, "skipped": 0, "retried": 0}
+        self._thread = threading.Thread(target=self._run, name=f"precompute-{doc.doc_id}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def _wait_until_idle(self, controller):
+        while not self._cancelled.is_set():
+            stats = controller.stats()
+            if stats["queued"] == 0 and stats["in_flight"] == 0:
+                return True
+            self._cancelled.wait(self._idle_poll_s)
+        return False
+
+    def _run(self):
+        try:
+            controller = self._controller or get_admission_controller()
+            pending = list(self.questions)
+            while pending and self._wait_until_idle(controller):
+                question = pending.pop(0)
+                try:
+                    query_embedding = embed_query(question)
+                    result = self._answer(controller, question, query_embedding)
+                except Overloaded:
+                    # Live traffic took precedence; ask again once idle.
+                    pending.insert(0, question)
+                    self.counters["retried"] += 1
+                    continue
+                except Exception:
+                    self.counters["skipped"] += 1
+                    continue
+                if result[3].get("admission", {}).get("degraded"):
+                    # An extractive stand-in, not an answer worth serving later.
+                    self.counters["skipped"] += 1
+                    continue
+                self.doc.precomputed.add(question, query_embedding, result)
+                self.counters["answered"] += 1
+
+            if not pending and self.save_path is not None:
+                self.doc.precomputed.save(self.save_path)
+        finally:
+            self.done.set()
+
+    def _answer(self, controller, question, query_embedding):
+        doc = self.doc
+        return controller.submit(
+            doc.index, doc.store, question, priority="background", doc_id=doc.doc_id,
+            sections=doc.sections, query_embedding=query_embedding, list_index=doc.list_index,
+            profile=False,
+        ).result()
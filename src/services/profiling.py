@@ -0,0 +1,147 @@
+"""
+On-demand profiling of individual requests.
+
+A slow question in production could only be explained by reproducing
+it locally. Instead, a request can be profiled where it ran: either
+because it asked to be (AdmissionController.submit(..., profile=True),
+or ?profile=1 in the Streamlit URL when config.PROFILE_ALLOW_QUERY_PARAM
+is on) or because it was sampled at
+config.PROFILE_SAMPLE_RATE, which is cheap enough to leave on at a low
+rate. A profiled request writes, under config.PROFILE_DIR:
+
+  - <request_id>.pstats: cProfile of retrieval and answer_question on
+    the admission worker thread. Read it with
+    `python -m pstats <file>` or snakeviz.
+  - <request_id>.generation.json: the torch profiler's Chrome trace of
+    the generation call, wherever it ran (inline, the generation stage
+    executor, or a pre-fork worker). Open it in chrome://tracing or
+    ui.perfetto.dev.
+
+The request id is in the request log record, so the slowest requests
+listed by scripts/view_logs.py lead straight to their profiles.
+
+Only one cProfile (and one torch profiler) can be active per process
+at a time, so a request sampled while another is being profiled runs
+unprofiled instead of waiting. Only the newest PROFILE_MAX_FILES
+artifacts are kept.
+"""
+
+import cProfile
+import glob
+import os
+import random
+import threading
+import uuid
+from contextlib import contextmanager
+
+from src.config import (
+    PROFILE_SAMPLE_RATE,
+    PROFILE_DIR,
+    PROFILE_GENERATION,
+    PROFILE_MAX_FILES,
+)
+
+_cpu_lock = threading.Lock()
+_torch_lock = threading.Lock()
+
+
+def new_request_id():
+    return uuid.uuid4().hex[:12]
+
+
+def should_profile(requested=None, sample_rate=PROFILE_SAMPLE_RATE):
+    """An explicit True/False request wins; otherwise sample at `sample_rate`."""
+    if requested is not None:
+        return bool(requested)
+    return sample_rate > 0 and random.random() < sample_rate
+
+
+def _prune(profile_dir, max_files):
+    paths = glob.glob(os.path.join(profile_dir, "*.pstats")) + glob.glob(os.path.join(profile_dir, "*.json"))
+    if max_files is None or len(paths) <= max_files:
+        return
+    paths.sort(key=lambda p: os.path.getmtime(p))
+    for path in paths[:len(paths) - max_files]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass  # another process pruned it first
+
+
+def profile_generation(trace_path, fn, *args, **kwargs):
+    """
+    fn(*args, **kwargs) under the torch profiler, exporting a Chrome
+    trace to `trace_path`. Module-level so it can be sent to the pre-fork
+    generation workers like any other generation call; if a trace is
+    already being recorded in this process, fn just runs.
+    """
+    if not _torch_lock.acquire(blocking=False):
+        return fn(*args, **kwargs)
+    try:
+        import torch.profiler
+
+        with torch.profiler.profile(activities=[torch.profiler.ProfilerActivity.CPU]) as prof:
+            result = fn(*args, **kwargs)
+        os.makedirs(os.path.dirname(os.path.abspath(trace_path)), exist_ok=True)
+        prof.export_chrome_trace(trace_path)
+        return result
+    finally:
+        _torch_lock.release()
+
+
+class RequestProfile:
+    """
+    Profiling for one request. Use cpu() around the request's work and
+    pass the profile to answer_question (profile=), which routes the
+    generation call through generation(). artifacts lists what was
+    written.
+    """
+
+    def __init__(self, request_id, profile_dir=PROFILE_DIR, torch_generation=PROFILE_GENERATION,
+                 max_files=PROFILE_MAX_FILES):
+        self.request_id = request_id
+        self.profile_dir = profile_dir
+        self.torch_generation = torch_generation
+        self.max_files = max_files
+        self.artifacts = []
+
+    def _path(self, suffix):
+        return os.path.join(self.profile_dir, f"{self.request_id}{suffix}")
+
+    @contextmanager
+    def cpu(self):
+        if not _cpu_lock.acquire(blocking=False):
+            yield
+            return
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+            try:
+                yield
+            finally:
+                profiler.disable()
+            os.makedirs(self.profile_dir, exist_ok=True)
+            path = self._path(".pstats")
+            profiler.dump_stats(path)
+            self.artifacts.append(path)
+            _prune(self.profile_dir, self.max_files)
+        finally:
+            _cpu_lock.release()
+
+    def generation(self, fn):
+        """
+        (fn, args prefix) to call in place of fn: profile_generation with
+        this request's trace path, or fn unchanged when torch profiling
+        is off.
+        """
+        if not self.torch_generation:
+            return fn, ()
+        path = self._path(".generation.json")
+        # The trace is written by whichever process runs the call (a
+        # pre-fork worker can't report back), so the path is recorded
+        # here and info() checks it was actually written.
+        self.artifacts.append(path)
+        return profile_generation, (path, fn)
+
+    def info(self):
+        return {"request_id": self.request_id, "artifacts": [p for p in self.artifacts if os.path.exists(p)]}
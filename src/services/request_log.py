@@ -0,0 +1,137 @@
+"""
+Structured request log: one JSON line per request in
+logs/requests.jsonl.
+
+The request path only puts the record dict on a bounded in-memory
+queue (logging.handlers.QueueHandler); a QueueListener thread does the
+JSON serialization, file writes, size-based rotation and gzip of
+rotated files. A full queue drops the record rather than block the
+request, and the drop is counted.
+
+Queries are logged as a hash, never as text -- the log is for latency
+and path analysis, not for reading what users asked.
+"""
+
+import atexit
+import gzip
+import hashlib
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+import threading
+
+from src.config import (
+    REQUEST_LOG_ENABLED,
+    REQUEST_LOG_PATH,
+    REQUEST_LOG_MAX_BYTES,
+    REQUEST_LOG_BACKUPS,
+    REQUEST_LOG_QUEUE_SIZE,
+)
+
+
+def query_hash(query):
+    return hashlib.blake2b(query.strip().lower().encode("utf-8"), digest_size=8).hexdigest()
+
+
+def _gzip_namer(name):
+    return name + ".gz"
+
+
+def _gzip_rotator(source, dest):
+    with open(source, "rb") as f_in, gzip.open(dest, "wb") as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+
+class _JsonLineFormatter(logging.Formatter):
+    def format(self, record):
+        return json.dumps({"ts": round(record.created, 3), **record.msg}, separators=(",", ":"))
+
+
+class _NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # The default prepare() formats the message on the calling
+        # thread; the record dict goes through untouched instead and the
+        # listener's formatter serializes it.
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class RequestLogger:
+    def __init__(self, path=REQUEST_LOG_PATH, max_bytes=REQUEST_LOG_MAX_BYTES,
+                 backups=REQUEST_LOG_BACKUPS, queue_size=REQUEST_LOG_QUEUE_SIZE):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        file_handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8"
+        )
+        file_handler.namer = _gzip_namer
+        file_handler.rotator = _gzip_rotator
+        file_handler.setFormatter(_JsonLineFormatter())
+
+        self._handler = _NonBlockingQueueHandler(queue.Queue(maxsize=queue_size))
+        self._listener = logging.handlers.QueueListener(self._handler.queue, file_handler)
+        self._file_handler = file_handler
+        self._listener.start()
+        self._closed = False
+
+    def log(self, record):
+        """Queue one record (a JSON-serializable dict); never blocks."""
+        self._handler.handle(logging.makeLogRecord({"msg": record}))
+
+    @property
+    def dropped(self):
+        return self._handler.dropped
+
+    def close(self):
+        """Flush queued records to disk and stop the writer thread."""
+        if not self._closed:
+            self._closed = True
+            self._listener.stop()
+            self._file_handler.close()
+
+
+_logger = None
+_logger_lock = threading.Lock()
+
+
+def get_request_logger():
+    global _logger
+    with _logger_lock:
+        if _logger is None:
+            _logger = RequestLogger()
+            atexit.register(_logger.close)
+        return _logger
+
+
+def log_request(query, doc_id=None, details=None, label=None, **fields):
+    """
+    Log one answered request: query hash, doc id, per-stage timings,
+    top score, confidence label, answering path and cache hits (from
+    answer_question's details), plus any extra fields.
+    """
+    if not REQUEST_LOG_ENABLED:
+        return
+    details = details or {}
+    record = {
+        "query_hash": query_hash(query),
+        "doc_id": doc_id,
+        "timings": details.get("timings", {}),
+        "top_score": details.get("top_score"),
+        "label": label,
+        "path": details.get("path"),
+        "cache_hits": details.get("cache_hits", {}),
+        **fields,
+    }
+    get_request_logger().log(record)
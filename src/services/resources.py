@@ -0,0 +1,123 @@
+"""
+Resource manager: partitions CPU threads between the embedding, FAISS
+retrieval and generation stages, and bounds per-stage concurrency with
+a dedicated executor per stage (see config.RESOURCE_PARTITIONING).
+
+Why per-thread limits work here: torch's CPU intra-op pool (OpenMP
+builds) and FAISS both size their parallel regions from the CALLING
+thread's OpenMP setting, so calling torch.set_num_threads /
+faiss.omp_set_num_threads once in each executor thread's initializer
+caps that stage without affecting the others. torch's inter-op pool
+is process-wide and is sized once, at manager creation.
+"""
+
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import faiss
+import torch
+
+from src.services.worker_pool import get_worker_pool
+from src.config import (
+    RESOURCE_PARTITIONING,
+    GENERATION_WORKERS,
+    STAGE_THREAD_SHARES,
+    STAGE_CONCURRENCY,
+    TORCH_INTEROP_THREADS,
+)
+
+STAGES = ("embedding", "retrieval", "generation")
+
+logger = logging.getLogger(__name__)
+_warned_no_pool = False
+
+
+def _limit_threads(num_threads):
+    torch.set_num_threads(num_threads)
+    faiss.omp_set_num_threads(num_threads)
+
+
+def thread_budgets(shares, cpu_count=None):
+    """Per-stage thread counts from fractional shares of the cores (min 1 each)."""
+    cpu_count = cpu_count or os.cpu_count() or 1
+    return {stage: max(1, int(cpu_count * shares[stage])) for stage in STAGES}
+
+
+class ResourceManager:
+    def __init__(self, thread_shares=STAGE_THREAD_SHARES, concurrency=STAGE_CONCURRENCY,
+                 interop_threads=TORCH_INTEROP_THREADS):
+        self.budgets = thread_budgets(thread_shares)
+        self.concurrency = {stage: concurrency[stage] for stage in STAGES}
+        try:
+            torch.set_num_interop_threads(interop_threads)
+        except RuntimeError:
+            pass  # already set, or inter-op work already ran in this process
+        self.executors = {
+            stage: ThreadPoolExecutor(
+                max_workers=self.concurrency[stage],
+                thread_name_prefix=f"{stage}-stage",
+                initializer=_limit_threads,
+                initargs=(self.budgets[stage],),
+            )
+            for stage in STAGES
+        }
+
+    def submit(self, stage, fn, *args, **kwargs):
+        return self.executors[stage].submit(fn, *args, **kwargs)
+
+    def run(self, stage, fn, *args, **kwargs):
+        """Run fn on the stage's executor and wait for its result."""
+        return self.submit(stage, fn, *args, **kwargs).result()
+
+    def stats(self):
+        return {
+            stage: {"threads": self.budgets[stage], "concurrency": self.concurrency[stage]}
+            for stage in STAGES
+        }
+
+    def shutdown(self):
+        for executor in self.executors.values():
+            executor.shutdown(wait=True)
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_resource_manager():
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = ResourceManager()
+        return _manager
+
+
+def _warn_no_worker_pool(pool):
+    global _warned_no_pool
+    if not _warned_no_pool:
+        _warned_no_pool = True
+        logger.warning(
+            "GENERATION_WORKERS > 1 but the worker pool is %s; generating in-process.",
+            "not started (call start_worker_pool() at startup)" if pool is None else "out of workers",
+        )
+
+
+def run_in_stage(stage, fn, *args, **kwargs):
+    """
+    Run one pipeline stage's work under its thread/concurrency budget
+    when partitioning is enabled; inline (the original behavior) when not.
+    With config.GENERATION_WORKERS > 1, generation runs in the pre-fork
+    worker processes instead (src/services/worker_pool.py) -- once
+    start_worker_pool() has run at process start, and while the pool has
+    live workers; otherwise it runs in-process.
+    """
+    if stage == "generation" and GENERATION_WORKERS > 1:
+        pool = get_worker_pool()
+        if pool is not None and not pool.broken:
+            return pool.run(fn, *args, **kwargs)
+        _warn_no_worker_pool(pool)
+    if not RESOURCE_PARTITIONING:
+        return fn(*args, **kwargs)
+    return get_resource_manager().run(stage, fn, *args, **kwargs)
@@ -1,21 +1,90 @@
 """
 Retrieval service: embeds chunks/queries and runs FAISS search.
+
+`chunks` can be a plain list of strings or a utils.chunk_store.ChunkStore
+-- only len(), iteration and indexing by chunk id are used.
 """
 
-from utils.embeddings import generate_embeddings
-from utils.retriever import create_faiss_index, search_index
-from src.config import TOP_K
+import time
+
+from utils.embeddings import generate_embeddings, generate_passage_embeddings_cached, load_embedding_cache
+from utils.retriever import create_faiss_index, create_reduced_index, create_sharded_index, search_index
+from src.services.resources import run_in_stage
+from src.config import (
+    TOP_K,
+    FAISS_NUM_SHARDS,
+    FAISS_OMP_THREADS_PER_SHARD,
+    EMBEDDING_REDUCED_DIM,
+    PCA_TRAIN_SAMPLE,
+)
 
 
 def build_index(chunks):
-    """Embed a list of chunks (as passages) and build a FAISS index."""
-    embeddings = generate_embeddings(chunks, is_query=False)
-    index = create_faiss_index(embeddings)
-    return index, embeddings
+    """
+    Embed chunks (as passages) and build a FAISS index. With the
+    embedding cache enabled (config.EMBEDDING_CACHE_DIR), only chunks
+    never seen before -- by any document -- are encoded, in one batch.
+    With config.EMBEDDING_REDUCED_DIM set, the index stores PCA-reduced
+    vectors; queries are projected by the index itself at search time.
+    Returned embeddings are always the full-dimension ones.
+    """
+    cache = load_embedding_cache()
+    if cache is not None:
+        embeddings = run_in_stage("embedding", generate_passage_embeddings_cached, list(chunks), cache)
+    else:
+        embeddings = run_in_stage("embedding", generate_embeddings, chunks, is_query=False)
+
+    return index_from_embeddings(embeddings), embeddings
+
+
+def index_from_embeddings(embeddings):
+    """
+    The configured index type (flat, sharded or PCA-reduced) over
+    existing embeddings. Sharding and PCA reduction don't combine yet;
+    setting both raises ValueError rather than silently keeping one.
+    """
+    if FAISS_NUM_SHARDS > 1 and EMBEDDING_REDUCED_DIM:
+        raise ValueError(
+            "FAISS_NUM_SHARDS > 1 and EMBEDDING_REDUCED_DIM can't be combined; set one of them."
+        )
+    if FAISS_NUM_SHARDS > 1:
+        return create_sharded_index(
+            embeddings, FAISS_NUM_SHARDS, omp_threads_per_shard=FAISS_OMP_THREADS_PER_SHARD
+        )
+    if EMBEDDING_REDUCED_DIM:
+        return create_reduced_index(embeddings, EMBEDDING_REDUCED_DIM, train_sample=PCA_TRAIN_SAMPLE)
+    return create_faiss_index(embeddings)
+
+
+def embed_query(query):
+    """The query embedding retrieve() searches with."""
+    return run_in_stage("embedding", generate_embeddings, [query], is_query=True)[0]
 
 
-def retrieve(index, chunks, query, top_k=TOP_K):
-    """Embed a query and retrieve the top-k most relevant chunks."""
-    query_embedding = generate_embeddings([query], is_query=True)[0]
-    results, scores = search_index(index, query_embedding, chunks, top_k=top_k)
-    return results, scores
\ No newline at end of file
+def retrieve(index, chunks, query, top_k=TOP_K, return_ids=False, timings=None, sections=None,
+             query_embedding=None):
+    """
+    Embed a query and retrieve the top-k most relevant chunks. With
+    return_ids=True also returns the chunk ids, e.g. for
+    ChunkStore.metadata(ids) provenance lookups. If a dict is passed as
+    `timings`, embedding_ms and search_ms are recorded in it. With a
+    `sections` SectionIndex (src/services/sections.py), the search is
+    coarse-to-fine: best sections first, then only their chunks. A
+    `query_embedding` from embed_query() that the caller already has is
+    used instead of encoding the query again.
+    """
+    start = time.perf_counter()
+    if query_embedding is None:
+        query_embedding = embed_query(query)
+    embedded = time.perf_counter()
+    allowed_ids = None
+    if sections is not None:
+        allowed_ids = sections.candidate_ids(query_embedding, min_chunks=top_k)
+    results = run_in_stage(
+        "retrieval", search_index, index, query_embedding, chunks,
+        top_k=top_k, return_ids=return_ids, allowed_ids=allowed_ids,
+    )
+    if timings is not None:
+        timings["embedding_ms"] = round((embedded - start) * 1000, 1)
+        timings["search_ms"] = round((time.perf_counter() - embedded) * 1000, 1)
+    return results
\ No newline at end of file
@@ -0,0 +1,80 @@
+"""
+Section-level index for coarse-to-fine retrieval.
+
+Ingest splits the document into sections at detected headings
+(utils.chunker.section_starts) and records each chunk's section range
+in the ChunkStore metadata. Here, every section gets a summary
+embedding -- the normalized mean of its chunks' passage embeddings, so
+no extra encoder calls -- in a small flat index. A query first picks the
+best sections by that embedding, and the chunk search is then limited to
+those sections' chunks (search_index's allowed_ids).
+
+Besides scoring fewer vectors on long documents, this keeps retrieval
+inside the section the question is about: e.g. "what are the
+qualifications" no longer pulls a Tasks chunk that happens to be close
+in embedding space -- the wrong-section case extract_list otherwise has
+to patch up lexically.
+"""
+
+import faiss
+import numpy as np
+
+from src.config import SECTION_TOP_K, HIERARCHICAL_MIN_SECTIONS
+
+
+class SectionIndex:
+    def __init__(self, section_ids, members, centroids):
+        self.section_ids = section_ids  # section number of each row below
+        self.members = members  # int64 chunk ids per section
+        self.index = faiss.IndexFlatIP(centroids.shape[1])
+        self.index.add(centroids)
+
+    def __len__(self):
+        return len(self.section_ids)
+
+    @classmethod
+    def build(cls, meta, embeddings):
+        """
+        Build from ChunkStore metadata (section_start/section_end) and the
+        chunk embeddings build_index produced. Chunks with unknown
+        sections (-1, e.g. an upgraded v1 store) are left out.
+        """
+        embeddings = np.asarray(embeddings, dtype="float32")
+        starts, ends = np.asarray(meta["section_start"]), np.asarray(meta["section_end"])
+
+        section_ids, members, centroids = [], [], []
+        known = starts >= 0
+        if known.any():
+            for section in range(int(starts[known].min()), int(ends[known].max()) + 1):
+                chunk_ids = np.flatnonzero(known & (starts <= section) & (ends >= section))
+                if len(chunk_ids) == 0:
+                    continue
+                centroid = embeddings[chunk_ids].mean(axis=0)
+                section_ids.append(section)
+                members.append(chunk_ids.astype(np.int64))
+                centroids.append(centroid / (np.linalg.norm(centroid) or 1.0))
+
+        dim = embeddings.shape[1] if embeddings.ndim == 2 else 0
+        return cls(section_ids, members, np.array(centroids, dtype="float32").reshape(-1, dim))
+
+    def candidate_ids(self, query_embedding, top_sections=SECTION_TOP_K, min_chunks=0):
+        """
+        Chunk ids of the best-matching sections, or None when the
+        document has too few sections for narrowing to be worthwhile.
+        Takes at least `top_sections` sections, and more if needed to
+        cover `min_chunks` chunks (usually the caller's top_k).
+        """
+        if len(self) < HIERARCHICAL_MIN_SECTIONS:
+            return None
+
+        query = np.array([query_embedding], dtype="float32")
+        faiss.normalize_L2(query)
+        _, ranked = self.index.search(query, len(self))
+
+        selected, count = [], 0
+        for row in ranked[0]:
+            if len(selected) >= top_sections and count >= min_chunks:
+                break
+            selected.append(self.members[row])
+            count += len(self.members[row])
+        return np.unique(np.concatenate(selected))
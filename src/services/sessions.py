@@ -0,0 +1,353 @@
+"""
+Document manager shared by every user session: one loaded copy of each
+distinct document (keyed by a hash of the uploaded bytes), a global
+memory budget over all of them, and LRU eviction to disk.
+
+Without it, each Streamlit session held its own chunks and FAISS index
+and nothing bounded the total -- and because Streamlit re-runs the
+script on every interaction, the same upload was re-ingested and
+re-embedded for every question.
+
+  - Two sessions uploading identical bytes share one Document.
+  - A Document's size is its ChunkStore bytes plus its index bytes
+    (utils.retriever.index_nbytes) plus its section index.
+  - Past the budget, least recently used Documents are dropped from
+    memory, ones no session has open first. Their chunks, embeddings and
+    list index were written to the spill directory at ingest, so the
+    next get() reloads them lazily -- memory-mapped chunk text and an
+    index rebuilt from the saved embeddings, with no PDF parsing or
+    encoder calls.
+  - With config.PRETOKENIZED_CHUNKS, the store also carries the
+    generator's token ids for each chunk (utils/chunk_tokens.py),
+    tokenized once at ingest and spilled with the chunks; a reloaded
+    store's tokens are dropped if they came from a different generator.
+  - With config.PRECOMPUTE_ANSWERS, a freshly loaded Document starts a
+    background PrecomputeJob (src/services/precompute.py) for its likely
+    questions; the answers are spilled with the document once complete,
+    and the job is cancelled if the document is evicted first.
+  - A session that hasn't opened or used its document for
+    SESSION_TTL_S is detached (Streamlit gives no reliable session-end
+    callback, and the app re-opens its document on every rerun, so
+    silence means the tab is gone). Its document then counts as idle.
+  - The spill directory is kept under SESSION_SPILL_MAX_BYTES: after an
+    ingest adds to it, spilled documents that are neither loaded nor
+    attached to a session are deleted, least recently used first.
+    Re-uploading one re-ingests it.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from utils.chunk_store import ChunkStore
+from utils.upload import read_upload
+from utils.retriever import index_nbytes
+from utils.generator import tokenize_chunks
+from src.services.ingestion import ingest_pdf_document, MAX_FILE_SIZE_BYTES
+from src.services.retrieval import build_index, index_from_embeddings
+from src.services.list_index import ListIndex
+from src.services.sections import SectionIndex
+from src.services.precompute import PrecomputedAnswers, PrecomputeJob, candidate_questions
+from src.config import (
+    SESSION_MEMORY_BUDGET_BYTES,
+    SESSION_SPILL_DIR,
+    SESSION_SPILL_MAX_BYTES,
+    SESSION_TTL_S,
+    HIERARCHICAL_RETRIEVAL,
+    PRECOMPUTE_ANSWERS,
+    PRETOKENIZED_CHUNKS,
+    GENERATOR_MODEL_NAME,
+)
+
+_CHUNKS_DIR = "chunks"
+_EMBEDDINGS_FILE = "embeddings.npy"
+_LISTS_FILE = "lists.json"
+_PRECOMPUTED_FILE = "precomputed.json"
+_INFO_FILE = "document.json"  # written last: marks a complete spill
+
+
+def _dir_nbytes(path):
+    return sum(
+        os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names
+    )
+
+
+def content_hash(data):
+    """The doc id of uploaded bytes (utils.upload.Upload.digest computes the same)."""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def _ingest_and_index(upload, report=None):
+    """
+    Default builder: (store, index, embeddings, list_index) for an
+    uploaded PDF (a utils.upload.Upload). `report` is passed to
+    ingest_pdf_document (skipped pages).
+    """
+    store, list_index = ingest_pdf_document(upload, report=report)
+    if PRETOKENIZED_CHUNKS:
+        store.tokens = tokenize_chunks(store)
+    index, embeddings = build_index(store)
+    return store, index, embeddings, list_index
+
+
+class Document:
+    """Everything a request needs for one document."""
+
+    def __init__(self, doc_id, store, index, list_index, sections):
+        self.doc_id = doc_id
+        self.store = store
+        self.index = index
+        self.list_index = list_index
+        self.sections = sections
+        self.nbytes = store.nbytes + index_nbytes(index)
+        if sections is not None:
+            self.nbytes += index_nbytes(sections.index)
+        self.sessions = set()
+        self.last_used = time.monotonic()
+        self.precomputed = PrecomputedAnswers()
+        self.precompute_job = None
+        self.skipped_pages = []  # pages the PDF parser gave up on (see pdf_workers)
+
+
+class DocumentManager:
+    def __init__(self, budget_bytes=SESSION_MEMORY_BUDGET_BYTES, spill_dir=SESSION_SPILL_DIR,
+                 builder=_ingest_and_index, index_builder=index_from_embeddings,
+                 precompute=PRECOMPUTE_ANSWERS, session_ttl_s=SESSION_TTL_S,
+                 spill_max_bytes=SESSION_SPILL_MAX_BYTES):
+        self.budget_bytes = budget_bytes
+        self.spill_dir = spill_dir
+        self.session_ttl_s = session_ttl_s
+        self.spill_max_bytes = spill_max_bytes
+        self._builder = builder
+        self._index_builder = index_builder
+        self.precompute = precompute
+        self._loaded = OrderedDict()  # doc_id -> Document, least recently used first
+        self._sessions = {}  # session_id -> doc_id
+        self._session_seen = {}  # session_id -> time.monotonic() of its last open/get
+        self._evicted_at = {}  # doc_id -> time.time() it was evicted, for spill pruning order
+        self._loading = {}  # doc_id -> Event, so concurrent opens build once
+        self._lock = threading.Lock()
+        self.counters = {
+            "ingests": 0, "shared": 0, "hits": 0, "reloads": 0, "evictions": 0,
+            "expired_sessions": 0, "spill_pruned": 0,
+        }
+
+    def _path(self, doc_id, *parts):
+        return os.path.join(self.spill_dir, doc_id, *parts)
+
+    def _is_spilled(self, doc_id):
+        return self.spill_dir is not None and os.path.exists(self._path(doc_id, _INFO_FILE))
+
+    def open(self, data, session_id=None):
+        """
+        The Document for this upload -- bytes or a binary file object,
+        e.g. Streamlit's UploadedFile -- ingesting it only if no session
+        has before. Attaches `session_id` to it (replacing that session's
+        previous document). The upload is read once (utils.upload), for
+        both its hash and, on a miss, parsing.
+        """
+        with read_upload(data, max_bytes=MAX_FILE_SIZE_BYTES) as upload:
+            return self._acquire(upload.digest, session_id, data=upload)
+
+    def get(self, doc_id, session_id=None):
+        """A previously opened document by id, reloading it if it was evicted."""
+        return self._acquire(doc_id, session_id)
+
+    def _acquire(self, doc_id, session_id, data=None):
+        while True:
+            with self._lock:
+                self._expire_sessions()
+                doc = self._loaded.get(doc_id)
+                if doc is not None:
+                    self._loaded.move_to_end(doc_id)
+                    self.counters["hits"] += 1
+                    if session_id is not None and session_id not in doc.sessions and doc.sessions:
+                        self.counters["shared"] += 1
+                    self._attach(doc, session_id)
+                    return doc
+                pending = self._loading.get(doc_id)
+                if pending is None:
+                    self._loading[doc_id] = threading.Event()
+                    break
+            pending.wait()  # someone else is loading it; then retry
+
+        try:
+            if self._is_spilled(doc_id):
+                doc = self._reload(doc_id)
+                counter = "reloads"
+            elif data is not None:
+                doc = self._build(doc_id, data)
+                counter = "ingests"
+            else:
+                raise KeyError(f"Unknown document {doc_id!r}; open() it first.")
+            with self._lock:
+                self.counters[counter] += 1
+                self._loaded[doc_id] = doc
+                self._attach(doc, session_id)
+                self._evict_over_budget(keep=doc_id)
+            if counter == "ingests" and self.spill_dir is not None and self.spill_max_bytes is not None:
+                self._prune_spill()
+            if self.precompute and doc.precompute_job is None and not len(doc.precomputed):
+                save_path = self._path(doc_id, _PRECOMPUTED_FILE) if self.spill_dir is not None else None
+                doc.precompute_job = PrecomputeJob(
+                    doc, candidate_questions(doc.store, doc.list_index), save_path=save_path
+                ).start()
+            return doc
+        finally:
+            with self._lock:
+                self._loading.pop(doc_id).set()
+
+    def _attach(self, doc, session_id):
+        # Caller holds self._lock.
+        doc.last_used = time.monotonic()
+        if session_id is None:
+            return
+        previous = self._sessions.get(session_id)
+        if previous is not None and previous != doc.doc_id and previous in self._loaded:
+            self._loaded[previous].sessions.discard(session_id)
+        self._sessions[session_id] = doc.doc_id
+        self._session_seen[session_id] = doc.last_used
+        doc.sessions.add(session_id)
+
+    def _detach(self, session_id):
+        # Caller holds self._lock.
+        doc_id = self._sessions.pop(session_id, None)
+        self._session_seen.pop(session_id, None)
+        if doc_id in self._loaded:
+            self._loaded[doc_id].sessions.discard(session_id)
+
+    def _expire_sessions(self):
+        # Caller holds self._lock.
+        if self.session_ttl_s is None:
+            return
+        cutoff = time.monotonic() - self.session_ttl_s
+        for session_id, seen in list(self._session_seen.items()):
+            if seen < cutoff:
+                self._detach(session_id)
+                self.counters["expired_sessions"] += 1
+
+    def _build(self, doc_id, data):
+        report = {}
+        store, index, embeddings, list_index = self._builder(data, report=report)
+        sections = SectionIndex.build(store.meta, embeddings) if HIERARCHICAL_RETRIEVAL else None
+        if self.spill_dir is not None:
+            # Written now rather than at eviction, so evicting is just
+            # dropping references (no disk I/O under the lock).
+            os.makedirs(self._path(doc_id), exist_ok=True)
+            store.save(self._path(doc_id, _CHUNKS_DIR))
+            np.save(self._path(doc_id, _EMBEDDINGS_FILE), np.asarray(embeddings, dtype="float32"))
+            list_index.save(self._path(doc_id, _LISTS_FILE))
+            with open(self._path(doc_id, _INFO_FILE), "w", encoding="utf-8") as f:
+                json.dump({
+                    "doc_id": doc_id, "num_chunks": len(store),
+                    "skipped_pages": report.get("skipped_pages", []),
+                }, f)
+        doc = Document(doc_id, store, index, list_index, sections)
+        doc.skipped_pages = report.get("skipped_pages", [])
+        return doc
+
+    def _reload(self, doc_id):
+        store = ChunkStore.open(self._path(doc_id, _CHUNKS_DIR))
+        if store.tokens is not None and store.tokens.tokenizer_name != GENERATOR_MODEL_NAME:
+            store.tokens = None  # ids from another vocabulary; generation re-tokenizes instead
+        embeddings = np.load(self._path(doc_id, _EMBEDDINGS_FILE), mmap_mode="r")
+        index = self._index_builder(np.asarray(embeddings))
+        list_index = ListIndex.load(self._path(doc_id, _LISTS_FILE))
+        sections = SectionIndex.build(store.meta, embeddings) if HIERARCHICAL_RETRIEVAL else None
+        doc = Document(doc_id, store, index, list_index, sections)
+        with open(self._path(doc_id, _INFO_FILE), "r", encoding="utf-8") as f:
+            doc.skipped_pages = json.load(f).get("skipped_pages", [])
+        if os.path.exists(self._path(doc_id, _PRECOMPUTED_FILE)):
+            doc.precomputed = PrecomputedAnswers.load(self._path(doc_id, _PRECOMPUTED_FILE))
+        return doc
+
+    def _evict_over_budget(self, keep):
+        # Caller holds self._lock. Documents no session has open go first.
+        used = sum(doc.nbytes for doc in self._loaded.values())
+        for only_idle in (True, False):
+            for doc_id in list(self._loaded):
+                if used <= self.budget_bytes:
+                    return
+                doc = self._loaded[doc_id]
+                if doc_id == keep or (only_idle and doc.sessions):
+                    continue
+                # In-flight requests keep their own reference; the memory
+                # (and the store's mmap) is released when they finish.
+                del self._loaded[doc_id]
+                self._evicted_at[doc_id] = time.time()
+                if doc.precompute_job is not None:
+                    doc.precompute_job.cancel()
+                used -= doc.nbytes
+                self.counters["evictions"] += 1
+
+    def _prune_spill(self):
+        """
+        Delete spilled documents until the spill directory fits
+        spill_max_bytes, least recently used first (eviction time, or
+        the spill's age for documents from an earlier process).
+        Documents that are loaded, attached to a session or mid-load are
+        kept. Runs outside the lock except for those checks.
+        """
+        entries = []
+        for doc_id in os.listdir(self.spill_dir):
+            if not os.path.isdir(self._path(doc_id)):
+                continue
+            info = self._path(doc_id, _INFO_FILE)
+            last_used = self._evicted_at.get(doc_id) or (os.path.getmtime(info) if os.path.exists(info) else 0.0)
+            entries.append((last_used, doc_id, _dir_nbytes(self._path(doc_id))))
+        total = sum(size for _, _, size in entries)
+        for _, doc_id, size in sorted(entries):
+            if total <= self.spill_max_bytes:
+                return
+            with self._lock:
+                if doc_id in self._loaded or doc_id in self._loading or doc_id in self._sessions.values():
+                    continue
+                # Marked as loading so a concurrent get() waits for the
+                # delete instead of reloading a half-removed spill.
+                self._loading[doc_id] = threading.Event()
+            try:
+                shutil.rmtree(self._path(doc_id), ignore_errors=True)
+            finally:
+                with self._lock:
+                    self._loading.pop(doc_id).set()
+                    self._evicted_at.pop(doc_id, None)
+                    self.counters["spill_pruned"] += 1
+            total -= size
+
+    def close_session(self, session_id):
+        with self._lock:
+            self._detach(session_id)
+
+    def stats(self):
+        with self._lock:
+            used = sum(doc.nbytes for doc in self._loaded.values())
+            return {
+                **self.counters,
+                "budget_bytes": self.budget_bytes,
+                "used_bytes": used,
+                "occupancy": round(used / self.budget_bytes, 3) if self.budget_bytes else None,
+                "loaded_documents": len(self._loaded),
+                "sessions": len(self._sessions),
+                "documents": [
+                    {"doc_id": d.doc_id, "nbytes": d.nbytes, "sessions": len(d.sessions)}
+                    for d in self._loaded.values()
+                ],
+            }
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_document_manager():
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = DocumentManager()
+        return _manager
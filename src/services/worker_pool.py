@@ -0,0 +1,311 @@
+"""
+Pre-fork generation workers that share model weights copy-on-write.
+
+The parent loads the models (load_embedding_model / load_generator)
+once, runs gc.collect() + gc.freeze(), and only then forks the workers.
+Each worker sees the parent's weight tensors through shared pages: the
+tensor data is never written after loading, and freezing moves every
+existing Python object into the GC's permanent generation, so later
+collections in a worker don't touch (and so copy) the object headers.
+What a worker adds on top is its own activations, allocator state and
+whatever it imports or caches after the fork -- see
+scripts/bench_prefork.py for RSS/PSS per worker.
+
+The fork has to happen before any model inference runs in the parent:
+forking a process whose OpenMP/torch thread pools are already running
+deadlocks the child's first parallel op (a 4-thread matmul in the
+parent, then one in a worker, never returns). So the pool is not
+created on first use: start_worker_pool() must be called at process
+start, before any ingest or embedding (src/ui/streamlit_app.py does),
+and until it has been, generation runs in-process. Loading weights is
+fine; only running ops in parallel starts the pools. Workers then size
+their own torch pool.
+
+A worker that dies (OOM kill, crash) fails the call it was running
+with WorkerDied, and a call that takes longer than task_timeout_s
+raises TimeoutError and its worker is killed. Dead workers are not
+re-forked -- by then the parent has run inference -- and once none are
+left, the pool is `broken` and generation falls back to in-process.
+
+Each worker has its own Pipe, and the parent hands a call to an idle
+worker (queueing it until one is free), as pdf_workers.py does. A
+shared multiprocessing queue would let a worker killed mid-get() die
+holding the queue's reader lock and wedge every other worker. Calls are
+plain (fn, args, kwargs) tuples, so fn must be a module-level function
+and its arguments and result picklable (generate_answer's
+context/question/answer are). Mutable arguments are copied into the
+worker, so e.g. generate_answer's cache_info dict is not filled in for
+the caller.
+"""
+
+import collections
+import gc
+import itertools
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+from multiprocessing.connection import wait
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+import torch
+
+from utils.embeddings import load_embedding_model
+from utils.generator import load_generator
+from src.config import (
+    GENERATION_WORKERS,
+    GENERATION_WORKER_THREADS,
+    GENERATION_WORKER_TIMEOUT_S,
+    GENERATION_WORKER_LIVENESS_S,
+)
+
+_DEFAULT_PRELOAD = (load_embedding_model, load_generator)
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerDied(RuntimeError):
+    """The worker running a call exited before returning its result."""
+
+
+def process_memory(pid):
+    """{"rss_mb", "pss_mb"} of a process from /proc (Linux), or None elsewhere."""
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", "r", encoding="utf-8") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+    except OSError:
+        return None
+    return {
+        "rss_mb": round(int(fields["Rss"].split()[0]) / 1024, 1),
+        # PSS splits each shared page between the processes mapping it,
+        # so it is the honest "memory this worker costs" number.
+        "pss_mb": round(int(fields["Pss"].split()[0]) / 1024, 1),
+    }
+
+
+def _worker_loop(conn, num_threads):
+    torch.set_num_threads(num_threads)
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+        task_id, fn, args, kwargs = task
+        try:
+            message = (task_id, "ok", fn(*args, **kwargs))
+        except Exception as e:
+            message = (task_id, "error", e)
+        conn.send(message)
+
+
+class _Worker:
+    def __init__(self, context, num_threads, number):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_loop, args=(child_conn, num_threads), name=f"generation-worker-{number}", daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        self.task_id = None  # the call it is running
+        self.dead = False
+
+
+class PreforkPool:
+    def __init__(self, num_workers=GENERATION_WORKERS, preload=_DEFAULT_PRELOAD,
+                 threads_per_worker=GENERATION_WORKER_THREADS, task_timeout_s=GENERATION_WORKER_TIMEOUT_S,
+                 liveness_interval_s=GENERATION_WORKER_LIVENESS_S):
+        for load in preload:
+            load()
+        gc.collect()
+        gc.freeze()
+
+        if threads_per_worker is None:
+            threads_per_worker = max(1, (os.cpu_count() or 1) // num_workers)
+        self.num_workers = num_workers
+        self.threads_per_worker = threads_per_worker
+        self.task_timeout_s = task_timeout_s
+        self.liveness_interval_s = liveness_interval_s
+
+        context = multiprocessing.get_context("fork")
+        self._wakeup, self._wakeup_send = context.Pipe(duplex=False)
+        self._workers = [_Worker(context, threads_per_worker, i) for i in range(num_workers)]
+
+        self._ids = itertools.count()
+        self._queue = collections.deque()  # (task_id, fn, args, kwargs) waiting for an idle worker
+        self._pending = {}  # task_id -> Future, queued or running
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._collector = threading.Thread(target=self._collect, name="prefork-results", daemon=True)
+        self._collector.start()
+
+    def _collect(self):
+        # Wakes for a result, a worker exiting (its sentinel), close(), or
+        # every liveness_interval_s.
+        while not self._closed.is_set():
+            with self._lock:
+                live = [worker for worker in self._workers if not worker.dead]
+            by_conn = {worker.conn: worker for worker in live}
+            ready = wait([self._wakeup, *by_conn, *(worker.process.sentinel for worker in live)],
+                         timeout=self.liveness_interval_s)
+            for conn in ready:
+                worker = by_conn.get(conn)
+                if worker is None:
+                    continue
+                try:
+                    task_id, status, value = conn.recv()
+                except (EOFError, OSError):
+                    continue  # it exited; check_workers fails its call
+                self._finish(worker, task_id, status, value)
+            self.check_workers()
+
+    def _finish(self, worker, task_id, status, value):
+        with self._lock:
+            if worker.task_id == task_id:
+                worker.task_id = None
+            # None: already failed by a timeout.
+            future = self._pending.pop(task_id, None)
+            failed = self._dispatch()
+        self._fail(failed)
+        if future is None:
+            return
+        if status == "ok":
+            future.set_result(value)
+        else:
+            future.set_exception(value)
+
+    def _dispatch(self):
+        # Caller holds self._lock. Hands queued calls to idle workers;
+        # returns [(future, exception)] for calls that couldn't be sent.
+        failed = []
+        for worker in self._workers:
+            if worker.dead or worker.task_id is not None or not worker.process.is_alive():
+                continue  # (an exited worker is marked dead by check_workers)
+            while self._queue:
+                task = self._queue.popleft()
+                if task[0] not in self._pending:
+                    continue  # timed out while queued
+                worker.task_id = task[0]
+                try:
+                    worker.conn.send(task)
+                except OSError:
+                    pass  # the worker is gone; check_workers fails the call
+                except Exception as e:
+                    # Pickling failed before anything was written.
+                    worker.task_id = None
+                    failed.append((self._pending.pop(task[0]), e))
+                    continue
+                break
+        return failed
+
+    def _fail(self, failed):
+        for future, exception in failed:
+            future.set_exception(exception)
+
+    def check_workers(self):
+        """Fail the calls of workers that have exited (run periodically by the pool)."""
+        failed = []
+        with self._lock:
+            for worker in self._workers:
+                if worker.dead or worker.process.is_alive():
+                    continue
+                worker.dead = True
+                process = worker.process
+                logger.warning("Generation worker %s exited with code %s", process.pid, process.exitcode)
+                future = self._pending.pop(worker.task_id, None)
+                worker.task_id = None
+                if future is not None:
+                    failed.append((future, WorkerDied(
+                        f"Generation worker {process.pid} exited with code {process.exitcode}."
+                    )))
+            if self.broken:
+                # Nothing will ever pick up the queued calls.
+                failed += [(future, WorkerDied("No generation workers left.")) for future in self._pending.values()]
+                self._pending.clear()
+                self._queue.clear()
+        self._fail(failed)
+
+    @property
+    def broken(self):
+        return all(worker.dead for worker in self._workers)
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        with self._lock:
+            if self.broken:
+                raise WorkerDied("No generation workers left.")
+            task_id = next(self._ids)
+            self._pending[task_id] = future
+            self._queue.append((task_id, fn, args, kwargs))
+            failed = self._dispatch()
+        future.task_id = task_id
+        self._fail(failed)
+        return future
+
+    def run(self, fn, *args, **kwargs):
+        """
+        submit() and wait up to task_timeout_s. On timeout the call is
+        abandoned and its worker killed (a hung worker would otherwise
+        hold the call forever); TimeoutError is raised.
+        """
+        future = self.submit(fn, *args, **kwargs)
+        try:
+            return future.result(timeout=self.task_timeout_s)
+        except FutureTimeoutError:
+            with self._lock:
+                self._pending.pop(future.task_id, None)
+                running = [w.process for w in self._workers if w.task_id == future.task_id and not w.dead]
+            for process in running:
+                os.kill(process.pid, signal.SIGKILL)
+            raise TimeoutError(f"Generation call took longer than {self.task_timeout_s}s.") from None
+
+    @property
+    def worker_pids(self):
+        return [worker.process.pid for worker in self._workers]
+
+    def memory(self):
+        """Per-process RSS/PSS: the parent, then each worker."""
+        return {
+            "parent": process_memory(os.getpid()),
+            "workers": [process_memory(pid) for pid in self.worker_pids],
+        }
+
+    def close(self):
+        with self._lock:
+            for worker in self._workers:
+                if not worker.dead:
+                    try:
+                        worker.conn.send(None)
+                    except OSError:
+                        pass
+        for worker in self._workers:
+            worker.process.join()
+        self._closed.set()
+        self._wakeup_send.send(None)
+        self._collector.join()
+        for worker in self._workers:
+            worker.conn.close()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def start_worker_pool():
+    """
+    Create the process-wide pool with config.GENERATION_WORKERS workers.
+    Call at process start, before any model inference (see the module
+    docstring); later calls return the same pool.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = PreforkPool()
+        return _pool
+
+
+def get_worker_pool():
+    """The pool from start_worker_pool(), or None if it was never started."""
+    return _pool
@@ -7,15 +7,23 @@ Run with: streamlit run src/ui/streamlit_app.py
 """
 import sys
 import os
+import uuid
 
 # Ensure the project root is on sys.path so `src.services...` imports
 # resolve correctly no matter what directory Streamlit is launched from.
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
 import streamlit as st
 
-from src.services.ingestion import ingest_pdf
-from src.services.retrieval import build_index, retrieve
-from src.services.generation import answer_question
+from src.services.sessions import get_document_manager
+from src.services.admission import Overloaded, get_admission_controller
+from src.services.worker_pool import start_worker_pool
+from src.config import GENERATION_WORKERS, PROFILE_ALLOW_QUERY_PARAM
+
+# Generation workers must be forked before this process runs any model
+# inference (see src/services/worker_pool.py), so before the first
+# upload is embedded. Idempotent across reruns.
+if GENERATION_WORKERS > 1:
+    start_worker_pool()
 
 
 st.set_page_config(page_title="Cloud-Based RAG Document Assistant", layout="wide")
@@ -52,9 +60,18 @@ uploaded_file = st.file_uploader("Upload a PDF file", type=["pdf"])
 if uploaded_file is not None:
     try:
         with st.spinner("Processing document..."):
-            chunks = ingest_pdf(uploaded_file)
-            index, _ = build_index(chunks)
+            # Streamlit re-runs this script on every interaction; the
+            # document manager returns the already-indexed document
+            # (shared across sessions by content hash) instead of
+            # re-ingesting it each time.
+            session_id = st.session_state.setdefault("session_id", uuid.uuid4().hex)
+            doc = get_document_manager().open(uploaded_file, session_id=session_id)
         st.success("Document processed successfully!")
+        if doc.skipped_pages:
+            # Pages the isolated parser gave up on (time/memory limits);
+            # the rest of the document is still searchable.
+            pages = ", ".join(str(p["page"] + 1) for p in doc.skipped_pages)
+            st.warning(f"Some pages could not be read and were skipped: {pages}")
     except ValueError as e:
         st.error(str(e))
         st.stop()
@@ -71,18 +88,45 @@ if uploaded_file is not None:
 
     if query:
         try:
+            # With PROFILE_ALLOW_QUERY_PARAM, ?profile=1 in the URL profiles
+            # this request on the server (src/services/profiling.py);
+            # otherwise it may be sampled.
+            profile = None
+            if PROFILE_ALLOW_QUERY_PARAM and st.query_params.get("profile") == "1":
+                profile = True
             with st.spinner("Retrieving and generating answer..."):
-                results, scores = retrieve(index, chunks, query)
-                answer, context, confidence = answer_question(results, scores, query)
+                answer, context, confidence, details = get_admission_controller().handle(
+                    doc.index, doc.store, query, doc_id=doc.doc_id, sections=doc.sections,
+                    list_index=doc.list_index, precomputed=doc.precomputed, profile=profile,
+                )
 
             st.success("Answer generated successfully!")
 
             st.subheader("📌 Generated Answer")
             st.write(answer)
-            st.caption(f"Retrieval Confidence: {confidence} ({round(float(scores[0]), 3)})")
+            st.caption(f"Retrieval Confidence: {confidence} ({round(float(details['top_score']), 3)})")
+            if details["admission"]["degraded"]:
+                st.caption("Server busy: answered from the document text without AI generation.")
+            if details["path"] == "precomputed":
+                st.caption(f"Answered from a precomputed answer to: \"{details['precomputed']['question']}\"")
+            if profile and "profile" in details:
+                # Only the id: artifact paths are server-side details.
+                st.caption(f"Profiled as request {details['request_id']}.")
 
             with st.expander("📄 View Retrieved Context"):
-                st.write(context)
-
+                # Citations come from ingest-time metadata, one per
+                # context part -- no PDF re-parse needed. Answers
+                # precomputed before context_parts existed fall back to
+                # splitting the context.
+                parts = details.get("context_parts") or context.split("\n\n")
+                for chunk, citation in zip(parts, details["citations"]):
+                    pages = citation["page_start"]
+                    if citation["page_end"] != citation["page_start"]:
+                        pages = f"{citation['page_start']}-{citation['page_end']}"
+                    st.caption(f"Page {pages}")
+                    st.write(chunk)
+
+        except Overloaded as e:
+            st.warning(str(e))
         except Exception as e:
             st.error(f"Error generating answer: {str(e)}")
\ No newline at end of file
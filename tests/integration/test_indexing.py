@@ -0,0 +1,47 @@
+"""
+Integration test for incremental re-indexing (src/services/indexing.py)
+against the chunks the real ingest path produces for the sample PDF.
+DocumentIndex is library-only -- the upload path keys documents by
+content hash (src/services/sessions.py) and never calls update() -- so
+this is what pins it to real ingest output rather than toy chunk lists.
+"""
+import io
+
+import src.services.indexing as indexing
+from src.services.ingestion import ingest_pdf_to_store
+from src.config import CHUNK_SIZE, CHUNK_OVERLAP
+from utils.chunker import chunk_text_with_spans
+from utils.loader import join_pages, load_pdf_pages
+from tests.integration.test_loader import SAMPLE_PDF
+from tests.unit.test_indexing import _fake_embeddings
+
+
+def _reingest_chunks(text):
+    # What ingest_pdf_document would produce for a PDF with this text.
+    chunks, _ = chunk_text_with_spans(text, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP)
+    return chunks
+
+
+def test_update_of_real_ingest_output_embeds_only_the_edited_region(monkeypatch):
+    calls = []
+    monkeypatch.setattr(indexing, "generate_embeddings", _fake_embeddings(calls))
+
+    data = SAMPLE_PDF.read_bytes()
+    store = ingest_pdf_to_store(io.BytesIO(data))
+    text, _ = join_pages(load_pdf_pages(io.BytesIO(data)))
+    assert _reingest_chunks(text) == list(store)  # same chunks as the real ingest
+    assert len(store) > 3
+
+    doc = indexing.DocumentIndex.build(list(store))
+    calls.clear()
+
+    # Revise the document's last line, as a new version of the PDF would.
+    sentence = text.rstrip().split("\n")[-1]
+    revised = _reingest_chunks(text.replace(sentence, sentence + " Revised.", 1))
+    stats = doc.update(revised)
+
+    assert stats["added"] >= 1  # the edit reached the chunks
+    assert doc.ordered_chunks() == revised
+    assert doc.index.ntotal == len(revised)
+    assert stats["embed_calls"] == len(calls) < len(revised)
+    assert stats["embed_calls_saved"] == len(revised) - stats["embed_calls"] > 0
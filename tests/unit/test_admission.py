@@ -0,0 +1,110 @@
+import threading
+
+import numpy as np
+import pytest
+
+import src.services.admission as admission
+from src.services.admission import AdmissionController, Overloaded
+from src.services.generation import answer_question
+
+
+def _fake_pipeline(monkeypatch, generation_started=None, release=None):
+    def fake_retrieve(index, chunks, query, return_ids=False, timings=None, sections=None, query_embedding=None):
+        return list(chunks), np.array([0.9] * len(chunks))
+
+    def fake_answer(chunks, scores, query, allow_generation=True, **kwargs):
+        if generation_started is not None:
+            generation_started.set()
+            release.wait(timeout=5)
+        path = "generation" if allow_generation else "degraded_extractive"
+        return "answer", "\n\n".join(chunks), "High", {
+            "path": path, "top_score": 0.9, "timings": {"generation_ms": 0.0},
+        }
+
+    monkeypatch.setattr(admission, "retrieve", fake_retrieve)
+    monkeypatch.setattr(admission, "answer_question", fake_answer)
+    monkeypatch.setattr(admission, "log_request", lambda *args, **kwargs: None)
+
+
+def test_short_deadline_degrades_instead_of_generating(monkeypatch):
+    # A request whose remaining time can't cover the generation estimate
+    # should still get an answer -- just not a generated one.
+    _fake_pipeline(monkeypatch)
+    controller = AdmissionController(max_queue=4, workers=1, generation_estimate_s=5.0)
+
+    _, _, _, details = controller.handle(None, ["Some text."], "what?", deadline_s=1.0)
+    assert details["path"] == "degraded_extractive"
+    assert details["admission"]["degraded"] is True
+
+    _, _, _, details = controller.handle(None, ["Some text."], "what?", deadline_s=30.0)
+    assert details["path"] == "generation"
+
+    stats = controller.stats()
+    assert stats["completed"] == 2 and stats["degraded"] == 1
+    controller.close()
+
+
+def test_full_queue_rejects_with_retry_after_and_sheds_background_work(monkeypatch):
+    started, release = threading.Event(), threading.Event()
+    _fake_pipeline(monkeypatch, generation_started=started, release=release)
+    controller = AdmissionController(max_queue=1, workers=1)
+
+    running = controller.submit(None, ["a"], "q1")
+    assert started.wait(timeout=5)  # worker is busy; the queue is empty again
+    background = controller.submit(None, ["b"], "q2", priority="background")
+
+    # Queue full of equal-priority work: reject immediately.
+    with pytest.raises(Overloaded) as rejected:
+        controller.submit(None, ["c"], "q3", priority="background")
+    assert rejected.value.retry_after_s > 0
+
+    # An interactive request displaces the queued background one.
+    interactive = controller.submit(None, ["d"], "q4")
+    with pytest.raises(Overloaded):
+        background.result(timeout=5)
+
+    release.set()
+    assert running.result(timeout=5)[0] == "answer"
+    assert interactive.result(timeout=5)[0] == "answer"
+
+    stats = controller.stats()
+    assert stats["rejected"] == 1
+    assert stats["shed"] == 1
+    assert stats["completed"] == 2
+    controller.close()
+
+
+def test_cancelled_queued_request_is_skipped_and_worker_keeps_serving(monkeypatch):
+    # Regression: the worker used to call set_result on a Future the
+    # caller had cancelled while it was queued, which raised
+    # InvalidStateError and killed the worker thread.
+    started, release = threading.Event(), threading.Event()
+    _fake_pipeline(monkeypatch, generation_started=started, release=release)
+    controller = AdmissionController(max_queue=4, workers=1)
+
+    running = controller.submit(None, ["a"], "q1")
+    assert started.wait(timeout=5)
+    queued = controller.submit(None, ["b"], "q2")
+    assert queued.cancel()
+    release.set()
+
+    assert running.result(timeout=5)[0] == "answer"
+    assert controller.submit(None, ["c"], "q3").result(timeout=5)[0] == "answer"
+    assert controller.stats()["cancelled"] == 1
+    controller.close()
+
+
+def test_list_answer_under_load_is_not_reported_as_degraded(monkeypatch):
+    # Regression: "degraded" meant "generation wasn't allowed", so list
+    # answers (which never generate) were counted and shown as degraded
+    # whenever the deadline was short.
+    _fake_pipeline(monkeypatch)
+    monkeypatch.setattr(admission, "answer_question", answer_question)
+    controller = AdmissionController(max_queue=4, workers=1, generation_estimate_s=5.0)
+    chunks = ["Tasks:\n- Write code\n- Test code\n- Fix bugs"]
+
+    _, _, _, details = controller.handle(None, chunks, "What are the tasks?", deadline_s=1.0)
+    assert details["path"] in ("list_extraction", "list_index")
+    assert details["admission"]["degraded"] is False
+    assert controller.stats()["degraded"] == 0
+    controller.close()
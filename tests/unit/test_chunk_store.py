@@ -0,0 +1,70 @@
+import numpy as np
+
+from utils.chunk_store import ChunkStore
+
+
+def test_chunk_store_round_trips_through_disk_with_random_access(tmp_path):
+    chunks = [
+        "Overview of the occupation.",
+        "Tasks\n1. Analyze user needs.\n2. Modify existing software.",
+        "Median wage: $135,980 — “annually”.",  # non-ASCII must survive the byte offsets
+    ]
+    ChunkStore.from_chunks(chunks, doc_id=7).save(tmp_path)
+
+    store = ChunkStore.open(tmp_path)
+    assert len(store) == 3
+    assert store[2] == chunks[2]
+    assert store[np.int64(1)] == chunks[1]  # FAISS hands back numpy ints
+    assert store[-1] == chunks[-1]
+    assert list(store) == chunks
+    store.close()
+
+
+def test_chunk_store_metadata_flags_list_chunks():
+    store = ChunkStore.from_chunks(["Plain paragraph.", "Skills\n- Writing\n- Speaking"], doc_id=3)
+    meta = store.metadata([1, 0])
+    assert list(meta["is_list"]) == [True, False]
+    assert list(meta["doc_id"]) == [3, 3]
+    assert meta["page_start"][0] == -1  # unknown until the loader provides pages
+
+
+def test_chunk_store_opens_empty_store(tmp_path):
+    # mmap can't map a zero-length file; an empty store must still open.
+    ChunkStore.from_chunks([]).save(tmp_path)
+    store = ChunkStore.open(tmp_path)
+    assert len(store) == 0
+    assert list(store) == []
+
+
+def test_search_index_accepts_chunk_store_in_place_of_list():
+    from utils.retriever import create_faiss_index, search_index
+
+    chunks = ["alpha", "beta", "gamma"]
+    store = ChunkStore.from_chunks(chunks)
+    embeddings = np.eye(3, dtype="float32")
+    index = create_faiss_index(embeddings)
+
+    results, scores = search_index(index, embeddings[1], store, top_k=2)
+    assert results[0] == "beta"
+
+
+def test_version_1_store_opens_with_unknown_sections(tmp_path):
+    # Stores saved before section_start/section_end existed must still
+    # open, with the new fields reported as unknown.
+    import json
+
+    v1_dtype = np.dtype([(name, ChunkStore.from_chunks([]).meta.dtype[name])
+                         for name in ("doc_id", "page_start", "page_end", "char_start", "char_end", "is_list")])
+    store = ChunkStore.from_chunks(["First chunk.", "Second chunk."], doc_id=4)
+    store.save(tmp_path)
+    old_meta = np.zeros(2, dtype=v1_dtype)
+    old_meta["doc_id"] = 4
+    old_meta["page_start"] = [0, 1]
+    np.save(tmp_path / "meta.npy", old_meta)
+    (tmp_path / "store.json").write_text(json.dumps({"version": 1, "num_chunks": 2}))
+
+    opened = ChunkStore.open(tmp_path)
+    assert list(opened) == ["First chunk.", "Second chunk."]
+    assert list(opened.meta["page_start"]) == [0, 1]
+    assert list(opened.meta["section_start"]) == [-1, -1]
+    opened.close()
@@ -0,0 +1,149 @@
+import gc
+import weakref
+
+import numpy as np
+import pytest
+from tokenizers import Tokenizer, models, pre_tokenizers, processors
+from transformers import PreTrainedTokenizerFast, T5TokenizerFast
+
+from utils.chunk_store import ChunkStore
+from utils.chunk_tokens import ChunkTokens
+from utils.generator import _assemble_prompt_ids, _prompt_parts, _prompt_template_ids
+from src.config import GENERATOR_MODEL_NAME, MAX_INPUT_TOKENS
+from src.services.generation import build_context
+
+CHUNKS = [
+    "  Software developers design and test programs.\n",
+    "The median annual wage was $132,270 in May 2023.",
+    "Tasks include writing code, reviewing code and fixing bugs.",
+]
+
+
+def _t5_like_tokenizer(texts):
+    # Word-level stand-in for flan-t5's tokenizer with the same
+    # whitespace handling (WhitespaceSplit + Metaspace, "</s>" appended), so
+    # it runs without downloading the model.
+    words = sorted({w for text in texts for w in text.split()})
+    vocab = {"<pad>": 0, "</s>": 1, "<unk>": 2, **{"▁" + w: i + 3 for i, w in enumerate(words)}}
+    backend = Tokenizer(models.WordLevel(vocab, unk_token="<unk>"))
+    backend.pre_tokenizer = pre_tokenizers.Sequence([pre_tokenizers.WhitespaceSplit(), pre_tokenizers.Metaspace()])
+    backend.post_processor = processors.TemplateProcessing(single="$A </s>", special_tokens=[("</s>", 1)])
+    return PreTrainedTokenizerFast(tokenizer_object=backend, eos_token="</s>", unk_token="<unk>", pad_token="<pad>")
+
+
+def _string_path_ids(tokenizer, chunks, question, max_context_chars):
+    prefix, suffix = _prompt_parts(build_context(chunks)[:max_context_chars], question)
+    return tokenizer(prefix + suffix)["input_ids"]
+
+
+def _token_path_ids_parts(tokenizer, chunks, question, max_context_chars):
+    tokens = ChunkTokens.from_tokenizer(tokenizer, "stub", [c.strip() for c in chunks])
+    chunk_tokens = [(*tokens[i], len(chunks[i].strip())) for i in range(len(chunks))]
+    return _assemble_prompt_ids(tokenizer, chunk_tokens, question, max_context_chars)
+
+
+def _token_path_ids(tokenizer, chunks, question, max_context_chars):
+    prefix_ids, suffix_ids = _token_path_ids_parts(tokenizer, chunks, question, max_context_chars)
+    return prefix_ids + suffix_ids
+
+
+def test_assembled_prompt_matches_tokenizing_the_whole_prompt():
+    question = "What is the median annual wage?"
+    prefix, suffix = _prompt_parts(build_context(CHUNKS), question)
+    tokenizer = _t5_like_tokenizer([prefix + suffix])
+
+    assert _token_path_ids(tokenizer, CHUNKS, question, 2000) == _string_path_ids(tokenizer, CHUNKS, question, 2000)
+
+    # A char budget ending on a word boundary cuts both paths at the same token.
+    cut = len(build_context(CHUNKS)[:60].rsplit(" ", 1)[0])
+    assert _token_path_ids(tokenizer, CHUNKS, question, cut) == _string_path_ids(tokenizer, CHUNKS, question, cut)
+
+
+def _real_tokenizer():
+    # Only if already downloaded: tests never fetch the model.
+    try:
+        return T5TokenizerFast.from_pretrained(GENERATOR_MODEL_NAME, local_files_only=True)
+    except (OSError, ValueError):
+        pytest.skip(f"{GENERATOR_MODEL_NAME} tokenizer is not available locally")
+
+
+def test_assembled_prompt_matches_the_real_t5_tokenizer():
+    # The word-level stand-in can't merge pieces, so it can't catch a
+    # SentencePiece merge across a chunk join or at the char-budget cut;
+    # the real tokenizer can.
+    tokenizer = _real_tokenizer()
+    chunks = CHUNKS + [
+        "Tasks:\n- Modify existing software to correct errors.\n- Analyze user needs (e.g., performance).",
+        "  O*NET-SOC 15-1252.00: Software Developers -- \"much faster than average\" growth.  ",
+    ]
+    question = "What is the median annual wage, and what tasks do they do?"
+    context = build_context(chunks)
+
+    assert _token_path_ids(tokenizer, chunks, question, 4000) == _string_path_ids(tokenizer, chunks, question, 4000)
+    # Cuts ending on a word boundary, including right at a chunk join.
+    cuts = [len(context[:n].rsplit(" ", 1)[0]) for n in (60, 150, 230)] + [context.index("\n\n")]
+    for cut in cuts:
+        assert _token_path_ids(tokenizer, chunks, question, cut) == _string_path_ids(tokenizer, chunks, question, cut)
+
+
+def test_tokens_round_trip_with_the_chunk_store(tmp_path):
+    tokenizer = _t5_like_tokenizer(CHUNKS)
+    store = ChunkStore.from_chunks(CHUNKS)
+    store.tokens = ChunkTokens.from_tokenizer(tokenizer, "stub", CHUNKS)
+    store.save(tmp_path)
+
+    reopened = ChunkStore.open(tmp_path)
+    assert reopened.tokens.tokenizer_name == "stub"
+    ids, ends = reopened.chunk_tokens([2])[0]
+    assert list(ids) == tokenizer(CHUNKS[2], add_special_tokens=False)["input_ids"]
+    assert int(ends[-1]) == len(CHUNKS[2])
+    assert reopened.nbytes > ChunkStore.from_chunks(CHUNKS).nbytes
+    assert ChunkStore.from_chunks(CHUNKS).chunk_tokens([0]) is None
+
+
+def test_answer_question_hands_ordered_chunk_tokens_to_generation(monkeypatch):
+    import src.services.generation as gen
+
+    calls = []
+
+    def fake_generate(context, query, chunk_tokens=None, timings=None, **kwargs):
+        calls.append(chunk_tokens)
+        timings["tokenize_ms"] = 0.5
+        return "They design and test programs."
+
+    monkeypatch.setattr(gen, "generate_answer", fake_generate)
+    tokens = [(np.array([7, 8]), np.array([3, 9])), (np.array([5]), np.array([4]))]
+    chunks = ["Software developers design programs.", "  Other text.  "]
+    _, _, _, details = gen.answer_question(
+        chunks, [0.9, 0.8], "what do software developers design", fast_path="off", chunk_tokens=tokens,
+    )
+    assert [(list(ids), n) for ids, _, n in calls[0]] == [([7, 8], 36), ([5], 11)]
+    assert details["timings"]["tokenize_ms"] == 0.5
+
+
+def test_long_question_is_capped_so_the_prompt_fits_max_input_tokens():
+    # Regression: without the encoder cache the assembled ids went to the
+    # model as-is, and only the context was budgeted -- a long enough
+    # question produced a prompt over MAX_INPUT_TOKENS.
+    question = " ".join(f"word{i}" for i in range(MAX_INPUT_TOKENS + 50))
+    prefix, suffix = _prompt_parts(build_context(CHUNKS), question)
+    tokenizer = _t5_like_tokenizer([prefix + suffix])
+
+    prefix_ids, suffix_ids = _token_path_ids_parts(tokenizer, CHUNKS, question, 2000)
+    assert len(prefix_ids) + len(suffix_ids) <= MAX_INPUT_TOKENS
+    assert suffix_ids[-1] == tokenizer.eos_token_id
+
+
+def test_template_ids_are_cached_per_tokenizer_object():
+    # Regression: the cache was keyed by id(tokenizer), which a later
+    # tokenizer can reuse once the first is collected.
+    first = _t5_like_tokenizer(["Context: Question: Answer:"])
+    _prompt_template_ids(first)
+    collected = weakref.ref(first)
+    del first
+    gc.collect()
+    assert collected() is None  # the cache doesn't keep tokenizers alive
+
+    second = _t5_like_tokenizer(["Other words entirely"])
+    parts = _prompt_parts("\0", "\0")[0].split("\0") + _prompt_parts("\0", "\0")[1].split("\0")
+    assert _prompt_template_ids(second) == [second(p, add_special_tokens=False)["input_ids"] for p in parts]
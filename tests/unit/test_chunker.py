@@ -53,4 +53,15 @@ def test_chunk_text_keeps_long_list_intact():
     assert "Use different tools and frameworks" in list_chunk
     assert "Build effective automation frameworks" in list_chunk
     assert "Own projects end-to-end" in list_chunk
-    assert "Work with a fun team" in list_chunk
\ No newline at end of file
+    assert "Work with a fun team" in list_chunk
+
+def test_chunk_text_with_spans_maps_chunks_back_to_source_text():
+    from utils.chunker import chunk_text_with_spans
+
+    text = "Overview paragraph here.\n  Tasks\n1. Analyze needs.\n2. Modify software.\nOutlook is good."
+    chunks, spans = chunk_text_with_spans(text, chunk_size=40, overlap=0)
+
+    assert spans.shape == (len(chunks), 2)
+    for chunk, (start, end) in zip(chunks, spans):
+        # Same content, modulo the chunker collapsing line breaks to spaces.
+        assert text[start:end].split() == chunk.split()
@@ -0,0 +1,58 @@
+from src.services.compression import compress_context, score_sentences
+
+_CHUNKS = [
+    "Software developers write code. They also attend many meetings about planning. "
+    "Lunch is served at noon daily.",
+    "Median annual wages were $120,000 in 2023. The office has a nice view.",
+    "Qualifications:\n- Bachelor's degree\n- Python experience",
+]
+
+
+def test_context_that_fits_is_returned_unchanged():
+    context, stats = compress_context(_CHUNKS, "annual wages", budget_chars=10_000)
+    assert context == "\n\n".join(c.strip() for c in _CHUNKS)
+    assert stats["sentences_kept"] == stats["sentences"]
+
+
+def test_relevant_sentence_from_lower_ranked_chunk_survives_the_budget():
+    # Plain truncation at 120 chars would keep only the first chunk's
+    # filler and lose the wage sentence in chunk 2.
+    context, stats = compress_context(_CHUNKS, "What are the median annual wages?", budget_chars=120)
+    assert "Median annual wages were $120,000" in context
+    assert "Lunch" not in context
+    assert len(context) <= 120
+    assert stats["output_chars"] == len(context)
+
+
+def test_sentences_are_emitted_in_document_order():
+    # Chunk 2 comes first in the document even though it ranked second.
+    context, _ = compress_context(
+        _CHUNKS, "software developers annual wages", budget_chars=100, positions=[500, 0, 900],
+    )
+    assert context.index("Median annual wages") < context.index("Software developers")
+
+
+def test_list_items_stay_on_their_own_lines():
+    context, _ = compress_context(_CHUNKS, "python degree", budget_chars=60)
+    assert context == "- Bachelor's degree\n- Python experience"
+
+
+def test_sentence_repeated_by_chunk_overlap_is_kept_once():
+    # Regression: overlapping chunks both carry the boundary sentence, and
+    # both copies used to be packed into the reduced budget.
+    overlapping = [
+        "Developers write code daily. Median annual wages were $120,000 in 2023.",
+        "Median annual wages were  $120,000 in 2023. Wages rose from the prior year.",
+    ]
+    context, stats = compress_context(overlapping, "median annual wages", budget_chars=130)
+    assert context.count("Median annual wages") == 1
+    assert "Wages rose from the prior year." in context
+    assert stats["sentences_kept"] == 2
+
+
+def test_scores_use_word_families_and_idf():
+    scores = score_sentences(
+        ["Developers earn wages.", "Developing software.", "Nothing relevant here."],
+        "develop wages",
+    )
+    assert scores[0] > scores[1] > scores[2] == 0
@@ -0,0 +1,68 @@
+import numpy as np
+
+import utils.embeddings as embeddings
+from utils.embedding_cache import EmbeddingCache
+
+
+def _counting_encoder(calls):
+    def generate_embeddings(texts, is_query=False):
+        calls.append(list(texts))
+        return np.array([[len(t), 1.0, 0.0] for t in texts], dtype="float32")
+    return generate_embeddings
+
+
+def test_cached_passage_embeddings_encode_only_misses_in_one_batch(monkeypatch, tmp_path):
+    calls = []
+    monkeypatch.setattr(embeddings, "generate_embeddings", _counting_encoder(calls))
+    cache = EmbeddingCache(str(tmp_path), "test-model")
+
+    footer = "Equal Opportunity Employer.\nAll rights reserved."
+    first = embeddings.generate_passage_embeddings_cached(["Job A body.", footer, footer], cache)
+    # The duplicate footer within one call is encoded once.
+    assert calls == [["Job A body.", "Equal Opportunity Employer. All rights reserved."]]
+    assert np.array_equal(first[1], first[2])
+
+    calls.clear()
+    second = embeddings.generate_passage_embeddings_cached(["Job B body.", footer], cache)
+    assert calls == [["Job B body."]]  # footer served from the cache, one batch for the rest
+    assert np.array_equal(second[1], first[1])
+
+    stats = cache.stats()
+    assert stats["lookups"] == 5
+    assert stats["hits"] == 2
+    assert stats["vector_bytes_saved"] == 2 * 3 * 4
+
+
+def test_embedding_cache_persists_across_reopen(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), "test-model")
+    cache.add_many([b"k" * 16], np.array([[1.0, 2.0]], dtype="float32"))
+
+    reopened = EmbeddingCache(str(tmp_path), "test-model")
+    vectors, hit_mask = reopened.get_many([b"k" * 16, b"x" * 16])
+    assert list(hit_mask) == [True, False]
+    assert list(vectors[0]) == [1.0, 2.0]
+
+    # A different model never sees another model's vectors.
+    other = EmbeddingCache(str(tmp_path), "other-model")
+    assert len(other) == 0
+
+
+def test_orphaned_and_partial_vector_rows_are_dropped_on_open(tmp_path):
+    # Regression: a crash between the vector and key appends left extra
+    # vector bytes that open() skipped but didn't remove, so every key
+    # added afterwards pointed at the row before its own vector.
+    cache = EmbeddingCache(str(tmp_path), "test-model")
+    cache.add_many([b"a" * 16], np.array([[1.0, 1.0]], dtype="float32"))
+    vectors_path = tmp_path / "test-model" / "vectors.f32"
+
+    for orphan in (np.array([9.0, 9.0], dtype="float32").tobytes(), b"\x00\x00\x80"):  # whole row, partial row
+        with open(vectors_path, "ab") as f:
+            f.write(orphan)
+        reopened = EmbeddingCache(str(tmp_path), "test-model")
+        assert len(reopened) == 1
+        assert vectors_path.stat().st_size == 2 * 4
+
+    reopened.add_many([b"b" * 16], np.array([[2.0, 2.0]], dtype="float32"))
+    vectors, hit_mask = EmbeddingCache(str(tmp_path), "test-model").get_many([b"a" * 16, b"b" * 16])
+    assert hit_mask.all()
+    assert vectors.tolist() == [[1.0, 1.0], [2.0, 2.0]]
@@ -0,0 +1,42 @@
+import numpy as np
+
+import utils.embeddings as embeddings
+
+
+class _FakeModel:
+    """Tokenizes on whitespace and 'embeds' each text as [token_count, 1]."""
+
+    max_seq_length = 512
+
+    def __init__(self):
+        self.batches = []
+
+    def tokenizer(self, texts, **kwargs):
+        return {"input_ids": [t.split() for t in texts]}
+
+    def encode(self, texts, batch_size=32, **kwargs):
+        self.batches.append([len(t.split()) for t in texts])
+        return np.array([[len(t.split()), 1.0] for t in texts], dtype=np.float32)
+
+
+def test_length_bucketed_encoding_returns_original_order(monkeypatch):
+    monkeypatch.setattr(embeddings, "_calibrated_batch_size", None)
+    rng = np.random.default_rng(0)
+    texts = [" ".join(["word"] * int(n)) for n in rng.integers(1, 400, size=500)]
+    model = _FakeModel()
+
+    out = embeddings.encode_length_bucketed(model, texts)
+
+    assert [int(v) for v in out[:, 0]] == [len(t.split()) for t in texts]
+    assert embeddings._calibrated_batch_size in embeddings.EMBEDDING_BATCH_CANDIDATES
+    # Every text encoded exactly once, calibration included.
+    assert sum(len(b) for b in model.batches) == len(texts)
+
+
+def test_length_bucketed_batches_group_similar_lengths():
+    texts = ["a " * 3, "a " * 100, "a " * 4, "a " * 98]
+    model = _FakeModel()
+
+    embeddings.encode_length_bucketed(model, texts, batch_size=2)
+
+    assert model.batches == [[100, 98], [4, 3]]
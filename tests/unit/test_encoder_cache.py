@@ -0,0 +1,44 @@
+import torch
+
+from utils.encoder_cache import EncoderCache
+
+
+def _states(num_tokens):
+    return torch.zeros(1, num_tokens, 4)  # 16 bytes per token
+
+
+def test_encoder_cache_evicts_least_recently_used_within_byte_budget():
+    cache = EncoderCache(max_bytes=100)
+    cache.put("a", _states(3), encode_seconds=0.5)  # 48 bytes
+    cache.put("b", _states(3), encode_seconds=0.5)  # 96 bytes total
+    assert cache.get("a") is not None  # "a" is now most recently used
+
+    cache.put("c", _states(3), encode_seconds=0.5)  # over budget -> evict "b"
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["bytes"] <= 100
+    assert stats["encoder_ms_saved"] == 1500.0  # three hits x 0.5s
+
+
+def test_encoder_cache_skips_entries_larger_than_budget():
+    cache = EncoderCache(max_bytes=32)
+    cache.put("small", _states(1), encode_seconds=0.1)
+    cache.put("huge", _states(10), encode_seconds=0.1)
+    assert cache.get("huge") is None
+    assert cache.get("small") is not None
+
+
+def test_prompt_prefix_is_question_independent():
+    # The cache key is the prefix, so nothing question-dependent may
+    # leak into it -- and prefix + suffix must still be the full prompt.
+    from utils.generator import _prompt_parts
+
+    prefix_a, suffix_a = _prompt_parts("Some context.", "What is A?")
+    prefix_b, suffix_b = _prompt_parts("Some context.", "What is B?")
+    assert prefix_a == prefix_b
+    assert suffix_a != suffix_b
+    assert (prefix_a + suffix_a).index("Context:") < (prefix_a + suffix_a).index("Question:")
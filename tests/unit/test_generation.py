@@ -138,7 +138,7 @@ def test_answer_question_does_not_override_correct_short_factual_answer(monkeypa
     ]
     scores = [0.9]
 
-    answer, context, label = gen.answer_question(context_chunks, scores, "What is the O*NET-SOC code?")
+    answer, context, label, details = gen.answer_question(context_chunks, scores, "What is the O*NET-SOC code?")
 
     assert answer == "15-1252.00"
 
@@ -156,7 +156,7 @@ def test_answer_question_still_rescues_truncated_list_fragment(monkeypatch):
     ]
     scores = [0.9]
 
-    answer, context, label = gen.answer_question(context_chunks, scores, "What is required?")
+    answer, context, label, details = gen.answer_question(context_chunks, scores, "What is required?")
 
     assert "Second item" in answer
     assert "Third item" in answer
@@ -210,4 +210,152 @@ def test_confidence_label_clusters_word_families_as_generic():
         "Research, design, and develop computer and network software for various industries.",
         "Tasks performed include analyzing user needs and requirements.",
     ]
-    assert confidence_label(0.90, query=query, ordered_chunks=chunks) == "Low"    
\ No newline at end of file
+    assert confidence_label(0.90, query=query, ordered_chunks=chunks) == "Low"    
+
+def test_answer_question_returns_citations_in_context_order(monkeypatch):
+    # Provenance is looked up from ingest-time metadata, and must follow
+    # the same reordering order_by_intent applies to the context.
+    import src.services.generation as gen
+    from utils.chunk_store import empty_metadata
+
+    monkeypatch.setattr(gen, "generate_answer", lambda context, query: "A cat is a small mammal.")
+
+    chunks = ["Random unrelated text.", "A cat is a small domesticated mammal."]
+    provenance = empty_metadata(2)
+    provenance["page_start"] = provenance["page_end"] = [4, 0]
+
+    answer, context, label, details = gen.answer_question(chunks, [0.9, 0.8], "what is a cat", provenance=provenance)
+
+    assert context.startswith("A cat is")
+    assert [c["page_start"] for c in details["citations"]] == [1, 5]
+
+
+def test_adaptive_generation_budgets_by_question_type():
+    # Factoid questions get the small budget plus sentence early-exit;
+    # list questions keep a full budget and no early exit, since their
+    # answers legitimately run across several sentences. Adaptive off
+    # must leave the generate_answer call exactly as before.
+    from src.services.generation import _generation_kwargs
+    from src.config import FACTOID_MAX_NEW_TOKENS, LIST_MAX_NEW_TOKENS
+
+    assert _generation_kwargs("what is the median annual wage?", adaptive=False) == {}
+    assert _generation_kwargs("what is the median annual wage?", adaptive=True) == {
+        "max_new_tokens": FACTOID_MAX_NEW_TOKENS, "early_exit": True,
+    }
+    assert _generation_kwargs("list all the tasks", adaptive=True) == {"max_new_tokens": LIST_MAX_NEW_TOKENS}
+
+
+def test_sentence_end_criteria_does_not_stop_inside_numbers():
+    # "15-1252.00" must not be cut at the ".": stopping waits for the
+    # token AFTER the punctuation to start a new word, then trims it.
+    import torch
+    from utils.generator import _SentenceEndCriteria, _trim_sentence_overrun
+
+    class _FakeTokenizer:
+        def get_vocab(self):
+            return {"▁15-1252": 5, ".": 6, "00": 7, "▁The": 8}
+
+    criteria = _SentenceEndCriteria(_FakeTokenizer())
+    stop = criteria(torch.tensor([[0, 5, 6, 7], [0, 5, 6, 8]]), scores=None)
+    assert stop.tolist() == [False, True]
+    assert _trim_sentence_overrun(torch.tensor([0, 5, 6, 8]), criteria) == [0, 5, 6]
+
+
+def test_fast_refusal_skips_generation_when_out_of_scope_gate_fails(monkeypatch):
+    # The confidence gate is computed before generation, so a question
+    # the rare-word check already labels "Low" must not spend any T5
+    # time under the "refuse" policy -- and the path must say so.
+    import src.services.generation as gen
+
+    def fail_if_called(*args, **kwargs):
+        raise AssertionError("generate_answer should have been skipped")
+
+    monkeypatch.setattr(gen, "generate_answer", fail_if_called)
+
+    query = "What certifications are required for this role?"
+    chunks = ["Median wages in 2025 were $65.38 hourly and $135,980 annually."]
+
+    answer, context, label, details = gen.answer_question(chunks, [0.9], query, fast_path="refuse")
+    assert label == "Low"
+    assert details["path"] == "fast_refusal"
+    assert answer == gen.NOT_AVAILABLE_ANSWER
+
+    answer, context, label, details = gen.answer_question(chunks, [0.9], query, fast_path="extractive")
+    assert details["path"] == "fast_extractive"
+
+
+def test_fast_path_off_still_generates_and_reports_path(monkeypatch):
+    import src.services.generation as gen
+
+    monkeypatch.setattr(gen, "generate_answer", lambda context, query: "Some generated answer.")
+
+    chunks = ["Median wages in 2025 were $65.38 hourly and $135,980 annually."]
+    answer, context, label, details = gen.answer_question(
+        chunks, [0.9], "What certifications are required for this role?", fast_path="off"
+    )
+    assert answer == "Some generated answer."
+    assert label == "Low"
+    assert details["path"] == "generation"
+
+
+def test_max_context_chars_is_passed_to_generation_only_when_set(monkeypatch):
+    # Parameter sweeps vary the context budget per call; the default
+    # call must keep generate_answer's signature untouched.
+    import src.services.generation as gen
+
+    calls = []
+    monkeypatch.setattr(gen, "generate_answer", lambda context, query, **kwargs: calls.append(kwargs) or "An answer.")
+
+    chunks = ["Software developers design and test programs."]
+    gen.answer_question(chunks, [0.9], "what do software developers design", fast_path="off")
+    gen.answer_question(chunks, [0.9], "what do software developers design", fast_path="off", max_context_chars=500)
+    assert calls == [{}, {"max_context_chars": 500}]
+
+
+def test_compression_sends_only_relevant_sentences_to_generation(monkeypatch):
+    # With compression on, a wage sentence from the second chunk reaches
+    # the generator instead of being cut off behind first-chunk filler.
+    import src.services.generation as gen
+
+    contexts = []
+    monkeypatch.setattr(gen, "generate_answer", lambda context, query, **kwargs: contexts.append(context) or "$120,000.")
+
+    chunks = [
+        "Software developers write code. " + "They attend meetings about planning. " * 10,
+        "Median annual wages for software developers were $120,000 in 2023.",
+    ]
+    query = "what are the median annual wages of software developers"
+    _, context, _, details = gen.answer_question(chunks, [0.9, 0.8], query, fast_path="off",
+                                                 max_context_chars=150, compress=True)
+    assert "Median annual wages" in contexts[0]
+    assert "planning" not in contexts[0]
+    assert context == contexts[0]
+    assert details["compression"]["output_chars"] <= 150
+    assert "compression" not in gen.answer_question(chunks, [0.9, 0.8], query, fast_path="off")[3]
+
+
+def test_compressed_context_citations_follow_the_kept_chunks(monkeypatch):
+    # Regression: compression drops chunks with no kept sentence and
+    # emits the rest in document order, but citations used to stay one
+    # per retrieved chunk in retrieval order, so the UI paired context
+    # text with the wrong pages.
+    import src.services.generation as gen
+    from utils.chunk_store import empty_metadata
+
+    monkeypatch.setattr(gen, "generate_answer", lambda context, query, **kwargs: "$120,000.")
+    chunks = [
+        "Median annual wages were $120,000 for developers.",
+        "They attend meetings about planning. " * 10,
+        "Developers with wages above the median work in finance.",
+    ]
+    provenance = empty_metadata(3)
+    provenance["char_start"] = [5000, 100, 10]
+    provenance["page_start"] = provenance["page_end"] = [4, 0, 1]
+
+    _, context, _, details = gen.answer_question(
+        chunks, [0.9, 0.8, 0.7], "median wages of developers", provenance=provenance,
+        fast_path="off", max_context_chars=150, compress=True,
+    )
+    assert details["context_parts"] == [chunks[2], chunks[0]]  # document order, filler dropped
+    assert context == "\n\n".join(details["context_parts"])
+    assert [c["page_start"] for c in details["citations"]] == [2, 5]
@@ -0,0 +1,58 @@
+import zlib
+
+import numpy as np
+
+import src.services.indexing as indexing
+from utils.retriever import search_index
+
+
+def _fake_embeddings(calls):
+    # Deterministic per-text vectors, recording every text that got embedded.
+    def generate_embeddings(texts, is_query=False):
+        calls.extend(texts)
+        return np.array([
+            np.random.default_rng(zlib.crc32(t.encode())).standard_normal(8) for t in texts
+        ], dtype="float32")
+    return generate_embeddings
+
+
+def test_reingest_embeds_only_changed_chunks(monkeypatch):
+    calls = []
+    monkeypatch.setattr(indexing, "generate_embeddings", _fake_embeddings(calls))
+
+    original = [f"Section {i} text." for i in range(10)]
+    doc = indexing.DocumentIndex.build(original)
+    assert len(calls) == 10
+
+    revised = list(original)
+    revised[4] = "Section 4 text, revised."
+    del revised[7]
+    calls.clear()
+
+    stats = doc.update(revised)
+
+    assert calls == ["Section 4 text, revised."]
+    assert stats == {"added": 1, "removed": 2, "unchanged": 8, "embed_calls": 1, "embed_calls_saved": 8}
+    assert doc.index.ntotal == len(revised)
+    assert doc.ordered_chunks() == revised
+
+
+def test_id_mapped_index_search_returns_current_chunks(monkeypatch, tmp_path):
+    calls = []
+    fake = _fake_embeddings(calls)
+    monkeypatch.setattr(indexing, "generate_embeddings", fake)
+
+    doc = indexing.DocumentIndex.build(["alpha", "beta", "gamma"])
+    doc.update(["alpha", "delta", "gamma"])
+    doc.save(tmp_path)
+    loaded = indexing.DocumentIndex.load(tmp_path)
+
+    query = fake(["delta"])[0]
+    results, scores = search_index(loaded.index, query, loaded.chunks, top_k=3)
+    assert results[0] == "delta"
+    assert "beta" not in results
+
+
+def test_duplicate_chunks_get_distinct_ids():
+    manifest = indexing.build_manifest(["Footer.", "Body.", "Footer."])
+    assert len(set(manifest["chunk_ids"])) == 3
@@ -10,41 +10,55 @@ for mod in ["streamlit"]:
     if mod not in sys.modules:
         sys.modules[mod] = types.ModuleType(mod)
 
-from src.services.ingestion import _validate_upload, MAX_FILE_SIZE_BYTES
+from src.services.ingestion import read_pdf_upload, MAX_FILE_SIZE_BYTES
 
 
-def test_validate_upload_rejects_empty_file():
+def test_read_pdf_upload_rejects_empty_file():
     f = io.BytesIO(b"")
     try:
-        _validate_upload(f)
+        read_pdf_upload(f)
         assert False, "expected ValueError"
     except ValueError as e:
         assert "empty" in str(e).lower()
 
 
-def test_validate_upload_rejects_oversized_file():
+def test_read_pdf_upload_rejects_oversized_file():
     f = io.BytesIO(b"%PDF-1.4\n" + b"0" * (MAX_FILE_SIZE_BYTES + 1))
     try:
-        _validate_upload(f)
+        read_pdf_upload(f)
         assert False, "expected ValueError"
     except ValueError as e:
         assert "too large" in str(e).lower()
 
 
-def test_validate_upload_rejects_non_pdf_content():
+def test_read_pdf_upload_rejects_non_pdf_content():
     # A file renamed to .pdf but that isn't actually one -- e.g. a
     # plain text file. Magic-byte check should catch this even though
     # a naive extension-only check would not.
     f = io.BytesIO(b"This is just plain text, not a PDF.")
     try:
-        _validate_upload(f)
+        read_pdf_upload(f)
         assert False, "expected ValueError"
     except ValueError as e:
         assert "pdf" in str(e).lower()
 
 
-def test_validate_upload_accepts_valid_pdf_header_and_resets_stream_position():
-    f = io.BytesIO(b"%PDF-1.4\n%valid pdf content here")
-    _validate_upload(f)  # should not raise
-    # Stream position must be reset to 0 so the real parser can read from the start.
-    assert f.tell() == 0
\ No newline at end of file
+def test_read_pdf_upload_accepts_valid_pdf_header_and_parser_reads_from_the_start():
+    data = b"%PDF-1.4\n%valid pdf content here"
+    with read_pdf_upload(io.BytesIO(data)) as upload:  # should not raise
+        # The parser's stream must start at byte 0, not after the header check.
+        assert upload.stream().read() == data
+
+def test_pages_for_offsets_maps_char_offsets_to_pages():
+    # Page boundaries survive chunking as a compact page_starts array
+    # (see utils.loader.join_pages); an offset maps to the last page
+    # starting at or before it, and empty pages share the next start.
+    from utils.loader import join_pages
+    from src.services.ingestion import _pages_for_offsets
+
+    text, page_starts = join_pages(["Page one text.", "", "Page three text."])
+    assert text == "Page one text.\nPage three text."
+    assert list(page_starts) == [0, 15, 15]
+
+    pages = _pages_for_offsets(page_starts, [0, 14, 15, len(text) - 1])
+    assert list(pages) == [0, 0, 2, 2]
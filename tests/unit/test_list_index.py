@@ -0,0 +1,68 @@
+from utils.chunker import chunk_text_with_spans
+from src.services.list_index import ListIndex
+
+_DOC = """Software Developers
+Overview
+Software developers design computer applications and programs.
+Tasks
+- Analyze user needs and software requirements.
+- Design, develop and test software systems.
+- Maintain existing programs and fix defects.
+Qualifications
+1. Bachelor's degree in computer science.
+2. Strong knowledge of programming languages.
+Wages
+Median wages in 2025 were $65.38 hourly and $135,980 annually.
+"""
+
+
+def _index(chunk_size=120):
+    chunks, spans = chunk_text_with_spans(_DOC, chunk_size=chunk_size, overlap=20)
+    return ListIndex.build(_DOC, chunks, spans), chunks, spans
+
+
+def test_each_list_unit_is_indexed_with_its_heading_and_chunk_ids():
+    index, chunks, _ = _index()
+    assert [e.heading for e in index.entries] == ["Tasks", "Qualifications"]
+    for entry in index.entries:
+        assert entry.chunk_ids
+        # The list is whole inside the chunks it maps to.
+        assert all(line in " ".join(chunks[i] for i in entry.chunk_ids) for line in entry.text.split("\n"))
+
+
+def test_lookup_picks_the_section_named_in_the_question():
+    index, _, _ = _index()
+    assert index.lookup("What are the qualifications?").startswith("1. Bachelor's degree")
+    assert index.lookup("List the tasks").startswith("- Analyze user needs")
+
+
+def test_lookup_is_limited_to_retrieved_chunk_spans():
+    # Lists outside the retrieved chunks must not be answered from, even
+    # when the question names them.
+    index, _, spans = _index()
+    tasks, qualifications = index.entries
+    retrieved = [tuple(spans[i]) for i in tasks.chunk_ids if i not in qualifications.chunk_ids]
+    assert index.lookup("What are the qualifications?", spans=retrieved) == tasks.text
+
+
+def test_answer_question_uses_list_index_without_generation(monkeypatch):
+    import src.services.generation as gen
+
+    def fail_if_called(*args, **kwargs):
+        raise AssertionError("no regex extraction or generation expected")
+
+    monkeypatch.setattr(gen, "generate_answer", fail_if_called)
+    monkeypatch.setattr(gen, "extract_list", fail_if_called)
+
+    index, chunks, _ = _index()
+    answer, _, _, details = gen.answer_question(chunks, [0.9] * len(chunks), "What are the qualifications?",
+                                                list_index=index, fast_path="off")
+    assert details["path"] == "list_index"
+    assert answer.startswith("1. Bachelor's degree")
+
+
+def test_list_index_round_trips_through_save_and_load(tmp_path):
+    index, _, _ = _index()
+    index.save(tmp_path / "lists.json")
+    loaded = ListIndex.load(tmp_path / "lists.json")
+    assert [e.to_dict() for e in loaded.entries] == [e.to_dict() for e in index.entries]
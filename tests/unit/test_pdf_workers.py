@@ -0,0 +1,107 @@
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+from src.services.pdf_workers import PdfParserPool, _extract_page_text
+from utils.upload import read_upload
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="page timeouts use SIGALRM")
+
+SAMPLE_PDF = Path(__file__).resolve().parent.parent.parent / "data" / "sample_pdfs" / "software_developers_onet_summary.pdf"
+
+
+def _stuck_on_second_page(reader, number):
+    # Runs in the worker process: page 1 stands in for a pathological
+    # page that never finishes parsing.
+    if number == 1:
+        time.sleep(60)
+    return _extract_page_text(reader, number)
+
+
+def _pool(**kwargs):
+    return PdfParserPool(workers=1, memory_limit_bytes=None, **kwargs)
+
+
+def test_extracts_every_page_and_recycles_after_max_jobs():
+    pool = _pool(max_jobs=1)
+    try:
+        data = SAMPLE_PDF.read_bytes()
+        pages, skipped = pool.extract_pages(data)
+        assert len(pages) == 2 and all(pages) and skipped == []
+        pool.extract_pages(data)
+        assert pool.stats()["recycled"] == 2
+    finally:
+        pool.close()
+
+
+def test_slow_page_is_skipped_and_the_rest_returned():
+    pool = _pool(page_timeout_s=0.5, extract_page=_stuck_on_second_page)
+    try:
+        pages, skipped = pool.extract_pages(SAMPLE_PDF.read_bytes())
+        assert pages[0] and pages[1] == ""
+        assert skipped == [{"page": 1, "reason": "page_timeout"}]
+        assert pool.stats()["killed"] == 0  # the worker survives a page timeout
+    finally:
+        pool.close()
+
+
+def test_document_timeout_kills_worker_and_keeps_partial_pages():
+    pool = _pool(page_timeout_s=None, document_timeout_s=3.0, extract_page=_stuck_on_second_page)
+    try:
+        start = time.monotonic()
+        pages, skipped = pool.extract_pages(SAMPLE_PDF.read_bytes())
+        assert time.monotonic() - start < 10
+        assert pages[0] and pages[1] == ""
+        assert skipped == [{"page": 1, "reason": "document_timeout"}]
+        assert pool.stats()["killed"] == 1
+    finally:
+        pool.close()
+
+
+def test_unreadable_pdf_raises_value_error():
+    pool = _pool()
+    try:
+        with pytest.raises(ValueError, match="could not be opened"):
+            pool.extract_pages(b"%PDF-1.4 not really a pdf")
+    finally:
+        pool.close()
+
+
+def _allocates_on_first_page(reader, number):
+    if number == 0:
+        bytearray(512 * 1024 * 1024)
+    return _extract_page_text(reader, number)
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="RLIMIT_AS sizing reads /proc")
+def test_memory_limit_skips_the_page_instead_of_growing_the_worker():
+    pool = PdfParserPool(workers=1, memory_limit_bytes=256 * 1024 * 1024, extract_page=_allocates_on_first_page)
+    try:
+        pages, skipped = pool.extract_pages(SAMPLE_PDF.read_bytes())
+        assert skipped == [{"page": 0, "reason": "memory"}]
+        assert pages[0] == "" and pages[1]
+    finally:
+        pool.close()
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="reads /proc/<pid>/maps")
+def test_unreadable_spooled_pdf_is_unmapped_in_the_worker(tmp_path):
+    # Regression: when PdfReader(spooled) raised, the worker skipped
+    # closing the mmap and kept the spool file mapped until it exited.
+    pool = _pool(recycle_rss_bytes=None)  # keep the worker to inspect it
+    try:
+        source = tmp_path / "bad.pdf"
+        source.write_bytes(b"%PDF-1.4 not really a pdf")
+        with open(source, "rb") as f:
+            upload = read_upload(f, spool_threshold=0, spool_dir=str(tmp_path))
+        with upload:
+            assert upload.path is not None
+            with pytest.raises(ValueError, match="could not be opened"):
+                pool.extract_pages(upload)
+            worker = pool._idle[0]
+            with open(f"/proc/{worker.process.pid}/maps", encoding="utf-8") as f:
+                assert upload.path not in f.read()
+    finally:
+        pool.close()
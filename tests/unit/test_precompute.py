@@ -0,0 +1,142 @@
+import numpy as np
+
+import src.services.admission as admission
+import src.services.precompute as precompute
+from src.services.admission import AdmissionController, Overloaded
+from src.services.list_index import ListEntry, ListIndex
+from src.services.precompute import PrecomputedAnswers, PrecomputeJob, candidate_questions
+from tests.unit.test_admission import _fake_pipeline
+
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype="float32")
+    return vector / np.linalg.norm(vector)
+
+
+def test_candidate_questions_come_from_list_and_section_headings():
+    chunks = [
+        "Overview\nSoftware developers design programs.\n\nTasks:\n- Write code\n- Test code",
+        "- Test code\n\nWages & Employment Trends\nMedian wages were $120,000.",
+    ]
+    entry = ListEntry("Tasks:", "- Write code\n- Test code", (0, 10), [0], frozenset(), frozenset())
+    questions = candidate_questions(chunks, ListIndex([entry]))
+    assert questions == [
+        "What are the tasks?",
+        "What does the document say about overview?",
+        "What does the document say about wages & employment trends?",
+    ]
+    assert len(candidate_questions(chunks, ListIndex([entry]), max_questions=1)) == 1
+
+
+def test_match_requires_threshold_and_returns_a_copy(tmp_path):
+    answers = PrecomputedAnswers()
+    result = ("$120,000", "context", "High", {"path": "generation", "timings": {"generation_ms": 900.0}})
+    answers.add("What are the wages?", _unit([1, 0, 0]), result)
+
+    assert answers.match(_unit([0.2, 1, 0]), threshold=0.95) is None
+    question, similarity, hit = answers.match(_unit([1, 0.05, 0]), threshold=0.95)
+    assert question == "What are the wages?" and similarity > 0.95
+    hit[3]["path"] = "precomputed"  # callers annotate their copy
+    assert result[3]["path"] == "generation"
+
+    answers.save(str(tmp_path / "precomputed.json"))
+    loaded = PrecomputedAnswers.load(str(tmp_path / "precomputed.json"))
+    assert loaded.match(_unit([1, 0, 0]))[2][0] == "$120,000"
+
+
+class _Doc:
+    doc_id = "doc"
+    index = store = sections = list_index = None
+
+    def __init__(self):
+        self.precomputed = PrecomputedAnswers()
+
+
+class _BusyController:
+    def __init__(self):
+        self.busy = True
+
+    def stats(self):
+        return {"queued": 0, "in_flight": 1 if self.busy else 0}
+
+
+def test_job_waits_for_live_traffic_and_can_be_cancelled(monkeypatch):
+    answered = []
+    monkeypatch.setattr(precompute, "embed_query", lambda question: _unit([1, len(answered), 0]))
+    monkeypatch.setattr(PrecomputeJob, "_answer", lambda self, c, q, e: answered.append(q) or ("a", "", "High", {}))
+
+    controller = _BusyController()
+    doc = _Doc()
+    job = PrecomputeJob(doc, ["q1", "q2"], controller=controller, idle_poll_s=0.01).start()
+    assert not job.done.wait(timeout=0.2)
+    assert answered == []  # nothing runs while a live request is in flight
+
+    controller.busy = False
+    assert job.done.wait(timeout=5)
+    assert answered == ["q1", "q2"] and len(doc.precomputed) == 2
+
+    controller.busy = True
+    cancelled = PrecomputeJob(_Doc(), ["q3"], controller=controller, idle_poll_s=0.01).start()
+    cancelled.cancel()
+    assert cancelled.done.wait(timeout=5)
+    assert answered == ["q1", "q2"]
+
+
+def test_job_answers_through_the_controller_at_background_priority(monkeypatch):
+    # Regression: the job used to call retrieve/answer_question on its own
+    # thread, outside the controller's deadlines, counters and shedding.
+    _fake_pipeline(monkeypatch)
+    monkeypatch.setattr(precompute, "embed_query", lambda question: _unit([1, 0, 0]))
+    controller = AdmissionController(max_queue=4, workers=1)
+    submitted = []
+    submit = controller.submit
+    monkeypatch.setattr(controller, "submit", lambda *a, **kw: submitted.append(kw["priority"]) or submit(*a, **kw))
+
+    doc = _Doc()
+    doc.store = ["Some text."]
+    job = PrecomputeJob(doc, ["q1"], controller=controller, idle_poll_s=0.01).start()
+    assert job.done.wait(timeout=5)
+    assert submitted == ["background"] and len(doc.precomputed) == 1
+    assert controller.stats()["completed"] == 1
+    controller.close()
+
+
+def test_shed_question_is_retried_and_degraded_answers_are_not_stored(monkeypatch):
+    monkeypatch.setattr(precompute, "embed_query", lambda question: _unit([1, 0, 0]))
+    outcomes = [Overloaded("shed", 0.1), ("a", "", "High", {"admission": {"degraded": True}}),
+                ("a", "", "High", {"admission": {"degraded": False}})]
+
+    def fake_answer(self, controller, question, query_embedding):
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    monkeypatch.setattr(PrecomputeJob, "_answer", fake_answer)
+    controller = _BusyController()
+    controller.busy = False
+    doc = _Doc()
+    job = PrecomputeJob(doc, ["q1", "q2"], controller=controller, idle_poll_s=0.01).start()
+    assert job.done.wait(timeout=5)
+    assert job.counters == {"answered": 1, "skipped": 1, "retried": 1}
+    assert len(doc.precomputed) == 1
+
+
+def test_matching_live_question_is_served_without_retrieval_or_generation(monkeypatch):
+    calls = []
+    monkeypatch.setattr(admission, "retrieve", lambda *args, **kwargs: calls.append("retrieve"))
+    monkeypatch.setattr(admission, "answer_question", lambda *args, **kwargs: calls.append("answer"))
+    monkeypatch.setattr(admission, "log_request", lambda *args, **kwargs: None)
+
+    answers = PrecomputedAnswers()
+    answers.add("What are the wages?", _unit([1, 0, 0]),
+                ("$120,000", "ctx", "High", {"path": "generation", "top_score": 0.9, "timings": {"generation_ms": 900.0}}))
+    controller = AdmissionController(max_queue=4, workers=1)
+    answer, _, _, details = controller.handle(
+        None, ["chunk"], "what are the wages", query_embedding=_unit([1, 0.01, 0]), precomputed=answers,
+    )
+    assert answer == "$120,000" and details["path"] == "precomputed"
+    assert details["timings"]["generation_ms"] == 0.0
+    assert calls == []
+    assert controller.stats()["precomputed"] == 1 and controller.stats()["in_flight"] == 0
+    controller.close()
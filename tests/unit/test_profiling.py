@@ -0,0 +1,52 @@
+import json
+import os
+import pstats
+
+import torch
+
+import src.services.admission as admission
+import src.services.profiling as profiling
+from src.services.admission import AdmissionController
+from src.services.profiling import RequestProfile, profile_generation, should_profile
+from tests.unit.test_admission import _fake_pipeline
+
+
+def test_explicit_request_wins_over_sampling():
+    assert should_profile(True, sample_rate=0.0) is True
+    assert should_profile(False, sample_rate=1.0) is False
+    assert should_profile(None, sample_rate=1.0) is True
+    assert should_profile(None, sample_rate=0.0) is False
+
+
+def test_profiled_request_writes_pstats_named_by_its_request_id(monkeypatch, tmp_path):
+    _fake_pipeline(monkeypatch)
+    monkeypatch.setattr(admission, "RequestProfile", lambda request_id: RequestProfile(request_id, str(tmp_path)))
+    controller = AdmissionController(max_queue=4, workers=1)
+
+    _, _, _, details = controller.handle(None, ["Some text."], "what?", profile=True)
+    path = os.path.join(str(tmp_path), f"{details['request_id']}.pstats")
+    assert details["profile"]["artifacts"] == [path]
+    # The answering call is in the profile.
+    assert any(func[2] == "fake_answer" for func in pstats.Stats(path).stats)
+
+    _, _, _, details = controller.handle(None, ["Some text."], "what?", profile=False)
+    assert "profile" not in details and details["request_id"]
+    controller.close()
+
+
+def test_generation_trace_is_exported_as_chrome_json(tmp_path):
+    trace = str(tmp_path / "req.generation.json")
+    result = profile_generation(trace, torch.mm, torch.ones(8, 8), torch.ones(8, 8))
+    assert float(result[0, 0]) == 8.0
+    with open(trace, encoding="utf-8") as f:
+        events = json.load(f)["traceEvents"]
+    assert any("mm" in event.get("name", "") for event in events)
+
+
+def test_only_the_newest_artifacts_are_kept(tmp_path):
+    for i in range(5):
+        path = tmp_path / f"r{i}.pstats"
+        path.write_text("x")
+        os.utime(path, (i, i))
+    profiling._prune(str(tmp_path), max_files=2)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["r3.pstats", "r4.pstats"]
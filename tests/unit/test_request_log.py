@@ -0,0 +1,28 @@
+import gzip
+import json
+
+from src.services.request_log import RequestLogger, query_hash
+
+
+def test_records_are_written_as_json_lines_and_rotations_are_gzipped(tmp_path):
+    path = tmp_path / "requests.jsonl"
+    logger = RequestLogger(str(path), max_bytes=400, backups=3)
+    for i in range(20):
+        logger.log({"query_hash": query_hash(f"question {i}"), "timings": {"total_ms": float(i)}})
+    logger.close()
+
+    rotated = sorted(tmp_path.glob("requests.jsonl.*.gz"))
+    assert rotated, "expected at least one gzipped rotation"
+    assert len(rotated) <= 3
+
+    lines = path.read_text(encoding="utf-8").splitlines()
+    with gzip.open(rotated[0], "rt", encoding="utf-8") as f:
+        lines += f.read().splitlines()
+    records = [json.loads(line) for line in lines]
+    assert all("ts" in r and len(r["query_hash"]) == 16 for r in records)
+
+
+def test_query_hash_does_not_log_query_text():
+    # Same question modulo case/whitespace -> same hash; text never stored.
+    assert query_hash("What is the wage? ") == query_hash("what is the wage?")
+    assert "wage" not in query_hash("What is the wage?")
@@ -0,0 +1,36 @@
+import os
+import threading
+
+from src.services.resources import ResourceManager, thread_budgets
+
+
+def test_thread_budgets_split_cores_with_a_floor_of_one():
+    shares = {"embedding": 0.25, "retrieval": 0.25, "generation": 0.5}
+    assert thread_budgets(shares, cpu_count=8) == {"embedding": 2, "retrieval": 2, "generation": 4}
+    assert thread_budgets(shares, cpu_count=1) == {"embedding": 1, "retrieval": 1, "generation": 1}
+
+
+def test_stage_work_runs_on_that_stage_executor_with_its_thread_budget():
+    import torch
+
+    manager = ResourceManager(
+        thread_shares={"embedding": 0.0, "retrieval": 0.0, "generation": 0.0},
+        concurrency={"embedding": 1, "retrieval": 1, "generation": 1},
+    )
+    thread_name, num_threads = manager.run(
+        "generation", lambda: (threading.current_thread().name, torch.get_num_threads())
+    )
+    assert thread_name.startswith("generation-stage")
+    assert num_threads == 1
+    manager.shutdown()
+
+
+def test_generation_runs_in_process_until_the_worker_pool_is_started(monkeypatch):
+    # Creating the pool on first use would fork after the parent has run
+    # inference (deadlock-prone), so run_in_stage never does that.
+    import src.services.resources as resources
+
+    monkeypatch.setattr(resources, "GENERATION_WORKERS", 2)
+    monkeypatch.setattr(resources, "RESOURCE_PARTITIONING", False)
+    monkeypatch.setattr(resources, "get_worker_pool", lambda: None)
+    assert resources.run_in_stage("generation", os.getpid) == os.getpid()
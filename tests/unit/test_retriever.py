@@ -0,0 +1,81 @@
+import faiss
+import numpy as np
+import pytest
+
+from utils.retriever import create_faiss_index, create_sharded_index, search_index
+
+
+def test_sharded_index_matches_single_flat_index():
+    # Merging per-shard top-k lists must give exactly the same ranking
+    # as one flat index over all vectors.
+    rng = np.random.default_rng(0)
+    embeddings = rng.standard_normal((200, 16)).astype("float32")
+    chunks = [f"chunk {i}" for i in range(200)]
+    flat = create_faiss_index(embeddings)
+    sharded = create_sharded_index(embeddings, num_shards=3)
+
+    assert sharded.ntotal == 200
+    for query in rng.standard_normal((5, 16)).astype("float32"):
+        expected = search_index(flat, query, chunks, top_k=8, return_ids=True)
+        actual = search_index(sharded, query, chunks, top_k=8, return_ids=True)
+        assert actual[2] == expected[2]
+        assert np.allclose(actual[1], expected[1], atol=1e-5)
+    sharded.close()
+
+
+def test_sharded_index_handles_top_k_larger_than_corpus():
+    embeddings = np.eye(4, dtype="float32")
+    sharded = create_sharded_index(embeddings, num_shards=3)
+    results, scores = search_index(sharded, embeddings[2], ["a", "b", "c", "d"], top_k=10)
+    assert results[0] == "c"
+    assert len(results) == 4
+    sharded.close()
+
+
+def _low_rank_corpus(n=2000, dim=128, rank=16, seed=0):
+    # Real sentence embeddings have a fast-decaying spectrum, which is
+    # what makes PCA work; isotropic random vectors would not.
+    rng = np.random.default_rng(seed)
+    basis = rng.standard_normal((rank, dim))
+    weights = rng.standard_normal((n, rank)) * np.linspace(3.0, 0.2, rank)
+    return (weights @ basis + 0.05 * rng.standard_normal((n, dim))).astype("float32")
+
+
+def test_reduced_index_keeps_recall_and_persists_its_projection(tmp_path):
+    from utils.retriever import create_reduced_index, save_faiss_index, load_faiss_index
+
+    corpus = _low_rank_corpus()
+    reduced = create_reduced_index(corpus, target_dim=32)
+    flat = create_faiss_index(corpus)
+    chunks = [f"chunk {i}" for i in range(len(corpus))]
+
+    recalls = []
+    for query in corpus[:20]:
+        _, _, exact = search_index(flat, query, chunks, top_k=10, return_ids=True)
+        _, _, approx = search_index(reduced, query, chunks, top_k=10, return_ids=True)
+        recalls.append(len(set(exact) & set(approx)) / 10)
+    assert np.mean(recalls) >= 0.9
+
+    # The PCA matrix is saved with the index, so queries are projected
+    # identically after a reload.
+    save_faiss_index(reduced, str(tmp_path / "index.faiss"))
+    reloaded = load_faiss_index(str(tmp_path / "index.faiss"))
+    assert search_index(reloaded, corpus[0], chunks, top_k=5) == search_index(reduced, corpus[0], chunks, top_k=5)
+
+
+def test_reduced_index_falls_back_to_flat_for_small_corpora():
+    from utils.retriever import create_reduced_index
+
+    index = create_reduced_index(_low_rank_corpus(n=20), target_dim=32)
+    assert isinstance(index, faiss.IndexFlatIP)
+
+
+def test_sharding_with_pca_reduction_is_rejected(monkeypatch):
+    # Regression: with both set, the sharded branch ran and the reduced
+    # dimension was silently ignored.
+    import src.services.retrieval as retrieval
+
+    monkeypatch.setattr(retrieval, "FAISS_NUM_SHARDS", 2)
+    monkeypatch.setattr(retrieval, "EMBEDDING_REDUCED_DIM", 4)
+    with pytest.raises(ValueError, match="EMBEDDING_REDUCED_DIM"):
+        retrieval.index_from_embeddings(np.eye(8, dtype="float32"))
@@ -0,0 +1,51 @@
+import numpy as np
+
+from utils.chunk_store import empty_metadata
+from utils.chunker import section_starts
+from utils.retriever import create_faiss_index, search_index
+from src.services.sections import SectionIndex
+
+
+def test_section_starts_split_at_heading_lines():
+    text = "Intro paragraph about the job.\nTasks\n- Analyze needs.\n- Test code.\nWages\nMedian pay is high."
+    starts = section_starts(text)
+    assert [text[s:].split("\n")[0] for s in starts] == ["Intro paragraph about the job.", "Tasks", "Wages"]
+
+
+def _sectioned_corpus(num_sections=5, chunks_per_section=4, dim=16):
+    # Each section's chunks cluster around their own direction.
+    rng = np.random.default_rng(0)
+    directions = np.eye(dim, dtype="float32")[:num_sections]
+    embeddings, meta = [], empty_metadata(num_sections * chunks_per_section)
+    for section in range(num_sections):
+        for j in range(chunks_per_section):
+            embeddings.append(directions[section] + 0.1 * rng.standard_normal(dim).astype("float32"))
+            row = section * chunks_per_section + j
+            meta["section_start"][row] = meta["section_end"][row] = section
+    return np.array(embeddings, dtype="float32"), meta, directions
+
+
+def test_coarse_stage_limits_search_to_the_best_sections():
+    embeddings, meta, directions = _sectioned_corpus()
+    sections = SectionIndex.build(meta, embeddings)
+    assert len(sections) == 5
+
+    allowed = sections.candidate_ids(directions[2], top_sections=1, min_chunks=4)
+    assert list(allowed) == [8, 9, 10, 11]
+
+    chunks = [f"chunk {i}" for i in range(len(embeddings))]
+    index = create_faiss_index(embeddings)
+    results, scores, ids = search_index(index, directions[2], chunks, top_k=8, return_ids=True, allowed_ids=allowed)
+    assert sorted(ids) == [8, 9, 10, 11]  # top_k is capped at the candidate count
+
+
+def test_chunk_spanning_a_heading_belongs_to_both_sections():
+    embeddings, meta, _ = _sectioned_corpus()
+    meta["section_end"][3] = 1
+    sections = SectionIndex.build(meta, embeddings)
+    assert 3 in sections.members[1] and 3 in sections.members[0]
+
+
+def test_too_few_sections_falls_back_to_flat_search():
+    embeddings, meta, directions = _sectioned_corpus(num_sections=2)
+    assert SectionIndex.build(meta, embeddings).candidate_ids(directions[0]) is None
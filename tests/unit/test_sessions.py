@@ -0,0 +1,98 @@
+import time
+
+import numpy as np
+
+from utils.chunk_store import ChunkStore
+from utils.retriever import create_faiss_index
+from src.services.list_index import ListIndex
+from src.services.sessions import DocumentManager, content_hash
+
+
+def _fake_builder(calls):
+    # Stands in for ingest + embedding: "PDF bytes" are just text.
+    def build(upload, report=None):
+        data = bytes(upload.view())
+        calls.append(data)
+        chunks = [f"{data.decode()} chunk {i}" for i in range(50)]
+        embeddings = np.random.default_rng(len(calls)).standard_normal((50, 32)).astype("float32")
+        return ChunkStore.from_chunks(chunks), create_faiss_index(embeddings), embeddings, ListIndex([])
+    return build
+
+
+def _manager(tmp_path, calls, budget_bytes):
+    return DocumentManager(budget_bytes=budget_bytes, spill_dir=str(tmp_path),
+                           builder=_fake_builder(calls), index_builder=create_faiss_index)
+
+
+def test_identical_uploads_share_one_document(tmp_path):
+    calls = []
+    manager = _manager(tmp_path, calls, budget_bytes=10**9)
+    a = manager.open(b"report", session_id="alice")
+    b = manager.open(b"report", session_id="bob")
+    assert a is b
+    assert calls == [b"report"]
+    stats = manager.stats()
+    assert stats["shared"] == 1 and stats["loaded_documents"] == 1 and stats["sessions"] == 2
+
+
+def test_budget_evicts_least_recently_used_and_reloads_lazily(tmp_path):
+    calls = []
+    probe = _manager(tmp_path / "probe", [], budget_bytes=10**9).open(b"x")
+    manager = _manager(tmp_path, calls, budget_bytes=int(probe.nbytes * 2.5))
+
+    first = manager.open(b"doc one", session_id="s1")
+    manager.open(b"doc two", session_id="s2")
+    manager.close_session("s1")  # doc one is now idle and least recent
+    manager.open(b"doc three", session_id="s3")
+
+    stats = manager.stats()
+    assert stats["evictions"] == 1
+    assert stats["used_bytes"] <= stats["budget_bytes"]
+    assert content_hash(b"doc one") not in [d["doc_id"] for d in stats["documents"]]
+
+    # Reloaded from the spill directory -- no re-ingest.
+    reloaded = manager.get(content_hash(b"doc one"), session_id="s1")
+    assert list(reloaded.store) == list(first.store)
+    assert len(calls) == 3
+    assert manager.stats()["reloads"] == 1
+
+
+def test_idle_sessions_expire_so_their_documents_can_be_evicted(tmp_path):
+    # Regression: nothing called close_session, so every session stayed
+    # attached forever and no document was ever idle.
+    calls = []
+    manager = _manager(tmp_path, calls, budget_bytes=10**9)
+    manager.session_ttl_s = 0.05
+    doc = manager.open(b"doc one", session_id="s1")
+    time.sleep(0.1)
+
+    manager.open(b"doc two", session_id="s2")
+    assert doc.sessions == set()
+    stats = manager.stats()
+    assert stats["sessions"] == 1 and stats["expired_sessions"] == 1
+
+
+def test_spill_dir_is_pruned_of_unattached_evicted_documents(tmp_path):
+    calls = []
+    probe = _manager(tmp_path / "probe", [], budget_bytes=10**9).open(b"x")
+    spill = tmp_path / "spill"
+    manager = _manager(spill, calls, budget_bytes=int(probe.nbytes * 1.5))
+    manager.open(b"doc one", session_id="s1")
+    one_size = sum(f.stat().st_size for f in (spill / content_hash(b"doc one")).rglob("*") if f.is_file())
+    manager.spill_max_bytes = int(one_size * 2.5)
+
+    manager.open(b"doc two", session_id="s2")  # evicts doc one; s1 still holds it
+    manager.open(b"doc three", session_id="s3")
+    assert (spill / content_hash(b"doc one")).exists()  # attached: kept
+
+    manager.close_session("s1")
+    manager.close_session("s2")
+    manager.open(b"doc four", session_id="s4")
+    remaining = {p.name for p in spill.iterdir()}
+    assert content_hash(b"doc one") not in remaining  # oldest unattached, pruned first
+    assert content_hash(b"doc four") in remaining
+    assert manager.stats()["spill_pruned"] >= 1
+
+    # A pruned document is re-ingested when uploaded again.
+    manager.open(b"doc one", session_id="s1")
+    assert calls.count(b"doc one") == 2
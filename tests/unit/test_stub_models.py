@@ -0,0 +1,42 @@
+import numpy as np
+
+import src.services.generation as generation
+import utils.embeddings as embeddings
+from utils.stub_models import StubEmbeddingModel, install_stub_models, make_stub_generate_answer
+
+
+def test_stub_embeddings_are_deterministic_and_rank_by_shared_words():
+    model = StubEmbeddingModel(dim=64)
+    passages = model.encode(
+        ["passage: Median annual wages were high.", "passage: Tasks include writing code."],
+        normalize_embeddings=True,
+    )
+    query = model.encode(["query: median annual wages"], normalize_embeddings=True)[0]
+    assert np.allclose(passages, model.encode(
+        ["passage: Median annual wages were high.", "passage: Tasks include writing code."],
+        normalize_embeddings=True,
+    ))
+    assert np.allclose(np.linalg.norm(passages, axis=1), 1.0)
+    assert passages[0] @ query > passages[1] @ query
+
+
+def test_stub_generator_answers_from_the_best_matching_sentence():
+    generate = make_stub_generate_answer()
+    context = "Developers write code. Median annual wages were $135,980."
+    assert generate(context, "What is the median annual wage?") == "Median annual wages were $135,980."
+
+
+def test_install_routes_the_pipeline_to_stubs_and_restores():
+    real_loader, real_generate = embeddings.load_embedding_model, generation.generate_answer
+    restore = install_stub_models()
+    try:
+        vectors = embeddings.generate_embeddings(["some text"], is_query=True)
+        assert vectors.shape == (1, 768)
+        answer, _, _, _ = generation.answer_question(
+            ["Median annual wages were $135,980."], [0.9], "what is the median annual wage", fast_path="off",
+        )
+        assert answer == "Median annual wages were $135,980."
+    finally:
+        restore()
+    assert embeddings.load_embedding_model is real_loader
+    assert generation.generate_answer is real_generate
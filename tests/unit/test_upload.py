@@ -0,0 +1,73 @@
+import io
+import mmap
+import os
+
+import pytest
+
+from utils.upload import read_upload
+from src.services.sessions import content_hash
+
+
+class _ChunkedStream:
+    """A stream with nothing but read(n), like a network request body."""
+
+    def __init__(self, data):
+        self._stream = io.BytesIO(data)
+        self.bytes_read = 0
+
+    def read(self, n=-1):
+        block = self._stream.read(n)
+        self.bytes_read += len(block)
+        return block
+
+
+def test_in_memory_sources_are_viewed_without_copying():
+    data = b"%PDF-1.4 " + b"x" * 1000
+    upload = read_upload(data)
+    assert upload.view().obj is data
+    assert upload.digest == content_hash(data) and upload.size == len(data)
+    assert upload.header.startswith(b"%PDF-")
+
+    stream = io.BytesIO(data)
+    upload = read_upload(stream)
+    assert upload.stream() is stream  # the parser reads the caller's buffer in place
+    assert upload.digest == content_hash(data)
+    upload.close()
+    assert stream.read(5) == b"%PDF-"
+
+
+def test_plain_stream_is_read_once_and_spooled_past_the_threshold(tmp_path):
+    data = b"%PDF-1.4 " + os.urandom(3 * 1024 * 1024)
+    small = read_upload(_ChunkedStream(data[:1000]), spool_threshold=1024 * 1024)
+    assert small.path is None and bytes(small.view()) == data[:1000]
+
+    source = _ChunkedStream(data)
+    upload = read_upload(source, spool_threshold=1024 * 1024, spool_dir=str(tmp_path))
+    assert source.bytes_read == len(data)
+    assert upload.digest == content_hash(data) and upload.size == len(data)
+    assert os.path.dirname(upload.path) == str(tmp_path)
+    assert isinstance(upload.view(), mmap.mmap) and upload.view()[:] == data
+    assert upload.stream().read(5) == b"%PDF-"
+
+    path = upload.path
+    upload.close()
+    assert not os.path.exists(path)
+
+
+def test_oversized_stream_is_rejected_without_reading_it_all(tmp_path):
+    source = _ChunkedStream(b"%PDF-" + b"0" * (8 * 1024 * 1024))
+    with pytest.raises(ValueError, match="too large"):
+        read_upload(source, max_bytes=2 * 1024 * 1024, spool_threshold=1024 * 1024, spool_dir=str(tmp_path))
+    assert source.bytes_read < 4 * 1024 * 1024
+    assert os.listdir(tmp_path) == []  # the partial spool file is removed
+
+
+def test_pdf_upload_checks_magic_bytes_on_the_same_pass():
+    from src.services.ingestion import read_pdf_upload
+
+    with pytest.raises(ValueError, match="PDF"):
+        read_pdf_upload(io.BytesIO(b"This is just plain text, not a PDF."))
+    with pytest.raises(ValueError, match="empty"):
+        read_pdf_upload(io.BytesIO(b""))
+    with read_pdf_upload(io.BytesIO(b"%PDF-1.4\n%valid")) as upload:
+        assert upload.size == 15
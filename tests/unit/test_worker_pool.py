@@ -0,0 +1,144 @@
+import os
+import sys
+
+import pytest
+
+from src.services.worker_pool import PreforkPool
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="pre-fork pool needs fork()")
+
+_loaded = {}
+
+
+def _load_stub():
+    _loaded["weights"] = list(range(1000))
+
+
+def _sum_weights(offset):
+    # Runs in a worker: sees the parent's pre-fork "weights" without
+    # loading them itself.
+    return sum(_loaded["weights"]) + offset, os.getpid()
+
+
+def _echo(value):
+    return value
+
+
+def _fail():
+    raise ValueError("boom")
+
+
+def test_workers_share_preloaded_state_and_return_results():
+    pool = PreforkPool(2, preload=(_load_stub,), threads_per_worker=1)
+    try:
+        results = [pool.submit(_sum_weights, i).result(timeout=30) for i in range(6)]
+        assert [value for value, _ in results] == [sum(range(1000)) + i for i in range(6)]
+        assert {pid for _, pid in results} <= set(pool.worker_pids)
+        assert os.getpid() not in pool.worker_pids
+    finally:
+        pool.close()
+
+
+def test_worker_exception_is_raised_in_caller():
+    pool = PreforkPool(1, preload=(), threads_per_worker=1)
+    try:
+        with pytest.raises(ValueError, match="boom"):
+            pool.run(_fail)
+        # The worker survives a failed call.
+        assert pool.run(_echo, 7) == 7
+    finally:
+        pool.close()
+
+
+def test_memory_reports_parent_and_each_worker():
+    pool = PreforkPool(2, preload=(), threads_per_worker=1)
+    try:
+        memory = pool.memory()
+        assert len(memory["workers"]) == 2
+        if memory["parent"] is not None:  # Linux /proc only
+            assert memory["parent"]["rss_mb"] > 0
+            assert all(w["pss_mb"] > 0 for w in memory["workers"])
+    finally:
+        pool.close()
+
+
+def _sleep(seconds):
+    import time
+
+    time.sleep(seconds)
+
+
+def _exit_worker():
+    os._exit(3)
+
+
+def _matmul():
+    import torch
+
+    a = torch.ones(256, 256)
+    return float((a @ a)[0, 0])
+
+
+def test_dead_worker_fails_its_call_instead_of_hanging():
+    from src.services.worker_pool import WorkerDied
+
+    pool = PreforkPool(1, preload=(), threads_per_worker=1, liveness_interval_s=0.1)
+    try:
+        with pytest.raises(WorkerDied, match="exited with code 3"):
+            pool.submit(_exit_worker).result(timeout=10)
+        # No workers left: the pool says so rather than queueing forever.
+        assert pool.broken
+        with pytest.raises(WorkerDied):
+            pool.submit(_echo, 1)
+    finally:
+        pool.close()
+
+
+def test_overrunning_call_times_out_and_its_worker_is_killed():
+    pool = PreforkPool(1, preload=(), threads_per_worker=1, task_timeout_s=0.5, liveness_interval_s=0.1)
+    try:
+        with pytest.raises(TimeoutError):
+            pool.run(_sleep, 60)
+        pool._workers[0].process.join(timeout=5)
+        assert not pool._workers[0].process.is_alive()
+    finally:
+        pool.close()
+
+
+def test_fork_after_parent_torch_inference_fails_bounded_instead_of_hanging():
+    # Regression: forking after the parent has run multi-threaded torch
+    # ops deadlocks the worker's first parallel op. That's why the pool
+    # must be started before inference; if it isn't, the call must still
+    # come back (result or TimeoutError) rather than block forever.
+    import torch
+
+    threads = torch.get_num_threads()
+    torch.set_num_threads(4)
+    _matmul()
+    torch.set_num_threads(threads)
+    pool = PreforkPool(1, preload=(), threads_per_worker=2, task_timeout_s=5, liveness_interval_s=0.1)
+    try:
+        try:
+            assert pool.run(_matmul) == 256.0
+        except TimeoutError:
+            pool._workers[0].process.join(timeout=5)
+            assert not pool._workers[0].process.is_alive()
+    finally:
+        pool.close()
+
+
+def test_killing_an_idle_worker_does_not_block_the_others():
+    # Regression: workers shared one job queue, and a worker killed while
+    # blocked in get() could die holding its reader lock, so no other
+    # worker ever received another call.
+    import signal
+
+    pool = PreforkPool(2, preload=(), threads_per_worker=1, task_timeout_s=5, liveness_interval_s=0.1)
+    try:
+        assert pool.run(_echo, 1) == 1
+        os.kill(pool.worker_pids[0], signal.SIGKILL)
+        pool._workers[0].process.join(timeout=5)
+        assert [pool.run(_echo, i) for i in range(4)] == [0, 1, 2, 3]
+        assert not pool.broken
+    finally:
+        pool.close()
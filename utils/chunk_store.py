@@ -0,0 +1,199 @@
+"""
+Compact chunk store: every chunk's text lives in ONE UTF-8 blob, with
+an int64 offsets array marking where each chunk starts/ends and a
+fixed-width structured array holding per-chunk metadata.
+
+A plain list[str] costs ~50+ bytes of object overhead per chunk on top
+of the text itself and has to be rebuilt (re-parse + re-chunk) on every
+start. Saved to disk, the three files below are memory-mapped on open,
+so loading a large corpus is O(1) and a chunk is only decoded when it
+is actually accessed by id:
+
+    text.bin      raw UTF-8 bytes of all chunks, back to back
+    offsets.npy   int64[n + 1] byte offsets into text.bin
+    meta.npy      CHUNK_META_DTYPE[n]
+
+ChunkStore implements the read-only sequence protocol (len, int
+indexing, iteration), so it can be passed anywhere the services
+currently take a list of chunk strings.
+
+A store can also carry the generator's token ids for its chunks
+(`tokens`, a utils.chunk_tokens.ChunkTokens), saved to and opened from
+the same directory.
+"""
+
+import json
+import mmap
+import operator
+import os
+
+import numpy as np
+
+from utils.chunker import _is_list_line
+from utils.chunk_tokens import ChunkTokens
+
+# Version 2 added section_start/section_end; version 1 stores are
+# upgraded on open (see _upgrade_v1_metadata).
+CHUNK_STORE_FORMAT_VERSION = 2
+
+# page_* are 0-based page indices, section_* are 0-based section indices
+# (see utils.chunker.section_starts) and char_* are character offsets
+# into the extracted document text; -1 means "unknown" (e.g. chunks
+# built from raw text with no page information). A chunk can span a
+# heading, so it belongs to every section from section_start to
+# section_end.
+CHUNK_META_DTYPE = np.dtype([
+    ("doc_id", "<i4"),
+    ("page_start", "<i4"),
+    ("page_end", "<i4"),
+    ("char_start", "<i8"),
+    ("char_end", "<i8"),
+    ("is_list", "?"),
+    ("section_start", "<i4"),
+    ("section_end", "<i4"),
+])
+
+_TEXT_FILE = "text.bin"
+_OFFSETS_FILE = "offsets.npy"
+_META_FILE = "meta.npy"
+_INFO_FILE = "store.json"
+
+
+def empty_metadata(n, doc_id=0):
+    """Metadata array for n chunks with every provenance field unknown."""
+    meta = np.zeros(n, dtype=CHUNK_META_DTYPE)
+    meta["doc_id"] = doc_id
+    for field in ("page_start", "page_end", "char_start", "char_end", "section_start", "section_end"):
+        meta[field] = -1
+    return meta
+
+
+def _upgrade_v1_metadata(old_meta):
+    """Version 1 metadata rows, with the v2 section fields set to unknown."""
+    meta = empty_metadata(len(old_meta))
+    for field in old_meta.dtype.names:
+        meta[field] = old_meta[field]
+    return meta
+
+
+def list_flags(chunks):
+    """
+    is_list flag per chunk, using the same list-line detection the
+    chunker uses so it matches what utils.chunker grouped together.
+    """
+    return np.array(
+        [any(_is_list_line(line.strip()) for line in c.split("\n")) for c in chunks],
+        dtype=bool,
+    )
+
+
+class ChunkStore:
+    """Read-only, random-access view over a set of chunks and their metadata."""
+
+    def __init__(self, blob, offsets, meta, mapping=None, tokens=None):
+        if len(offsets) != len(meta) + 1:
+            raise ValueError(
+                f"Chunk store is inconsistent: {len(offsets)} offsets for {len(meta)} chunks."
+            )
+        self._blob = blob
+        self._offsets = offsets
+        self._meta = meta
+        # Keeps the mmap object (if any) alive as long as the store is.
+        self._mapping = mapping
+        self.tokens = tokens  # ChunkTokens, or None if not tokenized
+
+    @classmethod
+    def from_chunks(cls, chunks, meta=None, doc_id=0):
+        """Build an in-memory store from a list of chunk strings."""
+        encoded = [c.encode("utf-8") for c in chunks]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        if encoded:
+            np.cumsum([len(b) for b in encoded], out=offsets[1:])
+
+        if meta is None:
+            meta = empty_metadata(len(encoded), doc_id=doc_id)
+            meta["is_list"] = list_flags(chunks)
+        else:
+            meta = np.asarray(meta, dtype=CHUNK_META_DTYPE)
+
+        return cls(b"".join(encoded), offsets, meta)
+
+    @classmethod
+    def open(cls, directory):
+        """Open a saved store, memory-mapping the text blob and arrays read-only."""
+        with open(os.path.join(directory, _INFO_FILE), "r", encoding="utf-8") as f:
+            info = json.load(f)
+        if info.get("version") not in (1, CHUNK_STORE_FORMAT_VERSION):
+            raise ValueError(f"Unsupported chunk store version: {info.get('version')}")
+
+        offsets = np.load(os.path.join(directory, _OFFSETS_FILE), mmap_mode="r")
+        meta = np.load(os.path.join(directory, _META_FILE), mmap_mode="r")
+        if info["version"] == 1:
+            # The on-disk layout has no section fields; upgrade in memory
+            # (metadata is small next to the text) until the next save().
+            meta = _upgrade_v1_metadata(meta)
+
+        tokens = ChunkTokens.open(directory) if ChunkTokens.exists(directory) else None
+
+        text_path = os.path.join(directory, _TEXT_FILE)
+        # mmap refuses zero-length files, which is exactly what an
+        # empty store (or a store of empty chunks) writes.
+        if os.path.getsize(text_path) == 0:
+            return cls(b"", offsets, meta, tokens=tokens)
+        with open(text_path, "rb") as f:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(memoryview(mapping), offsets, meta, mapping=mapping, tokens=tokens)
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, _TEXT_FILE), "wb") as f:
+            f.write(self._blob)
+        np.save(os.path.join(directory, _OFFSETS_FILE), np.asarray(self._offsets))
+        np.save(os.path.join(directory, _META_FILE), np.asarray(self._meta))
+        if self.tokens is not None:
+            self.tokens.save(directory)
+        # Written last: a directory without store.json is an incomplete save.
+        with open(os.path.join(directory, _INFO_FILE), "w", encoding="utf-8") as f:
+            json.dump({"version": CHUNK_STORE_FORMAT_VERSION, "num_chunks": len(self)}, f)
+
+    def __len__(self):
+        return len(self._meta)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [self[i] for i in range(*key.indices(len(self)))]
+        i = operator.index(key)  # accepts numpy ints from FAISS results
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("chunk id out of range")
+        start, end = int(self._offsets[i]), int(self._offsets[i + 1])
+        return bytes(self._blob[start:end]).decode("utf-8")
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    @property
+    def meta(self):
+        return self._meta
+
+    def metadata(self, ids):
+        """Metadata rows for the given chunk ids (a structured array)."""
+        return self._meta[np.asarray(ids, dtype=np.int64)]
+
+    def chunk_tokens(self, ids):
+        """Token ids/ends for the given chunk ids, or None if the store has no tokens."""
+        return self.tokens.select(ids) if self.tokens is not None else None
+
+    @property
+    def nbytes(self):
+        """Bytes held by the text blob, offsets, metadata and tokens."""
+        nbytes = len(self._blob) + self._offsets.nbytes + self._meta.nbytes
+        return nbytes + (self.tokens.nbytes if self.tokens is not None else 0)
+
+    def close(self):
+        if self._mapping is not None:
+            self._blob.release()
+            self._mapping.close()
+            self._mapping = None
@@ -0,0 +1,113 @@
+"""
+Generator token ids for every chunk, computed once at ingest and kept
+with the ChunkStore (utils/chunk_store.py), so a prompt can be
+assembled from ids instead of re-tokenizing the context on every
+generate_answer call (see utils.generator._assemble_prompt_ids).
+
+Same layout idea as the chunk text: all ids back to back in one int32
+array, an int64 offsets array marking each chunk's slice, and, per
+token, the character offset (within its chunk) where the token ends --
+which lets the prompt builder cut the context at MAX_CONTEXT_CHARS on
+a token boundary. Saved into the store's directory:
+
+    token_ids.npy      int32[total tokens]
+    token_ends.npy     int32[total tokens]
+    token_offsets.npy  int64[n + 1]
+    tokens.json        {"tokenizer": name, "num_chunks": n}
+
+Ids are only meaningful for the tokenizer that produced them, so the
+tokenizer name is stored and checked by the consumer.
+"""
+
+import json
+import operator
+import os
+
+import numpy as np
+
+_IDS_FILE = "token_ids.npy"
+_ENDS_FILE = "token_ends.npy"
+_OFFSETS_FILE = "token_offsets.npy"
+_INFO_FILE = "tokens.json"
+
+# Chunks per tokenizer call at ingest.
+TOKENIZE_BATCH_SIZE = 256
+
+
+class ChunkTokens:
+    """Per-chunk token ids and token end offsets for one tokenizer."""
+
+    def __init__(self, tokenizer_name, ids, ends, offsets):
+        if len(ids) != len(ends) or int(offsets[-1]) != len(ids):
+            raise ValueError("Chunk tokens are inconsistent: ids, ends and offsets disagree.")
+        self.tokenizer_name = tokenizer_name
+        self._ids = ids
+        self._ends = ends
+        self._offsets = offsets
+
+    @classmethod
+    def from_tokenizer(cls, tokenizer, tokenizer_name, chunks, batch_size=TOKENIZE_BATCH_SIZE):
+        """
+        Tokenize `chunks` with a fast (Rust-backed) Hugging Face
+        tokenizer; the offset mapping it returns gives the token ends.
+        """
+        chunks = list(chunks)
+        ids, ends, lengths = [], [], []
+        for start in range(0, len(chunks), batch_size):
+            encoded = tokenizer(
+                chunks[start:start + batch_size], add_special_tokens=False, return_offsets_mapping=True,
+            )
+            for chunk_ids, offsets in zip(encoded["input_ids"], encoded["offset_mapping"]):
+                ids.extend(chunk_ids)
+                ends.extend(end for _, end in offsets)
+                lengths.append(len(chunk_ids))
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        if lengths:
+            np.cumsum(lengths, out=offsets[1:])
+        return cls(tokenizer_name, np.array(ids, dtype=np.int32), np.array(ends, dtype=np.int32), offsets)
+
+    @classmethod
+    def exists(cls, directory):
+        return os.path.exists(os.path.join(directory, _INFO_FILE))
+
+    @classmethod
+    def open(cls, directory):
+        """Open saved tokens, memory-mapping the arrays read-only."""
+        with open(os.path.join(directory, _INFO_FILE), "r", encoding="utf-8") as f:
+            info = json.load(f)
+        return cls(
+            info["tokenizer"],
+            np.load(os.path.join(directory, _IDS_FILE), mmap_mode="r"),
+            np.load(os.path.join(directory, _ENDS_FILE), mmap_mode="r"),
+            np.load(os.path.join(directory, _OFFSETS_FILE), mmap_mode="r"),
+        )
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, _IDS_FILE), np.asarray(self._ids))
+        np.save(os.path.join(directory, _ENDS_FILE), np.asarray(self._ends))
+        np.save(os.path.join(directory, _OFFSETS_FILE), np.asarray(self._offsets))
+        # Written last: token files without tokens.json are an incomplete save.
+        with open(os.path.join(directory, _INFO_FILE), "w", encoding="utf-8") as f:
+            json.dump({"tokenizer": self.tokenizer_name, "num_chunks": len(self)}, f)
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, key):
+        """(ids, ends) arrays for one chunk id."""
+        i = operator.index(key)
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("chunk id out of range")
+        start, end = int(self._offsets[i]), int(self._offsets[i + 1])
+        return self._ids[start:end], self._ends[start:end]
+
+    def select(self, ids):
+        """(ids, ends) per chunk id, aligned with `ids` (e.g. retrieve(..., return_ids=True))."""
+        return [self[i] for i in ids]
+
+    @property
+    def nbytes(self):
+        return self._ids.nbytes + self._ends.nbytes + self._offsets.nbytes
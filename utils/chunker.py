@@ -1,5 +1,7 @@
 import re
 
+import numpy as np
+
 _NUMBERED_PATTERN = re.compile(r"^\d+[\.\)]\s+.+")
 _BULLETED_PATTERN = re.compile(r"^[-*\u2022]\s+.+")
 
@@ -8,6 +10,74 @@ def _is_list_line(line):
     return bool(_NUMBERED_PATTERN.match(line) or _BULLETED_PATTERN.match(line))
 
 
+# Heading heuristics: PDF text extraction loses font size/weight, so a
+# heading is recognized by shape -- a short line that doesn't read like
+# a sentence (no terminal punctuation) and starts like a title or a
+# section number ("3.2 Benefits").
+_HEADING_MAX_CHARS = 80
+_HEADING_MAX_WORDS = 10
+_SECTION_NUMBER_PATTERN = re.compile(r"^\d+(\.\d+)*\.?\s+\S")
+
+
+def _is_heading_line(line):
+    if not line or len(line) > _HEADING_MAX_CHARS or _is_list_line(line):
+        return False
+    if line[-1] in ".,;!?":
+        return False
+    words = line.rstrip(":").split()
+    if len(words) > _HEADING_MAX_WORDS:
+        return False
+    if _SECTION_NUMBER_PATTERN.match(line):
+        return True
+    if not line[0].isupper():
+        return False
+    # Up to four words: "Tasks", "Work Environment", "How to become one".
+    # Longer lines must be title-cased to count.
+    alpha_words = [w for w in words if w[0].isalpha()]
+    capitalized = sum(1 for w in alpha_words if w[0].isupper())
+    return len(words) <= 4 or capitalized >= 0.6 * len(alpha_words)
+
+
+def section_starts(text):
+    """
+    Sorted int64 char offsets where each section of `text` starts: 0 for
+    the section before the first heading, then the offset of every
+    heading line (see _is_heading_line). Section i covers
+    [starts[i], starts[i + 1]).
+    """
+    paragraphs, spans = _split_paragraphs(text)
+    starts = [0]
+    for para, (start, _) in zip(paragraphs, spans):
+        if _is_heading_line(para) and start > starts[-1]:
+            starts.append(start)
+    return np.array(starts, dtype=np.int64)
+
+
+def _group_into_unit_ranges(paragraphs):
+    """
+    Same grouping as _group_into_units, but returned as half-open
+    [first, last) paragraph index ranges so callers can also map each
+    unit back to where it came from in the source text.
+    """
+    ranges = []
+    run_start = None
+
+    for i, para in enumerate(paragraphs):
+        if _is_list_line(para):
+            if run_start is None:
+                run_start = i
+        else:
+            if run_start is not None:
+                ranges.append((run_start, i))
+                run_start = None
+            ranges.append((i, i + 1))
+
+    if run_start is not None:
+        ranges.append((run_start, len(paragraphs)))
+
+    return ranges
+
+
 def _group_into_units(paragraphs):
     """
     Group consecutive list-like lines (bulleted/numbered) into a single
@@ -20,22 +90,20 @@ def _group_into_units(paragraphs):
     list can silently be missing from the answer even though it's in
     the document.
     """
-    units = []
-    current_list_run = []
-
-    for para in paragraphs:
-        if _is_list_line(para):
-            current_list_run.append(para)
-        else:
-            if current_list_run:
-                units.append("\n".join(current_list_run))
-                current_list_run = []
-            units.append(para)
+    return ["\n".join(paragraphs[a:b]) for a, b in _group_into_unit_ranges(paragraphs)]
 
-    if current_list_run:
-        units.append("\n".join(current_list_run))
 
-    return units
+def _split_paragraphs(text):
+    """Non-empty stripped lines, plus each one's [start, end) char span in `text`."""
+    paragraphs, spans = [], []
+    for match in re.finditer(r"[^\n]+", text):
+        line = match.group()
+        stripped = line.strip()
+        if stripped:
+            start = match.start() + (len(line) - len(line.lstrip()))
+            paragraphs.append(stripped)
+            spans.append((start, start + len(stripped)))
+    return paragraphs, spans
 
 
 def chunk_text(text, chunk_size=800, overlap=150):
@@ -46,29 +114,57 @@ def chunk_text(text, chunk_size=800, overlap=150):
     atomic units first (see _group_into_units) so a list is never split
     across two chunks, even if that means a chunk exceeds chunk_size.
     """
+    chunks, _ = chunk_text_with_spans(text, chunk_size=chunk_size, overlap=overlap)
+    return chunks
 
-    paragraphs = [p.strip() for p in text.split("\n") if p.strip()]
-    units = _group_into_units(paragraphs)
+
+def chunk_text_with_spans(text, chunk_size=800, overlap=150):
+    """
+    chunk_text, plus an int64 array of shape (n_chunks, 2) holding each
+    chunk's [char_start, char_end) span in `text`.
+
+    A span covers the source units the chunk was built from. The overlap
+    tail carried over from the previous chunk is mapped back as the last
+    len(tail) characters of the previous chunk's span -- exact for plain
+    paragraphs, approximate (off by the collapsed whitespace) where the
+    source had blank or indented lines between them.
+    """
+
+    paragraphs, para_spans = _split_paragraphs(text)
+    unit_ranges = _group_into_unit_ranges(paragraphs)
 
     chunks = []
+    spans = []
     current_chunk = ""
+    current_start = current_end = 0
+
+    for first, last in unit_ranges:
+        unit = "\n".join(paragraphs[first:last])
+        unit_start, unit_end = para_spans[first][0], para_spans[last - 1][1]
 
-    for unit in units:
         if len(current_chunk) + len(unit) < chunk_size:
+            if not current_chunk:
+                current_start = unit_start
             current_chunk += " " + unit
+            current_end = unit_end
         else:
             if current_chunk:
                 chunks.append(current_chunk.strip())
+                spans.append((current_start, current_end))
                 # carry the trailing `overlap` characters into the next chunk
                 tail = current_chunk[-overlap:] if overlap > 0 else ""
                 current_chunk = tail + " " + unit
+                current_start = max(current_start, current_end - len(tail.strip())) if tail.strip() else unit_start
+                current_end = unit_end
             else:
                 # current_chunk is empty (e.g. a single unit, like a long
                 # list, is already >= chunk_size) -- keep the whole unit
                 # together rather than splitting it.
                 current_chunk = unit
+                current_start, current_end = unit_start, unit_end
 
     if current_chunk:
         chunks.append(current_chunk.strip())
+        spans.append((current_start, current_end))
 
-    return chunks
\ No newline at end of file
+    return chunks, np.array(spans, dtype=np.int64).reshape(-1, 2)
@@ -0,0 +1,156 @@
+"""
+Persistent, cross-document passage-embedding cache.
+
+Boilerplate (legal footers, standard job-posting sections, repeated
+headers) shows up verbatim across many ingested PDFs, and every upload
+used to re-encode it. Entries are keyed by a hash of the exact text the
+model sees ("passage: " + whitespace-normalized chunk) and stored per
+model, so a different embedding model can never return stale vectors.
+
+On-disk layout, one directory per model:
+
+    vectors.f32   append-only float32 rows, memory-mapped for reads
+    keys.bin      append-only 16-byte blake2b digests, row-aligned
+    cache.json    model name + embedding dimension
+
+Vectors are appended before their keys, so a crash mid-append leaves
+vector bytes (whole or partial rows) with no key. open() truncates both
+files back to the rows that have a key and a complete vector, so the
+next append's rows line up again; a failed append is rolled back the
+same way. Appends are serialized within a process; concurrent writers
+in separate processes are not supported.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import unicodedata
+
+import numpy as np
+
+_KEY_BYTES = 16
+_VECTORS_FILE = "vectors.f32"
+_KEYS_FILE = "keys.bin"
+_INFO_FILE = "cache.json"
+
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def normalize_passage(text):
+    """Whitespace/Unicode normalization applied before hashing AND encoding."""
+    return _WHITESPACE_PATTERN.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def passage_key(prefixed_text):
+    return hashlib.blake2b(prefixed_text.encode("utf-8"), digest_size=_KEY_BYTES).digest()
+
+
+class EmbeddingCache:
+    def __init__(self, directory, model_name):
+        self.model_name = model_name
+        self.directory = os.path.join(directory, re.sub(r"[^A-Za-z0-9_.-]", "_", model_name))
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._rows = {}
+        self._vectors = None
+        self.dim = None
+
+        self.lookups = 0
+        self.hits = 0
+        self.text_bytes_saved = 0
+
+        info_path = os.path.join(self.directory, _INFO_FILE)
+        if os.path.exists(info_path):
+            with open(info_path, "r", encoding="utf-8") as f:
+                self.dim = json.load(f)["dim"]
+            self._load()
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _load(self):
+        keys = b""
+        if os.path.exists(self._path(_KEYS_FILE)):
+            with open(self._path(_KEYS_FILE), "rb") as f:
+                keys = f.read()
+        num_vectors = 0
+        if os.path.exists(self._path(_VECTORS_FILE)):
+            num_vectors = os.path.getsize(self._path(_VECTORS_FILE)) // (4 * self.dim)
+        num_rows = min(len(keys) // _KEY_BYTES, num_vectors)
+        self._truncate(num_rows)
+        self._rows = {keys[i * _KEY_BYTES:(i + 1) * _KEY_BYTES]: i for i in range(num_rows)}
+        self._remap(num_rows)
+
+    def _truncate(self, num_rows):
+        # Appends assume row i starts at byte i * row size in both files;
+        # drop anything past the last complete, keyed row.
+        for name, row_bytes in ((_VECTORS_FILE, 4 * self.dim), (_KEYS_FILE, _KEY_BYTES)):
+            path = self._path(name)
+            if os.path.exists(path) and os.path.getsize(path) > num_rows * row_bytes:
+                os.truncate(path, num_rows * row_bytes)
+
+    def _remap(self, num_rows):
+        if num_rows == 0:
+            self._vectors = np.zeros((0, self.dim or 0), dtype=np.float32)
+        else:
+            self._vectors = np.memmap(
+                self._path(_VECTORS_FILE), dtype=np.float32, mode="r", shape=(num_rows, self.dim)
+            )
+
+    def __len__(self):
+        return len(self._rows)
+
+    def get_many(self, keys):
+        """(vectors, hit_mask): rows for cached keys; uncached rows are left as zeros."""
+        with self._lock:
+            hit_mask = np.array([k in self._rows for k in keys], dtype=bool)
+            vectors = np.zeros((len(keys), self.dim or 0), dtype=np.float32)
+            if hit_mask.any():
+                rows = [self._rows[k] for k, hit in zip(keys, hit_mask) if hit]
+                vectors[hit_mask] = self._vectors[rows]
+            return vectors, hit_mask
+
+    def add_many(self, keys, vectors):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        with self._lock:
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+                with open(self._path(_INFO_FILE), "w", encoding="utf-8") as f:
+                    json.dump({"model_name": self.model_name, "dim": self.dim}, f)
+
+            new = [(k, v) for k, v in zip(keys, vectors) if k not in self._rows]
+            if not new:
+                return
+            start = len(self._rows)
+            try:
+                with open(self._path(_VECTORS_FILE), "ab") as f:
+                    f.write(np.stack([v for _, v in new]).tobytes())
+                with open(self._path(_KEYS_FILE), "ab") as f:
+                    f.write(b"".join(k for k, _ in new))
+            except BaseException:
+                self._truncate(start)
+                raise
+            for offset, (k, _) in enumerate(new):
+                self._rows[k] = start + offset
+            self._remap(len(self._rows))
+
+    def record(self, lookups, hits, text_bytes_saved):
+        with self._lock:
+            self.lookups += lookups
+            self.hits += hits
+            self.text_bytes_saved += text_bytes_saved
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._rows),
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "dedup_ratio": round(self.hits / self.lookups, 3) if self.lookups else 0.0,
+                # Passage text the encoder didn't have to process again...
+                "text_bytes_saved": self.text_bytes_saved,
+                # ...and vector storage not duplicated across documents.
+                "vector_bytes_saved": self.hits * 4 * (self.dim or 0),
+            }
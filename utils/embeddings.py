@@ -1,9 +1,43 @@
+import threading
+import time
+
 from sentence_transformers import SentenceTransformer
+import numpy as np
 import streamlit as st
 
+from utils.embedding_cache import EmbeddingCache, normalize_passage, passage_key
+from src.config import (
+    EMBEDDING_MODEL_NAME,
+    EMBEDDING_CACHE_DIR,
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_BATCH_CANDIDATES,
+    EMBEDDING_BUCKETING_MIN_TEXTS,
+)
+
+PASSAGE_PREFIX = "passage: "
+QUERY_PREFIX = "query: "
+
+# A candidate batch size is "as good" as the fastest one if within this
+# fraction of its throughput; the smallest such size wins, since peak
+# activation memory grows with batch size.
+_THROUGHPUT_TOLERANCE = 0.05
+
+_calibrated_batch_size = None
+_calibration_lock = threading.Lock()
+
+
 @st.cache_resource
 def load_embedding_model():
-    return SentenceTransformer("intfloat/e5-base-v2")
+    return SentenceTransformer(EMBEDDING_MODEL_NAME)
+
+
+@st.cache_resource
+def load_embedding_cache():
+    """The persistent passage-embedding cache, or None when disabled in config."""
+    if not EMBEDDING_CACHE_DIR:
+        return None
+    return EmbeddingCache(EMBEDDING_CACHE_DIR, EMBEDDING_MODEL_NAME)
+
 
 def generate_embeddings(texts, is_query=False):
     """
@@ -12,7 +46,132 @@ def generate_embeddings(texts, is_query=False):
     quality silently degrades even though no error is raised.
     """
     model = load_embedding_model()
-    prefix = "query: " if is_query else "passage: "
+    prefix = QUERY_PREFIX if is_query else PASSAGE_PREFIX
     prefixed_texts = [prefix + t for t in texts]
+    if len(prefixed_texts) >= EMBEDDING_BUCKETING_MIN_TEXTS:
+        return encode_length_bucketed(model, prefixed_texts, batch_size=EMBEDDING_BATCH_SIZE)
     embeddings = model.encode(prefixed_texts, normalize_embeddings=True)
-    return embeddings
\ No newline at end of file
+    return embeddings
+
+
+def _token_lengths(model, texts):
+    encoded = model.tokenizer(
+        texts, add_special_tokens=True, truncation=True, max_length=model.max_seq_length,
+    )
+    return np.array([len(ids) for ids in encoded["input_ids"]], dtype=np.int64)
+
+
+def _encode_batch(model, texts):
+    return model.encode(texts, batch_size=len(texts), normalize_embeddings=True, convert_to_numpy=True)
+
+
+def encode_length_bucketed(model, texts, batch_size=None):
+    """
+    Encode `texts` in batches of similar TOKEN length (longest first),
+    returning embeddings in the original order.
+
+    SentenceTransformer.encode already sorts each call's inputs, but by
+    character length and with a fixed default batch size; sorting on
+    the real token counts packs batches tighter, and the batch size is
+    calibrated on this machine the first time it's needed (see
+    _calibrate_batch_size). The calibration encodes real texts from
+    this call, so none of that work is wasted.
+    """
+    global _calibrated_batch_size
+
+    lengths = _token_lengths(model, texts)
+    order = np.argsort(-lengths, kind="stable")
+    out = None
+    done = np.zeros(len(texts), dtype=bool)
+
+    if batch_size is None:
+        with _calibration_lock:
+            if _calibrated_batch_size is None:
+                _calibrated_batch_size, out = _calibrate_batch_size(model, texts, order, lengths, done)
+            batch_size = _calibrated_batch_size
+
+    remaining = order[~done[order]]
+    for position in range(0, len(remaining), batch_size):
+        batch_ids = remaining[position:position + batch_size]
+        embeddings = _encode_batch(model, [texts[i] for i in batch_ids])
+        if out is None:
+            out = np.zeros((len(texts), embeddings.shape[1]), dtype=np.float32)
+        out[batch_ids] = embeddings
+
+    return out
+
+
+def _calibrate_batch_size(model, texts, order, lengths, done):
+    """
+    Time each candidate batch size on consecutive slices of the
+    length-sorted corpus, starting at the median length so every
+    candidate sees similarly-sized inputs, and measure real (unpadded)
+    tokens/sec. Encoded rows are kept and marked in `done`.
+    Returns (batch_size, partially_filled_embeddings).
+    """
+    out = None
+    throughput = {}
+    needed = 2 * sum(EMBEDDING_BATCH_CANDIDATES)
+    position = max(0, min(len(order) // 2 - needed // 2, len(order) - needed))
+
+    for candidate in EMBEDDING_BATCH_CANDIDATES:
+        # Two batches per candidate smooths out one-off warm-up noise.
+        batch_ids = order[position:position + 2 * candidate]
+        if len(batch_ids) < 2 * candidate:
+            break
+        start = time.perf_counter()
+        for half in (batch_ids[:candidate], batch_ids[candidate:]):
+            embeddings = _encode_batch(model, [texts[i] for i in half])
+            if out is None:
+                out = np.zeros((len(texts), embeddings.shape[1]), dtype=np.float32)
+            out[half] = embeddings
+        elapsed = time.perf_counter() - start
+        throughput[candidate] = lengths[batch_ids].sum() / max(elapsed, 1e-9)
+        done[batch_ids] = True
+        position += len(batch_ids)
+
+    if not throughput:
+        return EMBEDDING_BATCH_CANDIDATES[0], out
+
+    best = max(throughput.values())
+    chosen = min(c for c, tps in throughput.items() if tps >= best * (1 - _THROUGHPUT_TOLERANCE))
+    return chosen, out
+
+
+def generate_passage_embeddings_cached(texts, cache):
+    """
+    Passage embeddings served from `cache` where possible. All misses
+    -- each distinct text once, even if it repeats within this call --
+    are encoded together in ONE generate_embeddings batch and appended
+    to the cache. Texts are whitespace-normalized before both hashing
+    and encoding, so a cached vector always matches its key.
+    """
+    normalized = [normalize_passage(t) for t in texts]
+    keys = [passage_key(PASSAGE_PREFIX + t) for t in normalized]
+    vectors, hit_mask = cache.get_many(keys)
+
+    miss_positions = {}
+    for i, (key, hit) in enumerate(zip(keys, hit_mask)):
+        if not hit:
+            miss_positions.setdefault(key, []).append(i)
+
+    if miss_positions:
+        miss_keys = list(miss_positions)
+        encoded = np.asarray(
+            generate_embeddings([normalized[miss_positions[k][0]] for k in miss_keys], is_query=False),
+            dtype=np.float32,
+        )
+        if vectors.shape[1] == 0:  # brand-new cache: dimension unknown until now
+            vectors = np.zeros((len(texts), encoded.shape[1]), dtype=np.float32)
+        for key, vector in zip(miss_keys, encoded):
+            vectors[miss_positions[key]] = vector
+        cache.add_many(miss_keys, encoded)
+
+    encoded_positions = {positions[0] for positions in miss_positions.values()}
+    skipped = [i for i in range(len(texts)) if i not in encoded_positions]
+    cache.record(
+        lookups=len(texts),
+        hits=len(skipped),
+        text_bytes_saved=sum(len(normalized[i].encode("utf-8")) for i in skipped),
+    )
+    return vectors
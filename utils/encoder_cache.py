@@ -0,0 +1,61 @@
+"""
+LRU cache of encoder hidden states, bounded by a memory budget in bytes
+rather than an entry count -- a cached prompt prefix is
+seq_len x d_model floats, so entries vary in size by an order of
+magnitude depending on how much context was retrieved.
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class EncoderCache:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (hidden_states, encode_seconds, nbytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Encoder time that cache hits didn't have to spend again.
+        self.seconds_saved = 0.0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.seconds_saved += entry[1]
+            return entry[0]
+
+    def put(self, key, hidden_states, encode_seconds):
+        nbytes = hidden_states.element_size() * hidden_states.nelement()
+        if nbytes > self.max_bytes:
+            return  # would evict everything else and still not fit
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[2]
+            self._entries[key] = (hidden_states, encode_seconds, nbytes)
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes:
+                _, (_, _, evicted_bytes) = self._entries.popitem(last=False)
+                self._bytes -= evicted_bytes
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "encoder_ms_saved": round(self.seconds_saved * 1000, 1),
+            }
@@ -1,8 +1,38 @@
+import hashlib
+import time
+import weakref
+
+import numpy as np
 import streamlit as st
-from transformers import T5Tokenizer, T5ForConditionalGeneration
+from transformers import T5TokenizerFast, T5ForConditionalGeneration, StoppingCriteria, StoppingCriteriaList
+from transformers.modeling_outputs import BaseModelOutput
 import torch
 
-from src.config import MAX_CONTEXT_CHARS, MAX_NEW_TOKENS, MAX_INPUT_TOKENS, GENERATOR_MODEL_NAME
+from utils.encoder_cache import EncoderCache
+from utils.chunk_tokens import ChunkTokens
+from src.config import (
+    MAX_CONTEXT_CHARS,
+    MAX_NEW_TOKENS,
+    MAX_INPUT_TOKENS,
+    GENERATOR_MODEL_NAME,
+    DRAFT_MODEL_NAME,
+    ENCODER_CACHE_ENABLED,
+    ENCODER_CACHE_MAX_BYTES,
+)
+
+NOT_AVAILABLE_ANSWER = "The answer is not clearly available in the provided document."
+
+_SENTENCE_END_CHARS = (".", "!", "?")
+_WORD_START_MARKER = "\u2581"  # SentencePiece's "start of a new word" prefix
+
+
+@st.cache_resource
+def load_tokenizer():
+    # The Rust-backed fast tokenizer (same SentencePiece vocabulary as
+    # T5Tokenizer): it is several times faster on long contexts and
+    # returns the offset mappings chunk tokenization needs. Loaded on
+    # its own so ingest can tokenize chunks without the model.
+    return T5TokenizerFast.from_pretrained(GENERATOR_MODEL_NAME)
 
 
 @st.cache_resource
@@ -13,18 +43,78 @@ def load_generator():
     # which existed but was never actually used. Swapping models
     # (e.g. to flan-t5-large) is now a one-line config change instead
     # of touching this file.
-    tokenizer = T5Tokenizer.from_pretrained(GENERATOR_MODEL_NAME)
     model = T5ForConditionalGeneration.from_pretrained(GENERATOR_MODEL_NAME)
-    return tokenizer, model
+    return load_tokenizer(), model
 
 
-def generate_answer(context, question):
+def tokenize_chunks(chunks):
+    """
+    The generator's token ids for each chunk, for ChunkStore.tokens
+    (done once at ingest). Chunks are tokenized stripped, as
+    build_context puts them in the prompt, so token end offsets line up
+    with the context.
+    """
+    return ChunkTokens.from_tokenizer(load_tokenizer(), GENERATOR_MODEL_NAME, (c.strip() for c in chunks))
 
-    tokenizer, model = load_generator()
 
-    context = context[:MAX_CONTEXT_CHARS]
+@st.cache_resource
+def load_draft_model():
+    """Small same-vocabulary model for assisted decoding (None if not configured)."""
+    if not DRAFT_MODEL_NAME:
+        return None
+    return T5ForConditionalGeneration.from_pretrained(DRAFT_MODEL_NAME)
+
+
+class _SentenceEndCriteria(StoppingCriteria):
+    """
+    Stop once a sentence is complete. A "." alone isn't enough -- it
+    also appears inside "15-1252.00" or "$65.38" -- so this waits one
+    more token and only stops when the token after the punctuation
+    starts a new word. That extra token is trimmed off afterwards
+    (see _trim_sentence_overrun).
+    """
 
-    prompt = f"""
+    def __init__(self, tokenizer):
+        vocab = tokenizer.get_vocab()
+        self.end_ids = {i for piece, i in vocab.items() if piece.endswith(_SENTENCE_END_CHARS)}
+        self.word_start_ids = {i for piece, i in vocab.items() if piece.startswith(_WORD_START_MARKER)}
+
+    def is_overrun(self, ids):
+        return len(ids) >= 2 and ids[-2] in self.end_ids and ids[-1] in self.word_start_ids
+
+    def __call__(self, input_ids, scores, **kwargs):
+        return torch.tensor(
+            [self.is_overrun(row.tolist()) for row in input_ids],
+            dtype=torch.bool,
+            device=input_ids.device,
+        )
+
+
+# Keyed weakly by the tokenizer object: an id() key could be reused by a
+# later tokenizer once the first is garbage collected and hand it the
+# wrong vocabulary's results.
+_sentence_end_criteria_cache = weakref.WeakKeyDictionary()
+
+
+def _sentence_end_criteria(tokenizer):
+    # Scanning the vocabulary is ~32k string checks -- do it once per tokenizer.
+    if tokenizer not in _sentence_end_criteria_cache:
+        _sentence_end_criteria_cache[tokenizer] = _SentenceEndCriteria(tokenizer)
+    return _sentence_end_criteria_cache[tokenizer]
+
+
+def _trim_sentence_overrun(output_ids, criteria):
+    ids = output_ids.tolist()
+    return ids[:-1] if criteria.is_overrun(ids) else ids
+
+
+def _prompt_parts(context, question):
+    """
+    The prompt as (prefix, suffix): everything that depends only on the
+    context comes first, so the prefix can be cached and reused across
+    questions (see _encode_with_cache). prefix + suffix is the full prompt.
+    """
+    prefix = f"""
 You are a document analysis assistant.
 
 Answer the question strictly using the provided context.
@@ -35,32 +125,209 @@ If the answer is not clearly available in the context, say:
 Context:
 {context}
 
-Question:
+"""
+    suffix = f"""Question:
 {question}
 
 Answer:
 """
+    return prefix, suffix
+
+
+_template_ids_cache = weakref.WeakKeyDictionary()  # see _sentence_end_criteria_cache
+
 
-    inputs = tokenizer(
-        prompt,
-        return_tensors="pt",
-        truncation=True,
-        max_length=MAX_INPUT_TOKENS
-    )
+def _prompt_template_ids(tokenizer):
+    """
+    Token ids of the fixed parts of _prompt_parts: (before context,
+    after context, before question, after question). Every part meets
+    the context or question at whitespace, and T5's tokenizer splits on
+    whitespace before applying SentencePiece, so concatenating the
+    parts' ids gives the same ids as tokenizing the whole prompt.
+    """
+    if tokenizer not in _template_ids_cache:
+        prefix, suffix = _prompt_parts("\0", "\0")
+        parts = prefix.split("\0") + suffix.split("\0")
+        _template_ids_cache[tokenizer] = [tokenizer(part, add_special_tokens=False)["input_ids"] for part in parts]
+    return _template_ids_cache[tokenizer]
+
+
+def _assemble_prompt_ids(tokenizer, chunk_tokens, question, max_context_chars):
+    """
+    The prompt as (prefix_ids, suffix_ids) -- the token-level
+    equivalent of tokenizing _prompt_parts(context[:max_context_chars],
+    question) -- built from the chunks' ingest-time token ids
+    (utils/chunk_tokens.py). `chunk_tokens` is (ids, ends, chunk_chars)
+    per context chunk, in context order. Only the question is
+    tokenized. The context is cut at the last token ending within
+    max_context_chars of the blank-line-joined chunks (the string path cuts
+    mid-word instead), and further if needed so the question always
+    fits in MAX_INPUT_TOKENS. A question too long to fit even with no
+    context is cut to what does, so the whole prompt never exceeds
+    MAX_INPUT_TOKENS.
+    """
+    head, tail, question_head, question_tail = _prompt_template_ids(tokenizer)
+    question_ids = tokenizer(question, add_special_tokens=False)["input_ids"]
+    template = len(head) + len(tail) + len(question_head) + len(question_tail) + 1
+    question_ids = question_ids[:max(MAX_INPUT_TOKENS - template, 0)]
+    suffix_ids = question_head + question_ids + question_tail + [tokenizer.eos_token_id]
+
+    context_ids = []
+    position = 0  # where the current chunk starts in the joined context
+    for ids, ends, chunk_chars in chunk_tokens:
+        room = max_context_chars - position
+        if room <= 0:
+            break
+        keep = int(np.searchsorted(ends, room, side="right"))
+        context_ids.extend(np.asarray(ids[:keep]).tolist())
+        position += chunk_chars + 2  # the blank-line separator (build_context)
+    budget = max(MAX_INPUT_TOKENS - len(head) - len(tail) - len(suffix_ids), 0)
+    return head + context_ids[:budget] + tail, suffix_ids
+
+
+def _add_tokenize_time(timings, start):
+    if timings is not None:
+        timings["tokenize_ms"] = timings.get("tokenize_ms", 0.0) + (time.perf_counter() - start) * 1000
+
+
+@st.cache_resource
+def load_encoder_cache():
+    return EncoderCache(ENCODER_CACHE_MAX_BYTES)
+
+
+def _encode_with_cache(tokenizer, model, prefix, suffix, cache_info=None, prompt_ids=None, timings=None):
+    """
+    Encoder hidden states for prefix + suffix, with the prefix's states
+    taken from the encoder cache when this exact prefix (i.e. context)
+    was encoded before. The two segments are encoded separately, which
+    is an approximation for T5's bidirectional encoder -- see
+    config.ENCODER_CACHE_ENABLED. If given, `cache_info["encoder"]` is
+    set to whether the prefix was a cache hit. With `prompt_ids`
+    ((prefix_ids, suffix_ids) from _assemble_prompt_ids) nothing is
+    tokenized and the cache is keyed by the prefix ids.
+    """
+    cache = load_encoder_cache()
+    encoder = model.get_encoder()
+
+    tokenize_start = time.perf_counter()
+    if prompt_ids is not None:
+        prefix_ids, suffix_ids = prompt_ids
+        question_inputs = {"input_ids": torch.tensor([suffix_ids[:MAX_INPUT_TOKENS]], dtype=torch.long)}
+        key_material = (f"{GENERATOR_MODEL_NAME}\0ids\0".encode("utf-8")
+                        + np.asarray(prefix_ids, dtype=np.int32).tobytes())
+    else:
+        question_inputs = tokenizer(suffix, return_tensors="pt", truncation=True, max_length=MAX_INPUT_TOKENS)
+        key_material = f"{GENERATOR_MODEL_NAME}\0{prefix}".encode("utf-8")
+    _add_tokenize_time(timings, tokenize_start)
+
+    key = hashlib.sha1(key_material).hexdigest()
+    prefix_states = cache.get(key)
+    if cache_info is not None:
+        cache_info["encoder"] = prefix_states is not None
+    if prefix_states is None:
+        start = time.perf_counter()
+        if prompt_ids is not None:
+            prefix_inputs = {"input_ids": torch.tensor([prefix_ids[:MAX_INPUT_TOKENS]], dtype=torch.long)}
+        else:
+            prefix_inputs = tokenizer(
+                prefix, return_tensors="pt", add_special_tokens=False,
+                truncation=True, max_length=MAX_INPUT_TOKENS,
+            )
+            _add_tokenize_time(timings, start)
+        with torch.no_grad():
+            prefix_states = encoder(**prefix_inputs).last_hidden_state
+        cache.put(key, prefix_states, time.perf_counter() - start)
 
     with torch.no_grad():
-        outputs = model.generate(
-            **inputs,
-            max_new_tokens=MAX_NEW_TOKENS,
-            temperature=0.3,
-            top_p=0.9,
-            repetition_penalty=1.2,
-            no_repeat_ngram_size=3
+        question_states = encoder(**question_inputs).last_hidden_state
+
+    # Same overall MAX_INPUT_TOKENS limit as the single-pass path, which
+    # truncates from the end of the context.
+    prefix_budget = max(MAX_INPUT_TOKENS - question_states.shape[1], 0)
+    hidden_states = torch.cat([prefix_states[:, :prefix_budget], question_states], dim=1)
+    attention_mask = torch.ones(hidden_states.shape[:2], dtype=torch.long)
+    return {
+        "encoder_outputs": BaseModelOutput(last_hidden_state=hidden_states),
+        "attention_mask": attention_mask,
+    }
+
+
+def generate_answer(context, question, max_new_tokens=MAX_NEW_TOKENS, early_exit=False,
+                    reuse_encoder=ENCODER_CACHE_ENABLED, cache_info=None,
+                    max_context_chars=MAX_CONTEXT_CHARS, chunk_tokens=None, timings=None):
+    """
+    Generate an answer from the context. early_exit=True is the cheap
+    mode for short factual answers: stop at the first completed
+    sentence, skip the per-step repetition processors, and use assisted
+    decoding when a draft model is configured (DRAFT_MODEL_NAME).
+    reuse_encoder=True takes the context's encoder states from the
+    encoder cache (see config.ENCODER_CACHE_ENABLED); pass a dict as
+    cache_info to learn whether that was a hit. max_context_chars
+    overrides config.MAX_CONTEXT_CHARS (e.g. for parameter sweeps).
+    With `chunk_tokens` -- the context chunks' ingest-time token ids as
+    (ids, ends, chunk_chars), in context order -- the prompt is
+    assembled from ids (_assemble_prompt_ids) and `context` is not
+    tokenized. Pass a dict as `timings` to get the time spent
+    tokenizing as timings["tokenize_ms"].
+    """
+
+    tokenizer, model = load_generator()
+
+    prompt_ids = prefix = suffix = None
+    if chunk_tokens is not None:
+        start = time.perf_counter()
+        prompt_ids = _assemble_prompt_ids(tokenizer, chunk_tokens, question, max_context_chars)
+        _add_tokenize_time(timings, start)
+    else:
+        context = context[:max_context_chars]
+        prefix, suffix = _prompt_parts(context, question)
+
+    if reuse_encoder:
+        inputs = _encode_with_cache(
+            tokenizer, model, prefix, suffix, cache_info=cache_info, prompt_ids=prompt_ids, timings=timings,
+        )
+    elif prompt_ids is not None:
+        input_ids = torch.tensor([prompt_ids[0] + prompt_ids[1]], dtype=torch.long)
+        inputs = {"input_ids": input_ids, "attention_mask": torch.ones_like(input_ids)}
+    else:
+        start = time.perf_counter()
+        inputs = tokenizer(
+            prefix + suffix,
+            return_tensors="pt",
+            truncation=True,
+            max_length=MAX_INPUT_TOKENS
         )
+        _add_tokenize_time(timings, start)
+
+    if early_exit:
+        criteria = _sentence_end_criteria(tokenizer)
+        generate_kwargs = {"stopping_criteria": StoppingCriteriaList([criteria])}
+        draft_model = load_draft_model()
+        # The draft model would need its own encoding of the prompt,
+        # which precomputed encoder_outputs can't give it.
+        if draft_model is not None and not reuse_encoder:
+            generate_kwargs["assistant_model"] = draft_model
+
+        with torch.no_grad():
+            outputs = model.generate(**inputs, max_new_tokens=max_new_tokens, **generate_kwargs)
+
+        output_ids = _trim_sentence_overrun(outputs[0], criteria)
+    else:
+        with torch.no_grad():
+            outputs = model.generate(
+                **inputs,
+                max_new_tokens=max_new_tokens,
+                temperature=0.3,
+                top_p=0.9,
+                repetition_penalty=1.2,
+                no_repeat_ngram_size=3
+            )
+
+        output_ids = outputs[0]
 
-    answer = tokenizer.decode(outputs[0], skip_special_tokens=True)
+    answer = tokenizer.decode(output_ids, skip_special_tokens=True)
 
     if len(answer.strip()) < 10:
-        return "The answer is not clearly available in the provided document."
+        return NOT_AVAILABLE_ANSWER
 
     return answer.strip()
\ No newline at end of file
@@ -1,29 +1,65 @@
 from pypdf import PdfReader
 import io
 
-def load_pdf(uploaded_file):
+import numpy as np
+
+
+def load_pdf_pages(uploaded_file):
     """
-    Load PDF directly from Streamlit uploaded file
-    WITHOUT saving to disk (HF-safe).
+    Extract text page by page from a Streamlit uploaded file, WITHOUT
+    saving to disk (HF-safe). Pages with no extractable text come back
+    as "" so list positions stay equal to page numbers.
     """
 
     try:
-        # Read file bytes
-        pdf_bytes = uploaded_file.read()
-
-        # Convert to in-memory binary stream
-        pdf_stream = io.BytesIO(pdf_bytes)
+        if hasattr(uploaded_file, "seek"):
+            # Already a seekable stream (BytesIO, Streamlit's
+            # UploadedFile, utils.upload's mmap): parse it in place
+            # rather than copying its bytes into a new BytesIO.
+            uploaded_file.seek(0)
+            pdf_stream = uploaded_file
+        else:
+            pdf_stream = io.BytesIO(uploaded_file.read())
 
         reader = PdfReader(pdf_stream)
 
-        text = ""
-
-        for page in reader.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text += page_text + "\n"
-
-        return text.strip()
+        return [page.extract_text() or "" for page in reader.pages]
 
     except Exception as e:
         raise Exception(f"PDF loading failed: {str(e)}")
+
+
+def join_pages(pages):
+    """
+    Concatenate page texts the way load_pdf always has (non-empty pages,
+    newline-terminated, stripped), and also return page_starts: the
+    character offset in the joined text where each page begins. A char
+    offset maps back to its page with np.searchsorted(page_starts, offset,
+    side="right") - 1, so page boundaries survive chunking as a compact
+    int array instead of requiring a second extraction pass.
+    """
+    text = ""
+    page_starts = []
+    for page_text in pages:
+        page_starts.append(len(text))
+        if page_text:
+            text += page_text + "\n"
+
+    stripped = text.strip()
+    leading = len(text) - len(text.lstrip())
+    page_starts = np.clip(np.array(page_starts, dtype=np.int64) - leading, 0, len(stripped))
+    return stripped, page_starts
+
+
+def load_pdf_with_pages(uploaded_file):
+    """Load a PDF as (text, page_starts) -- see join_pages."""
+    return join_pages(load_pdf_pages(uploaded_file))
+
+
+def load_pdf(uploaded_file):
+    """
+    Load PDF directly from Streamlit uploaded file
+    WITHOUT saving to disk (HF-safe).
+    """
+    text, _ = load_pdf_with_pages(uploaded_file)
+    return text
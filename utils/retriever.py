@@ -1,3 +1,8 @@
+import heapq
+import itertools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
 import faiss
 import numpy as np
 
@@ -19,10 +24,209 @@ def create_faiss_index(embeddings):
     return index
 
 
-def search_index(index, query_embedding, chunks, top_k=5):
+def create_reduced_index(embeddings, target_dim, train_sample=None, seed=0):
+    """
+    Cosine-similarity index over PCA-reduced vectors: an
+    IndexPreTransform chaining PCAMatrix(d -> target_dim) and
+    re-normalization in front of an IndexFlatIP(target_dim). The
+    projection is trained on the corpus itself (or a random sample of
+    `train_sample` vectors), is applied to queries automatically at
+    search time, and is saved with the index by faiss.write_index.
+
+    Needs more vectors than target_dim to train; smaller corpora (where
+    search is cheap anyway) get a plain create_faiss_index.
+    """
+    embeddings = np.array(embeddings).astype("float32")
+    faiss.normalize_L2(embeddings)
+    dimension = embeddings.shape[1]
+    if target_dim >= dimension or len(embeddings) <= target_dim:
+        return create_faiss_index(embeddings)
+
+    training = embeddings
+    if train_sample is not None and len(embeddings) > train_sample:
+        rows = np.random.default_rng(seed).choice(len(embeddings), train_sample, replace=False)
+        training = embeddings[np.sort(rows)]
+
+    index = faiss.IndexPreTransform(faiss.IndexFlatIP(target_dim))
+    index.prepend_transform(faiss.NormalizationTransform(target_dim, 2.0))
+    index.prepend_transform(faiss.PCAMatrix(dimension, target_dim))
+    index.train(training)
+    index.add(embeddings)
+    return index
+
+
+def save_faiss_index(index, path):
+    """Persist a FAISS index, including any trained PCA projection."""
+    faiss.write_index(index, path)
+
+
+def load_faiss_index(path):
+    return faiss.read_index(path)
+
+
+def index_nbytes(index):
+    """
+    Approximate resident bytes of an index built by this module: stored
+    vectors, id maps and any PCA matrix. Other index types fall back to
+    their serialized size.
+    """
+    if isinstance(index, ShardedIndex):
+        return sum(index_nbytes(shard) for shard in index.shards)
+    # A new name on purpose: rebinding `index` could drop the last
+    # reference to the owning Python wrapper and free the C++ index.
+    typed = faiss.downcast_index(index)
+    if isinstance(typed, faiss.IndexPreTransform):
+        transforms = [faiss.downcast_VectorTransform(typed.chain.at(i)) for i in range(typed.chain.size())]
+        matrices = sum(t.d_in * t.d_out * 4 for t in transforms if isinstance(t, faiss.LinearTransform))
+        return matrices + index_nbytes(typed.index)
+    if isinstance(typed, faiss.IndexIDMap2):
+        # id array plus the reverse id -> position hash map
+        return typed.ntotal * 8 * 3 + index_nbytes(typed.index)
+    if isinstance(typed, faiss.IndexIDMap):
+        return typed.ntotal * 8 + index_nbytes(typed.index)
+    if isinstance(typed, faiss.IndexFlatCodes):
+        return typed.ntotal * typed.code_size
+    return len(faiss.serialize_index(typed))
+
+
+def create_faiss_id_index(embeddings, ids, dimension=None):
+    """
+    Cosine-similarity index whose search results are caller-chosen int64
+    ids (e.g. chunk content hashes) rather than insertion positions, so
+    vectors can be added and removed in place without renumbering
+    everything else. IndexIDMap2 keeps a reverse map, making
+    remove_ids() work on a flat index.
+    """
+    embeddings = np.array(embeddings).astype("float32")
+    if dimension is None:
+        dimension = embeddings.shape[1]
+    index = faiss.IndexIDMap2(faiss.IndexFlatIP(dimension))
+    add_to_id_index(index, embeddings, ids)
+    return index
+
+
+def add_to_id_index(index, embeddings, ids):
+    embeddings = np.array(embeddings).astype("float32")
+    if len(embeddings) == 0:
+        return
+    faiss.normalize_L2(embeddings)
+    index.add_with_ids(embeddings, np.asarray(ids, dtype=np.int64))
+
+
+def remove_from_id_index(index, ids):
+    """Remove vectors by id; returns how many were actually removed."""
+    if len(ids) == 0:
+        return 0
+    return index.remove_ids(np.asarray(ids, dtype=np.int64))
+
+
+class ShardedIndex:
+    """
+    IndexShards-style facade: vectors are split across `num_shards`
+    flat cosine indexes, a search fans out to every shard on a thread
+    pool (FAISS releases the GIL while searching), and the per-shard
+    top-k lists are merged with a k-way heap merge. Exposes the same
+    ntotal / search(queries, k) -> (distances, ids) surface as a plain
+    FAISS index, so search_index() works on it unchanged.
+
+    A flat index answers a single query on one core (FAISS only
+    parallelizes across queries, or via BLAS for large query batches),
+    so sharding is what lets one interactive query use several cores.
+
+    Ids are global: add() numbers vectors by insertion order like a
+    plain index, add_with_ids() takes caller ids (e.g. content hashes).
+    Shard assignment is by `shard_keys` when given (e.g. one doc_id per
+    vector, keeping a document's vectors together), else by id.
+    """
+
+    def __init__(self, dimension, num_shards=2, omp_threads_per_shard=None):
+        self.d = dimension
+        self.num_shards = num_shards
+        self.shards = [faiss.IndexIDMap2(faiss.IndexFlatIP(dimension)) for _ in range(num_shards)]
+        if omp_threads_per_shard is None:
+            omp_threads_per_shard = max(1, (os.cpu_count() or 1) // num_shards)
+        self.omp_threads_per_shard = omp_threads_per_shard
+        # omp_set_num_threads sets a per-thread OpenMP value, so calling
+        # it in each pool thread's initializer limits every shard search
+        # without touching the rest of the process.
+        self._executor = ThreadPoolExecutor(
+            max_workers=num_shards,
+            thread_name_prefix="faiss-shard",
+            initializer=faiss.omp_set_num_threads,
+            initargs=(omp_threads_per_shard,),
+        )
+        self._next_id = 0
+
+    @property
+    def ntotal(self):
+        return sum(shard.ntotal for shard in self.shards)
+
+    def add(self, embeddings, shard_keys=None):
+        embeddings = np.asarray(embeddings, dtype="float32")
+        ids = np.arange(self._next_id, self._next_id + len(embeddings), dtype=np.int64)
+        self.add_with_ids(embeddings, ids, shard_keys=shard_keys)
+
+    def add_with_ids(self, embeddings, ids, shard_keys=None):
+        embeddings = np.asarray(embeddings, dtype="float32")
+        ids = np.asarray(ids, dtype=np.int64)
+        keys = ids if shard_keys is None else np.asarray(shard_keys, dtype=np.int64)
+        assignment = keys % self.num_shards
+        for shard_number, shard in enumerate(self.shards):
+            mask = assignment == shard_number
+            if mask.any():
+                shard.add_with_ids(np.ascontiguousarray(embeddings[mask]), ids[mask])
+        if len(ids):
+            self._next_id = max(self._next_id, int(ids.max()) + 1)
+
+    def remove_ids(self, ids):
+        ids = np.asarray(ids, dtype=np.int64)
+        return sum(shard.remove_ids(ids) for shard in self.shards)
+
+    def search(self, queries, k, params=None):
+        queries = np.ascontiguousarray(queries, dtype="float32")
+        futures = [
+            self._executor.submit(shard.search, queries, min(k, shard.ntotal), params=params)
+            for shard in self.shards if shard.ntotal > 0
+        ]
+        per_shard = [future.result() for future in futures]
+
+        distances = np.full((len(queries), k), -np.inf, dtype="float32")
+        ids = np.full((len(queries), k), -1, dtype=np.int64)
+        for row in range(len(queries)):
+            # Each shard's list is already sorted best-first, so a k-way
+            # merge only has to look at the heads.
+            merged = heapq.merge(
+                *[zip(d[row], i[row]) for d, i in per_shard],
+                key=lambda pair: -pair[0],
+            )
+            best = [(d, i) for d, i in itertools.islice(merged, k) if i != -1]
+            for col, (d, i) in enumerate(best):
+                distances[row, col], ids[row, col] = d, i
+        return distances, ids
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+def create_sharded_index(embeddings, num_shards, omp_threads_per_shard=None, shard_keys=None):
+    """Cosine-similarity ShardedIndex over `embeddings` (see ShardedIndex)."""
+    embeddings = np.array(embeddings).astype("float32")
+    faiss.normalize_L2(embeddings)
+    index = ShardedIndex(embeddings.shape[1], num_shards=num_shards, omp_threads_per_shard=omp_threads_per_shard)
+    index.add(embeddings, shard_keys=shard_keys)
+    return index
+
+
+def search_index(index, query_embedding, chunks, top_k=5, return_ids=False, allowed_ids=None):
     """
     Retrieve top-k most similar chunks using cosine similarity.
-    Returns chunks sorted by similarity (highest first).
+    Returns chunks sorted by similarity (highest first), plus their
+    chunk ids when return_ids=True (for metadata/provenance lookups).
+    `chunks` is indexed by whatever ids the index returns: positions for
+    a plain index, or e.g. a {content_hash: chunk} dict for an ID-mapped
+    one (see create_faiss_id_index). With `allowed_ids`, only those ids
+    are scored (a FAISS IDSelectorBatch), e.g. the chunks of the
+    sections picked by src/services/sections.py.
     """
 
     # FAISS pads results with index -1 when top_k exceeds the number of
@@ -35,19 +239,28 @@ def search_index(index, query_embedding, chunks, top_k=5):
     # never has to pad.
     effective_top_k = min(top_k, index.ntotal)
 
+    params = None
+    if allowed_ids is not None:
+        allowed_ids = np.asarray(allowed_ids, dtype=np.int64)
+        effective_top_k = min(effective_top_k, len(allowed_ids))
+        params = faiss.SearchParameters(sel=faiss.IDSelectorBatch(allowed_ids))
+
     query_embedding = np.array([query_embedding]).astype("float32")
 
     # Normalize query embedding
     faiss.normalize_L2(query_embedding)
 
-    distances, indices = index.search(query_embedding, effective_top_k)
+    if params is None:
+        distances, indices = index.search(query_embedding, effective_top_k)
+    else:
+        distances, indices = index.search(query_embedding, effective_top_k, params=params)
 
     results = []
 
     for i, score in zip(indices[0], distances[0]):
         if i == -1:
             continue
-        results.append((chunks[i], float(score)))
+        results.append((chunks[int(i)], float(score), int(i)))
 
     # Ensure sorted by similarity (highest first)
     results.sort(key=lambda x: x[1], reverse=True)
@@ -55,4 +268,6 @@ def search_index(index, query_embedding, chunks, top_k=5):
     final_chunks = [r[0] for r in results]
     final_scores = [r[1] for r in results]
 
+    if return_ids:
+        return final_chunks, final_scores, [r[2] for r in results]
     return final_chunks, final_scores
\ No newline at end of file
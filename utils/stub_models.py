@@ -0,0 +1,118 @@
+"""
+Deterministic stand-ins for the e5 encoder and the flan-t5 generator,
+for load tests and benchmarks that must run fast with no model
+downloads (scripts/load_test.py --stub).
+
+  - StubEmbeddingModel implements the parts of SentenceTransformer that
+    utils/embeddings.py uses. A text's embedding is a hashed bag of its
+    words, so texts sharing words are close and retrieval still ranks
+    sensibly.
+  - stub_generate_answer has generate_answer's call signature and
+    returns the context sentence sharing the most words with the
+    question.
+
+Both can burn a configurable amount of real CPU per call (numpy matmuls,
+which release the GIL like torch does), so concurrency behaves like the
+CPU-bound real models rather than like sleeps.
+
+install_stub_models() swaps them in for the whole process and returns a
+function that restores the real ones.
+"""
+
+import hashlib
+import re
+import time
+
+import numpy as np
+
+_WORD_PATTERN = re.compile(r"[a-z0-9']+")
+_SENTENCE_SPLIT_PATTERN = re.compile(r"(?<=[.!?])\s+|\n+")
+# utils.embeddings adds these; the stub ignores them so a query and a
+# passage with the same words embed the same.
+_E5_PREFIXES = ("query: ", "passage: ")
+
+_burn_matrix = np.random.default_rng(0).standard_normal((128, 128)).astype("float32")
+
+
+def burn_cpu(ms):
+    """Keep one core busy for about `ms` milliseconds."""
+    if ms <= 0:
+        return
+    end = time.perf_counter() + ms / 1000
+    x = _burn_matrix
+    while time.perf_counter() < end:
+        x = np.tanh(x @ _burn_matrix)
+
+
+def _words(text):
+    return _WORD_PATTERN.findall(text.lower())
+
+
+class _StubTokenizer:
+    def __call__(self, texts, add_special_tokens=True, truncation=True, max_length=512, **kwargs):
+        return {"input_ids": [list(range(min(len(_words(t)) + 2, max_length))) for t in texts]}
+
+
+class StubEmbeddingModel:
+    def __init__(self, dim=768, ms_per_text=0.0):
+        self.dim = dim
+        self.ms_per_text = ms_per_text
+        self.max_seq_length = 512
+        self.tokenizer = _StubTokenizer()
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+
+    def _embed(self, text):
+        vector = np.zeros(self.dim, dtype="float32")
+        for prefix in _E5_PREFIXES:
+            if text.startswith(prefix):
+                text = text[len(prefix):]
+        for word in _words(text):
+            digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+            slot = int.from_bytes(digest[:4], "little") % self.dim
+            vector[slot] += 1.0 if digest[4] & 1 else -1.0
+        return vector
+
+    def encode(self, texts, batch_size=32, normalize_embeddings=False, convert_to_numpy=True, **kwargs):
+        if isinstance(texts, str):
+            return self.encode([texts], normalize_embeddings=normalize_embeddings)[0]
+        burn_cpu(self.ms_per_text * len(texts))
+        embeddings = np.stack([self._embed(t) for t in texts]) if texts else np.zeros((0, self.dim), "float32")
+        if normalize_embeddings:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings = embeddings / np.where(norms == 0, 1.0, norms)
+        return embeddings
+
+
+def make_stub_generate_answer(generation_ms=0.0):
+    def stub_generate_answer(context, question, max_context_chars=None, **kwargs):
+        burn_cpu(generation_ms)
+        if max_context_chars is not None:
+            context = context[:max_context_chars]
+        question_words = set(_words(question))
+        best, best_overlap = "", -1
+        for sentence in _SENTENCE_SPLIT_PATTERN.split(context):
+            overlap = len(question_words & set(_words(sentence)))
+            if sentence.strip() and overlap > best_overlap:
+                best, best_overlap = sentence.strip(), overlap
+        return best
+    return stub_generate_answer
+
+
+def install_stub_models(embedding_ms_per_text=0.0, generation_ms=0.0, dim=768):
+    """
+    Route every embedding and generation call in this process to the
+    stubs. Returns a no-argument function that puts the real ones back.
+    """
+    import utils.embeddings as embeddings
+    import src.services.generation as generation
+
+    model = StubEmbeddingModel(dim=dim, ms_per_text=embedding_ms_per_text)
+    originals = (embeddings.load_embedding_model, generation.generate_answer)
+    embeddings.load_embedding_model = lambda: model
+    generation.generate_answer = make_stub_generate_answer(generation_ms)
+
+    def restore():
+        embeddings.load_embedding_model, generation.generate_answer = originals
+    return restore
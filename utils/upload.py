@@ -0,0 +1,185 @@
+"""
+Single-pass upload handling: one read of the uploaded stream yields its
+size, content hash (the DocumentManager's doc id) and header bytes (for
+the PDF magic check), and the parser then reads the same bytes in place.
+
+Previously the upload was copied several times before parsing:
+Streamlit's getvalue(), the hash over those bytes, a new io.BytesIO for
+validation, and load_pdf's read() plus another io.BytesIO for pypdf.
+Here:
+
+  - bytes, and streams that already hold the whole upload in memory
+    (io.BytesIO, which Streamlit's UploadedFile is), are used through
+    a memoryview of their bytes -- no copy at all;
+  - any other stream is read once in UPLOAD_READ_CHUNK_BYTES pieces
+    into memory, moving to a named temp file once it passes
+    UPLOAD_SPOOL_THRESHOLD_BYTES, and is read back through a read-only
+    mmap (page cache, not a second heap copy). The file's path also
+    lets the isolated PDF workers map it themselves instead of
+    receiving the bytes over a pipe;
+  - reading stops as soon as the size passes `max_bytes`, so an
+    oversized stream is never buffered in full.
+"""
+
+import hashlib
+import io
+import mmap
+import os
+import tempfile
+
+from src.config import UPLOAD_SPOOL_THRESHOLD_BYTES, UPLOAD_SPOOL_DIR
+
+UPLOAD_READ_CHUNK_BYTES = 1024 * 1024
+_HEADER_BYTES = 16
+
+
+def check_upload_size(size, max_bytes):
+    if size == 0:
+        raise ValueError("The uploaded file is empty.")
+    if max_bytes is not None and size > max_bytes:
+        raise ValueError(
+            f"File is too large ({size / (1024 * 1024):.1f}MB). "
+            f"Maximum allowed is {max_bytes / (1024 * 1024):.0f}MB."
+        )
+
+
+def check_upload_header(header, magic):
+    if not header.startswith(magic):
+        raise ValueError(
+            "This file does not appear to be a valid PDF (missing PDF header). "
+            "It may be corrupted or renamed from a different file type."
+        )
+
+
+def content_hash_object():
+    # Same digest as src.services.sessions.content_hash.
+    return hashlib.blake2b(digest_size=16)
+
+
+class Upload:
+    """
+    An uploaded file read once: .size, .digest (hex), .header (first
+    bytes), and its contents via view() / stream(), or .path when it
+    was spooled to disk. close() releases the buffer and temp file.
+    """
+
+    def __init__(self, size, digest, header, buffer=None, path=None, source_stream=None):
+        self.size = size
+        self.digest = digest
+        self.header = header
+        self.path = path
+        self._buffer = buffer  # memoryview of in-memory contents
+        self._source_stream = source_stream  # file object (or bytes) holding the contents
+        self._file = None
+        self._mmap = None
+
+    def view(self):
+        """The contents as a read-only buffer (memoryview or mmap), without copying."""
+        if self._buffer is not None:
+            return self._buffer
+        if self._mmap is None:
+            self._file = open(self.path, "rb")
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._mmap
+
+    def stream(self):
+        """A seekable file object over the contents, positioned at 0."""
+        if self._source_stream is not None and not isinstance(self._source_stream, bytes):
+            self._source_stream.seek(0)
+            return self._source_stream
+        if isinstance(self._source_stream, bytes):
+            return io.BytesIO(self._source_stream)  # shares the bytes object's buffer
+        if self._buffer is not None:
+            return io.BytesIO(self._buffer)  # the one copy, for callers needing a file API
+        view = self.view()
+        view.seek(0)
+        return view
+
+    def close(self):
+        if self._buffer is not None:
+            self._buffer.release()
+            self._buffer = None
+        if self._mmap is not None:
+            self._mmap.close()
+            self._file.close()
+            self._mmap = self._file = None
+        if self.path is not None:
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+            self.path = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _hash_view(view):
+    digest = content_hash_object()
+    for offset in range(0, len(view), UPLOAD_READ_CHUNK_BYTES):
+        digest.update(view[offset:offset + UPLOAD_READ_CHUNK_BYTES])
+    return digest.hexdigest()
+
+
+def read_upload(source, max_bytes=None, spool_threshold=UPLOAD_SPOOL_THRESHOLD_BYTES, spool_dir=UPLOAD_SPOOL_DIR):
+    """
+    Read `source` (bytes-like, or a binary file object) once into an
+    Upload. Raises ValueError if it is empty or larger than `max_bytes`.
+    """
+    if isinstance(source, Upload):
+        return source
+
+    if isinstance(source, io.BytesIO):
+        # getvalue(), not getbuffer(): a BytesIO created from bytes (as
+        # Streamlit's UploadedFile is) shares that bytes object, and
+        # getvalue() hands it back as-is, while getbuffer() would first
+        # copy it into a private, writable buffer.
+        contents, stream = source.getvalue(), source
+    elif isinstance(source, (bytes, bytearray, memoryview)):
+        contents, stream = source, source if isinstance(source, bytes) else None
+    else:
+        contents = None
+
+    if contents is not None:
+        view = memoryview(contents).cast("B")
+        check_upload_size(len(view), max_bytes)
+        return Upload(len(view), _hash_view(view), bytes(view[:_HEADER_BYTES]), buffer=view.toreadonly(),
+                      source_stream=stream)
+
+    digest = content_hash_object()
+    memory, spool, path = io.BytesIO(), None, None
+    size, header = 0, b""
+    try:
+        while True:
+            block = source.read(UPLOAD_READ_CHUNK_BYTES)
+            if not block:
+                break
+            if not header:
+                header = bytes(block[:_HEADER_BYTES])
+            size += len(block)
+            if max_bytes is not None and size > max_bytes:
+                check_upload_size(size, max_bytes)  # raises: stop before buffering the rest
+            digest.update(block)
+            if spool is None and size > spool_threshold:
+                fd, path = tempfile.mkstemp(prefix="upload-", suffix=".pdf", dir=spool_dir)
+                spool = os.fdopen(fd, "wb")
+                spool.write(memory.getbuffer())
+                memory = None
+            if spool is not None:
+                spool.write(block)
+            else:
+                memory.write(block)
+    except BaseException:
+        if spool is not None:
+            spool.close()
+            os.unlink(path)
+        raise
+
+    check_upload_size(size, max_bytes)
+    if spool is not None:
+        spool.close()
+        return Upload(size, digest.hexdigest(), header, path=path)
+    return Upload(size, digest.hexdigest(), header, buffer=memory.getbuffer().toreadonly(), source_stream=memory)
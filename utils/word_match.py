@@ -0,0 +1,97 @@
+"""
+Word-family matching used by the confidence gate and list selection
+(src/services/generation.py) and by the ingest-time list index
+(src/services/list_index.py). Pure Python, so ingestion can use it
+without importing the generator.
+"""
+
+import re
+
+_STOPWORDS = {
+    "the", "a", "an", "is", "are", "was", "were", "what", "which", "who",
+    "does", "do", "did", "this", "that", "for", "of", "to", "in", "on",
+    "and", "or", "with", "required", "role", "job", "most",
+}
+
+# A word (or word FAMILY -- see _words_match) present in more than this
+# fraction of chunks is treated as generic to the document. Lowered from
+# 0.5 based on diagnostic evidence: on the O*NET test document, the
+# document's own subject word "developers" only word-family-matched in
+# 2 of 6 chunks (33%) and "software" matched in exactly 3 of 6 (50%,
+# sitting right on the old boundary) -- both survived the old threshold
+# as "rare/discriminating" despite being the single most generic
+# concept in the whole document, which defeated the out-of-scope
+# refusal check. This fraction is an approximation, not a precise
+# general solution -- a word's frequency doesn't repeat evenly across
+# every section even when it IS the document's core subject, and the
+# right fraction likely depends on document size/structure. A more
+# principled fix (e.g. explicitly excluding the document's own
+# title/subject words) is noted as future work rather than tuned
+# further here.
+_GENERIC_WORD_CHUNK_FRACTION = 0.3
+
+
+def _words_match(word_a, word_b):
+    """
+    Prefix-CONTAINMENT match (shorter word is a genuine prefix of the
+    longer one) -- e.g. "wage"/"wages", "annual"/"annually",
+    "develop"/"developers" all match. Deliberately NOT fixed-length
+    truncation: that approach was found (via the eval harness) to cause
+    false-positive collisions between unrelated words that happen to
+    share the same first few characters, e.g. "companies" and
+    "computers" both truncate to "comp" but share no real relationship.
+    """
+    shorter, longer = (word_a, word_b) if len(word_a) <= len(word_b) else (word_b, word_a)
+    return longer.startswith(shorter)
+
+
+def _word_overlap_count(words_a, words_b):
+    """Count words in words_a that are a prefix-match with any word in words_b."""
+    return sum(1 for wa in words_a if any(_words_match(wa, wb) for wb in words_b))
+
+
+def _has_word_overlap(words_a, words_b):
+    return _word_overlap_count(words_a, words_b) > 0
+
+
+def _significant_words(text):
+    words = re.findall(r"[a-zA-Z']+", text.lower())
+    return {w for w in words if len(w) > 3 and w not in _STOPWORDS}
+
+
+def _chunk_word_sets(chunks):
+    return [_significant_words(c) for c in chunks]
+
+
+def _prefix_match_chunk_count(word, chunk_word_sets):
+    """
+    Count chunks where ANY word prefix-matches `word` -- this clusters
+    word families together (e.g. "develop"/"developers"/"developing"
+    all count toward the same concept) rather than counting each exact
+    token in isolation. Found via the eval harness: exact-token
+    frequency counting missed that "developers" (query) is really the
+    same generic concept as "develop" (appearing in the Overview
+    section), so it wasn't recognized as generic to a document that is
+    entirely about software developers -- letting it through as a
+    "rare/discriminating" word and defeating the out-of-scope refusal
+    check for an unrelated question that happened to mention
+    "developers".
+    """
+    return sum(1 for words in chunk_word_sets if any(_words_match(word, w) for w in words))
+
+
+def _rare_words(words, chunk_word_sets):
+    """
+    Filter a word set down to words that are NOT generic to this
+    document (see _prefix_match_chunk_count). Falls back to the
+    unfiltered set if filtering would eliminate everything, since a
+    very small candidate chunk set otherwise degenerates (every word
+    trivially looks "generic" when there's only one chunk to check
+    against).
+    """
+    total_chunks = len(chunk_word_sets)
+    if total_chunks == 0:
+        return words
+    threshold = _GENERIC_WORD_CHUNK_FRACTION * total_chunks
+    filtered = {w for w in words if _prefix_match_chunk_count(w, chunk_word_sets) <= threshold}
+    return filtered if filtered else words